@@ -63,4 +63,4 @@ async def transcribe_audio(request: AudioRequest):
 @app.websocket("/ws")
 async def websocket_endpoint(websocket):
     await websocket.accept()
-    await websocket.send_text("WebSocket endpoint is deprecated. Use /transcribe POST endpoint instead.")
\ No newline at end of file
+    await websocket.send_text("WebSocket endpoint is deprecated. Use /transcribe POST endpoint or the speech service /ws/transcribe stream instead.")
\ No newline at end of file
@@ -27,27 +27,27 @@ Write-Host "🐳 Building Docker images..." -ForegroundColor Yellow
 
 # API Gateway
 Write-Host "Building API Gateway..." -ForegroundColor Cyan
-docker build -t codevoice/api-gateway:latest ./services/api-gateway
+docker build -t codevoice/api-gateway:latest -f ./services/api-gateway/Dockerfile ./services
 minikube image load codevoice/api-gateway:latest
 
 # Speech Service
 Write-Host "Building Speech Service..." -ForegroundColor Cyan
-docker build -t codevoice/speech-service:latest ./services/speech-service
+docker build -t codevoice/speech-service:latest -f ./services/speech-service/Dockerfile ./services
 minikube image load codevoice/speech-service:latest
 
 # Code Service
 Write-Host "Building Code Service..." -ForegroundColor Cyan
-docker build -t codevoice/code-service:latest ./services/code-service
+docker build -t codevoice/code-service:latest -f ./services/code-service/Dockerfile ./services
 minikube image load codevoice/code-service:latest
 
 # Live AI Coding Service
 Write-Host "Building Live AI Coding Service..." -ForegroundColor Cyan
-docker build -t codevoice/live-ai-coding-service:latest ./services/live-ai-coding-service
+docker build -t codevoice/live-ai-coding-service:latest -f ./services/live-ai-coding-service/Dockerfile ./services
 minikube image load codevoice/live-ai-coding-service:latest
 
 # Collaborative Docs Service
 Write-Host "Building Collaborative Docs Service..." -ForegroundColor Cyan
-docker build -t codevoice/collaborative-docs-service:latest ./services/collaborative-docs-service
+docker build -t codevoice/collaborative-docs-service:latest -f ./services/collaborative-docs-service/Dockerfile ./services
 minikube image load codevoice/collaborative-docs-service:latest
 
 # Frontend
@@ -28,27 +28,27 @@ echo "🐳 Building Docker images..."
 
 # API Gateway
 echo "Building API Gateway..."
-docker build -t codevoice/api-gateway:latest ./services/api-gateway
+docker build -t codevoice/api-gateway:latest -f ./services/api-gateway/Dockerfile ./services
 minikube image load codevoice/api-gateway:latest
 
 # Speech Service
 echo "Building Speech Service..."
-docker build -t codevoice/speech-service:latest ./services/speech-service
+docker build -t codevoice/speech-service:latest -f ./services/speech-service/Dockerfile ./services
 minikube image load codevoice/speech-service:latest
 
 # Code Service
 echo "Building Code Service..."
-docker build -t codevoice/code-service:latest ./services/code-service
+docker build -t codevoice/code-service:latest -f ./services/code-service/Dockerfile ./services
 minikube image load codevoice/code-service:latest
 
 # Live AI Coding Service
 echo "Building Live AI Coding Service..."
-docker build -t codevoice/live-ai-coding-service:latest ./services/live-ai-coding-service
+docker build -t codevoice/live-ai-coding-service:latest -f ./services/live-ai-coding-service/Dockerfile ./services
 minikube image load codevoice/live-ai-coding-service:latest
 
 # Collaborative Docs Service
 echo "Building Collaborative Docs Service..."
-docker build -t codevoice/collaborative-docs-service:latest ./services/collaborative-docs-service
+docker build -t codevoice/collaborative-docs-service:latest -f ./services/collaborative-docs-service/Dockerfile ./services
 minikube image load codevoice/collaborative-docs-service:latest
 
 # Frontend
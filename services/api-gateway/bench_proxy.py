@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare gateway CPU time per request and peak Python memory for the old
+parse-and-re-serialize handlers versus the streaming proxy.
+
+Both gateways run in-process against the same echo upstream over ASGI
+transports, so the numbers isolate what the gateway itself does with the
+body.
+
+Usage: PYTHONPATH=.. python bench_proxy.py [payload_kb ...]
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+from proxy import Route, register_routes
+from upstream import load_config
+
+REQUESTS = 20
+
+
+def build_upstream() -> FastAPI:
+    upstream = FastAPI()
+
+    @upstream.post("/transcribe")
+    async def echo(request: Request):
+        return Response(content=await request.body(), media_type="application/json")
+
+    return upstream
+
+
+class StaticUpstreams:
+    """Stand-in for UpstreamClients that hands out one fixed client"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.configs = {"speech": load_config("speech", "http://speech")}
+        self._client = client
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        return self._client
+
+    async def send(self, name: str, request: httpx.Request, stream: bool = False, hedge: bool = False) -> httpx.Response:
+        return await self._client.send(request, stream=stream)
+
+
+def build_legacy_gateway(client: httpx.AsyncClient) -> FastAPI:
+    gateway = FastAPI()
+
+    @gateway.post("/api/transcribe")
+    async def transcribe_audio(request: Request):
+        try:
+            body = await request.json()
+            response = await client.post("/transcribe", json=body)
+            return response.json()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Speech service error: {str(e)}")
+
+    return gateway
+
+
+def build_proxy_gateway(client: httpx.AsyncClient) -> FastAPI:
+    gateway = FastAPI()
+    register_routes(gateway, [Route("POST", "/api/transcribe", "speech", "/transcribe")], StaticUpstreams(client))
+    return gateway
+
+
+async def measure(gateway: FastAPI, body: bytes) -> tuple:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=gateway), base_url="http://gateway") as client:
+        # Warm up route resolution and imports before measuring
+        await client.post("/api/transcribe", content=body, headers={"content-type": "application/json"})
+
+        tracemalloc.start()
+        cpu_start = time.process_time()
+        for _ in range(REQUESTS):
+            response = await client.post("/api/transcribe", content=body, headers={"content-type": "application/json"})
+            response.raise_for_status()
+        cpu_per_request = (time.process_time() - cpu_start) / REQUESTS
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return cpu_per_request, peak
+
+
+async def main():
+    sizes_kb = [float(arg) for arg in sys.argv[1:]] or [10, 1024, 5120]
+    upstream_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=build_upstream()), base_url="http://speech")
+    legacy = build_legacy_gateway(upstream_client)
+    proxied = build_proxy_gateway(upstream_client)
+
+    print(f"{'payload':>9} {'legacy cpu':>11} {'proxy cpu':>10} {'legacy peak':>12} {'proxy peak':>11}")
+    for size_kb in sizes_kb:
+        audio = os.urandom(int(size_kb * 1024 * 3 / 4))
+        body = json.dumps({"audio_data": base64.b64encode(audio).decode(), "audio_format": "webm"}).encode()
+
+        legacy_cpu, legacy_peak = await measure(legacy, body)
+        proxy_cpu, proxy_peak = await measure(proxied, body)
+        print(f"{len(body) / 1024:>7.0f}KB {legacy_cpu * 1000:>9.2f}ms {proxy_cpu * 1000:>8.2f}ms "
+              f"{legacy_peak / 1e6:>10.2f}M {proxy_peak / 1e6:>9.2f}M")
+
+    await upstream_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,209 @@
+from collections import deque
+from typing import NamedTuple
+import time
+import structlog
+
+from metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTED, OUTLIER_EJECTIONS, OUTLIER_EJECTED
+
+logger = structlog.get_logger()
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class BreakerConfig(NamedTuple):
+    failure_rate: float
+    slow_call_seconds: float
+    slow_call_rate: float
+    window: int
+    min_calls: int
+    open_seconds: float
+    half_open_probes: int
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"Circuit open for {service}")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Count-based rolling window breaker for one upstream service.
+
+    Opens when the failure rate or slow-call rate over the last ``window``
+    calls crosses its threshold, fails fast for ``open_seconds``, then lets
+    ``half_open_probes`` calls through; all of them must succeed to close.
+    """
+
+    def __init__(self, service: str, config: BreakerConfig, clock=time.monotonic):
+        self.service = service
+        self.config = config
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque()
+        self._failures = 0
+        self._slow = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        CIRCUIT_STATE.labels(service).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str):
+        logger.warning("⚡ Circuit breaker state changed", service=self.service, previous=self.state, state=state)
+        CIRCUIT_TRANSITIONS.labels(self.service, self.state, state).inc()
+        CIRCUIT_STATE.labels(self.service).set(STATE_VALUES[state])
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self.clock()
+        self._outcomes.clear()
+        self._failures = self._slow = 0
+        self._probes_in_flight = self._probe_successes = 0
+
+    def before_call(self):
+        """Reserve permission to call the upstream or raise CircuitOpen"""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.config.open_seconds - self.clock()
+            if remaining > 0:
+                CIRCUIT_REJECTED.labels(self.service).inc()
+                raise CircuitOpen(self.service, remaining)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight + self._probe_successes >= self.config.half_open_probes:
+                CIRCUIT_REJECTED.labels(self.service).inc()
+                raise CircuitOpen(self.service, 1.0)
+            self._probes_in_flight += 1
+
+    def abandon(self):
+        """Release a reserved call that never completed, e.g. because the client went away"""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, failed: bool, elapsed: float):
+        slow = elapsed >= self.config.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed or slow:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.config.half_open_probes:
+                    self._transition(CLOSED)
+            return
+
+        if self.state != CLOSED:
+            return
+
+        self._outcomes.append((failed, slow))
+        self._failures += failed
+        self._slow += slow
+        if len(self._outcomes) > self.config.window:
+            old_failed, old_slow = self._outcomes.popleft()
+            self._failures -= old_failed
+            self._slow -= old_slow
+
+        calls = len(self._outcomes)
+        if calls >= self.config.min_calls and (
+            self._failures / calls >= self.config.failure_rate
+            or self._slow / calls >= self.config.slow_call_rate
+        ):
+            self._transition(OPEN)
+
+    def snapshot(self) -> dict:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(self._slow / calls, 3) if calls else 0.0
+        }
+
+
+class OutlierDetector:
+    """Ejects individual endpoints of a service that fail repeatedly or run much slower than their peers.
+
+    Ejection lasts ``base_ejection_seconds`` times the number of times the
+    endpoint has been ejected, and never removes more than
+    ``max_ejection_percent`` of the endpoints, so a single-replica service is
+    left to its circuit breaker.
+    """
+
+    def __init__(self, service: str, consecutive_failures: int = 5, latency_factor: float = 3.0,
+                 base_ejection_seconds: float = 30.0, max_ejection_percent: float = 50.0, ewma_alpha: float = 0.2,
+                 clock=time.monotonic):
+        self.service = service
+        self.clock = clock
+        self.consecutive_failures = consecutive_failures
+        self.latency_factor = latency_factor
+        self.base_ejection_seconds = base_ejection_seconds
+        self.max_ejection_percent = max_ejection_percent
+        self.ewma_alpha = ewma_alpha
+        self._endpoints = {}
+
+    def _stats(self, endpoint: str) -> dict:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = {"ewma": None, "failures": 0, "ejected_until": 0.0, "ejections": 0}
+            self._endpoints[endpoint] = stats
+        return stats
+
+    def is_ejected(self, endpoint: str) -> bool:
+        stats = self._endpoints.get(endpoint)
+        if stats is None or not stats["ejected_until"]:
+            return False
+        if stats["ejected_until"] > self.clock():
+            return True
+        stats["ejected_until"] = 0.0
+        stats["failures"] = 0
+        OUTLIER_EJECTED.labels(self.service, endpoint).set(0)
+        logger.info("↩️ Endpoint returned to rotation", service=self.service, endpoint=endpoint)
+        return False
+
+    def _can_eject(self) -> bool:
+        ejected = sum(1 for endpoint in self._endpoints if self.is_ejected(endpoint))
+        return (ejected + 1) * 100 <= self.max_ejection_percent * len(self._endpoints)
+
+    def _eject(self, endpoint: str, stats: dict, reason: str):
+        if not self._can_eject():
+            return
+        stats["ejections"] += 1
+        stats["ejected_until"] = self.clock() + self.base_ejection_seconds * stats["ejections"]
+        OUTLIER_EJECTIONS.labels(self.service, reason).inc()
+        OUTLIER_EJECTED.labels(self.service, endpoint).set(1)
+        logger.warning("🚫 Endpoint ejected", service=self.service, endpoint=endpoint, reason=reason,
+                       seconds=self.base_ejection_seconds * stats["ejections"])
+
+    def record(self, endpoint: str, failed: bool, elapsed: float):
+        stats = self._stats(endpoint)
+        stats["ewma"] = elapsed if stats["ewma"] is None else (
+            self.ewma_alpha * elapsed + (1 - self.ewma_alpha) * stats["ewma"]
+        )
+        stats["failures"] = stats["failures"] + 1 if failed else 0
+        if self.is_ejected(endpoint):
+            return
+
+        if stats["failures"] >= self.consecutive_failures:
+            self._eject(endpoint, stats, "failures")
+            return
+
+        peers = [s["ewma"] for e, s in self._endpoints.items() if e != endpoint and s["ewma"] is not None]
+        if peers:
+            peers.sort()
+            median = peers[len(peers) // 2]
+            if median > 0 and stats["ewma"] > self.latency_factor * median:
+                self._eject(endpoint, stats, "latency")
+
+    def snapshot(self) -> dict:
+        return {
+            endpoint: {
+                "ejected": self.is_ejected(endpoint),
+                "latency_ewma": round(stats["ewma"], 4) if stats["ewma"] is not None else None,
+                "consecutive_failures": stats["failures"],
+                "ejections": stats["ejections"]
+            }
+            for endpoint, stats in list(self._endpoints.items())
+        }
@@ -0,0 +1,104 @@
+from collections import deque
+from datetime import datetime
+import asyncio
+import os
+import time
+import structlog
+
+from metrics import UPSTREAM_HEALTHY, UPSTREAM_HEALTH_CHECK_DURATION
+
+logger = structlog.get_logger()
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+HEALTH_HISTORY_SIZE = int(os.getenv("HEALTH_HISTORY_SIZE", "20"))
+
+
+class ServiceHealth:
+    """Latest probe result and recent latency history for one upstream"""
+
+    def __init__(self, history_size: int):
+        self.status = "unknown"
+        self.error = None
+        self.response_time = None
+        self.last_checked = None
+        self.last_change = None
+        self.history = deque(maxlen=history_size)
+
+    def record(self, status: str, response_time: float, error: str = None):
+        now = datetime.now().isoformat()
+        if status != self.status:
+            self.last_change = now
+        self.status = status
+        self.error = error
+        self.response_time = response_time
+        self.last_checked = now
+        self.history.append(round(response_time, 4))
+
+    def snapshot(self) -> dict:
+        result = {
+            "status": self.status,
+            "response_time": self.response_time,
+            "last_checked": self.last_checked,
+            "last_change": self.last_change,
+            "latency_history": list(self.history)
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class HealthMonitor:
+    """Probes every upstream concurrently in the background and caches the results.
+
+    ``/health`` reads the cached snapshot, so its latency no longer depends on
+    how many upstreams are slow or down.
+    """
+
+    def __init__(self, upstreams, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT,
+                 history_size: int = HEALTH_HISTORY_SIZE):
+        self.upstreams = upstreams
+        self.interval = interval
+        self.timeout = timeout
+        self.services = {name: ServiceHealth(history_size) for name in upstreams.configs}
+        self._task = None
+
+    async def _probe(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            response = await self.upstreams.client(name).get("/health", timeout=self.timeout)
+            status = "healthy" if response.status_code == 200 else "unhealthy"
+            error = None if status == "healthy" else f"HTTP {response.status_code}"
+        except Exception as e:
+            status, error = "unhealthy", str(e) or type(e).__name__
+        elapsed = time.perf_counter() - start_time
+
+        previous = self.services[name].status
+        self.services[name].record(status, elapsed, error)
+        UPSTREAM_HEALTHY.labels(name).set(1 if status == "healthy" else 0)
+        UPSTREAM_HEALTH_CHECK_DURATION.labels(name).observe(elapsed)
+        if status != previous:
+            log = logger.info if status == "healthy" else logger.warning
+            log("🩺 Upstream health changed", service=name, previous=previous, status=status, error=error)
+
+    async def refresh(self):
+        await asyncio.gather(*(self._probe(name) for name in self.services))
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> dict:
+        return {name: health.snapshot() for name, health in self.services.items()}
@@ -0,0 +1,136 @@
+from collections import deque
+import asyncio
+import random
+import socket
+import httpx
+import structlog
+
+from metrics import ENDPOINT_IN_FLIGHT, ENDPOINT_REQUESTS
+
+logger = structlog.get_logger()
+
+
+class Endpoint:
+    """One replica of an upstream service and its outstanding request count"""
+
+    def __init__(self, service: str, url: str, host_header: str = None):
+        self.service = service
+        self.url = httpx.URL(url)
+        self.label = url
+        self.host_header = host_header
+        self.in_flight = 0
+
+    def acquire(self):
+        self.in_flight += 1
+        ENDPOINT_IN_FLIGHT.labels(self.service, self.label).set(self.in_flight)
+        ENDPOINT_REQUESTS.labels(self.service, self.label).inc()
+
+    def release(self):
+        self.in_flight -= 1
+        ENDPOINT_IN_FLIGHT.labels(self.service, self.label).set(self.in_flight)
+
+
+class EndpointSet:
+    """The replicas of one service, from a static list or DNS A records, plus the balancing policy.
+
+    ``p2c`` samples two non-ejected endpoints and takes the one with fewer
+    requests in flight; ``least_requests`` scans them all.
+    """
+
+    def __init__(self, service: str, base_url: str, static_urls: list = None, dns_name: str = None,
+                 policy: str = "p2c"):
+        self.service = service
+        self.base_url = httpx.URL(base_url)
+        self.dns_name = dns_name
+        self.policy = policy
+        urls = static_urls or [base_url]
+        self.endpoints = [Endpoint(service, url) for url in urls]
+
+    async def resolve(self):
+        """Refresh endpoints from DNS, keeping counters for addresses that are still present"""
+        if not self.dns_name:
+            return
+        port = self.base_url.port or 80
+        loop = asyncio.get_running_loop()
+        try:
+            records = await loop.getaddrinfo(self.dns_name, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            logger.warning("⚠️ Endpoint DNS lookup failed, keeping previous endpoints",
+                           service=self.service, dns_name=self.dns_name, error=str(e))
+            return
+
+        addresses = sorted({record[4][0] for record in records})
+        if not addresses:
+            return
+        current = {endpoint.label: endpoint for endpoint in self.endpoints}
+        endpoints = []
+        for address in addresses:
+            host = f"[{address}]" if ":" in address else address
+            url = f"{self.base_url.scheme}://{host}:{port}"
+            endpoints.append(current.get(url) or Endpoint(self.service, url, host_header=self.base_url.netloc.decode()))
+
+        if [e.label for e in endpoints] != [e.label for e in self.endpoints]:
+            logger.info("🔁 Upstream endpoints changed", service=self.service, endpoints=[e.label for e in endpoints])
+        self.endpoints = endpoints
+
+    def pick(self, is_ejected, exclude: Endpoint = None) -> Endpoint:
+        endpoints = [endpoint for endpoint in self.endpoints if endpoint is not exclude] or self.endpoints
+        candidates = [endpoint for endpoint in endpoints if not is_ejected(endpoint.label)] or endpoints
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.policy == "least_requests":
+            fewest = min(endpoint.in_flight for endpoint in candidates)
+            return random.choice([endpoint for endpoint in candidates if endpoint.in_flight == fewest])
+        first, second = random.sample(candidates, 2)
+        return first if first.in_flight <= second.in_flight else second
+
+    def route(self, request: httpx.Request, endpoint: Endpoint):
+        """Point a request built against the service base URL at a specific endpoint"""
+        request.url = request.url.copy_with(scheme=endpoint.url.scheme, host=endpoint.url.host, port=endpoint.url.port)
+        request.headers["Host"] = endpoint.host_header or endpoint.url.netloc.decode()
+
+
+class LatencyTracker:
+    """Recent latencies of one service with a percentile that is recomputed every few samples"""
+
+    def __init__(self, percentile: float = 95, size: int = 256, recompute_every: int = 32):
+        self.percentile = percentile
+        self.recompute_every = recompute_every
+        self._samples = deque(maxlen=size)
+        self._since_recompute = 0
+        self._value = None
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self._since_recompute += 1
+        if self._value is None or self._since_recompute >= self.recompute_every:
+            ordered = sorted(self._samples)
+            self._value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+            self._since_recompute = 0
+
+    def __len__(self):
+        return len(self._samples)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class TrackedStream(httpx.AsyncByteStream):
+    """Response stream that runs a callback once when it is closed"""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close:
+                self._on_close()
+                self._on_close = None
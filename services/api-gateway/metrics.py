@@ -0,0 +1,119 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Upstream client metrics
+UPSTREAM_REQUESTS = Counter(
+    'gateway_upstream_requests_total',
+    'Requests sent from the gateway to an upstream service',
+    ['service', 'method', 'status']
+)
+UPSTREAM_LATENCY = Histogram(
+    'gateway_upstream_latency_seconds',
+    'Time from sending an upstream request to receiving its response headers',
+    ['service'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+UPSTREAM_CONNECTIONS_OPENED = Counter(
+    'gateway_upstream_connections_opened_total',
+    'New TCP connections opened to an upstream; compare with requests for the reuse ratio',
+    ['service']
+)
+
+# Rate limiting metrics
+RATE_LIMITED = Counter(
+    'gateway_rate_limited_total',
+    'Requests rejected by the gateway rate limiter',
+    ['bucket']
+)
+RATE_LIMIT_TRACKED_KEYS = Gauge(
+    'gateway_rate_limit_tracked_keys',
+    'Client/route buckets currently held by the local rate limiter'
+)
+
+# Upstream health metrics
+UPSTREAM_HEALTHY = Gauge(
+    'gateway_upstream_healthy',
+    'Whether the last background health probe of an upstream succeeded',
+    ['service']
+)
+UPSTREAM_HEALTH_CHECK_DURATION = Histogram(
+    'gateway_upstream_health_check_seconds',
+    'Duration of background upstream health probes',
+    ['service'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+
+# Circuit breaker and outlier ejection metrics
+CIRCUIT_STATE = Gauge(
+    'gateway_circuit_state',
+    'Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)',
+    ['service']
+)
+CIRCUIT_TRANSITIONS = Counter(
+    'gateway_circuit_transitions_total',
+    'Circuit breaker state transitions',
+    ['service', 'from_state', 'to_state']
+)
+CIRCUIT_REJECTED = Counter(
+    'gateway_circuit_rejected_total',
+    'Requests failed fast because the upstream circuit was open',
+    ['service']
+)
+OUTLIER_EJECTIONS = Counter(
+    'gateway_outlier_ejections_total',
+    'Endpoints ejected from rotation',
+    ['service', 'reason']
+)
+OUTLIER_EJECTED = Gauge(
+    'gateway_outlier_ejected',
+    'Whether an upstream endpoint is currently ejected',
+    ['service', 'endpoint']
+)
+
+# Load balancing metrics
+ENDPOINT_IN_FLIGHT = Gauge(
+    'gateway_endpoint_in_flight',
+    'Requests currently outstanding to an upstream endpoint',
+    ['service', 'endpoint']
+)
+ENDPOINT_REQUESTS = Counter(
+    'gateway_endpoint_requests_total',
+    'Requests sent to an upstream endpoint',
+    ['service', 'endpoint']
+)
+
+# Response cache metrics
+RESPONSE_CACHE_REQUESTS = Counter(
+    'gateway_response_cache_requests_total',
+    'Cacheable GET requests by outcome (hit, miss, coalesced, not_modified)',
+    ['route', 'result']
+)
+RESPONSE_CACHE_ENTRIES = Gauge(
+    'gateway_response_cache_entries',
+    'Responses currently held in the gateway cache'
+)
+RESPONSE_CACHE_EVICTIONS = Counter(
+    'gateway_response_cache_evictions_total',
+    'Responses evicted from the gateway cache to stay within its size bounds'
+)
+
+# Deadline and hedging metrics
+DEADLINE_EXCEEDED = Counter(
+    'gateway_deadline_exceeded_total',
+    'Upstream calls that ran out of the propagated request deadline',
+    ['service']
+)
+HEDGES_SENT = Counter(
+    'gateway_hedged_requests_total',
+    'Hedge requests sent to a second replica after the hedge delay',
+    ['service']
+)
+HEDGE_WINS = Counter(
+    'gateway_hedge_wins_total',
+    'Which attempt of a hedged request answered first',
+    ['service', 'winner']
+)
+HEDGE_WASTED_SECONDS = Counter(
+    'gateway_hedge_wasted_seconds_total',
+    'Time losing hedge attempts spent in flight before being cancelled',
+    ['service']
+)
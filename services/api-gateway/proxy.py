@@ -0,0 +1,188 @@
+from typing import NamedTuple
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+import math
+import os
+import time
+import httpx
+import structlog
+
+from circuit_breaker import CircuitOpen
+from metrics import RESPONSE_CACHE_REQUESTS, DEADLINE_EXCEEDED
+from response_cache import etag_matches
+from common import tracing
+
+logger = structlog.get_logger()
+
+# Connection-level headers that must not be forwarded by a proxy (RFC 9110 section 7.6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host"
+}
+
+BODYLESS_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Validators the gateway answers itself for cached routes
+CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since"}
+
+# Remaining time budget in milliseconds; clients may send it, the gateway always forwards it
+DEADLINE_HEADER = "x-request-timeout-ms"
+# Taken off the forwarded budget so the upstream gives up slightly before the gateway does
+DEADLINE_MARGIN_SECONDS = float(os.getenv("DEADLINE_MARGIN_MS", "50")) / 1000.0
+
+
+class Route(NamedTuple):
+    method: str
+    path: str
+    service: str
+    upstream_path: str
+    cache_ttl: float = 0
+    hedge: bool = False
+
+
+def _filter_headers(headers) -> list:
+    """Header pairs minus hop-by-hop ones; repeated headers such as Set-Cookie stay separate"""
+    # httpx merges repeats in items() but not multi_items(); Starlette's items() already keeps them
+    pairs = headers.multi_items() if isinstance(headers, httpx.Headers) else headers.items()
+    return [(name, value) for name, value in pairs if name.lower() not in HOP_BY_HOP_HEADERS]
+
+
+def _with_headers(response: Response, headers: list) -> Response:
+    for name, value in headers:
+        response.headers.append(name, value)
+    return response
+
+
+async def _relay(response: httpx.Response):
+    """Raw upstream body that closes the response even when the client goes away mid-stream"""
+    # Starlette skips the background task when sending to the client fails
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+def request_budget(request: Request, default: float) -> float:
+    """Seconds the client is willing to wait, capped at the upstream's own read timeout"""
+    value = request.headers.get(DEADLINE_HEADER)
+    try:
+        return min(default, float(value) / 1000.0) if value else default
+    except ValueError:
+        return default
+
+
+async def send_upstream(request: Request, upstreams, service: str, upstream_path: str,
+                        stream: bool = True, drop_headers: set = frozenset(), hedge: bool = False) -> httpx.Response:
+    """Forward the incoming request, translating upstream failures into gateway HTTP errors.
+
+    The call is bounded by the client's deadline, and the time left is
+    forwarded so the upstream can stop work the client no longer waits for.
+    """
+    url = upstream_path.format(**request.path_params)
+    if request.url.query:
+        url = f"{url}?{request.url.query}"
+
+    config = upstreams.configs[service]
+    if not hasattr(request.state, "deadline"):
+        request.state.deadline = time.monotonic() + request_budget(request, config.read_timeout)
+    budget = request.state.deadline - time.monotonic()
+    if budget <= 0:
+        DEADLINE_EXCEEDED.labels(service).inc()
+        raise HTTPException(status_code=504, detail=f"Deadline exceeded before calling {service} service")
+
+    headers = httpx.Headers([(name, value) for name, value in _filter_headers(request.headers)
+                             if name.lower() not in drop_headers])
+    headers[DEADLINE_HEADER] = str(int(max(0.0, budget - DEADLINE_MARGIN_SECONDS) * 1000))
+
+    # Covers the time to response headers; streamed bodies are relayed after the span ends
+    with tracing.span(f"upstream {service}", kind="client", service=service, path=upstream_path) as upstream_span:
+        tracing.inject(headers)
+        upstream_request = upstreams.client(service).build_request(
+            request.method,
+            url,
+            headers=headers,
+            content=None if request.method in BODYLESS_METHODS else request.stream(),
+            timeout=httpx.Timeout(budget, connect=min(config.connect_timeout, budget))
+        )
+        try:
+            response = await upstreams.send(service, upstream_request, stream=stream, hedge=hedge)
+        except CircuitOpen as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"{service} service unavailable (circuit open)",
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        except httpx.TimeoutException as e:
+            DEADLINE_EXCEEDED.labels(service).inc()
+            logger.warning("⏱️ Upstream timed out", service=service, path=url, budget_seconds=budget, error=str(e))
+            raise HTTPException(status_code=504, detail=f"{service} service timed out")
+        except httpx.HTTPError as e:
+            logger.error("❌ Upstream request failed", service=service, path=url, error=str(e))
+            raise HTTPException(status_code=502, detail=f"{service} service error: {str(e)}")
+        upstream_span.set_attribute("http.status_code", response.status_code)
+        return response
+
+
+async def proxy_request(request: Request, upstreams, service: str, upstream_path: str, hedge: bool = False):
+    """Stream the request body upstream and the upstream response back without parsing either"""
+    response = await send_upstream(request, upstreams, service, upstream_path, hedge=hedge)
+    try:
+        return _with_headers(StreamingResponse(
+            _relay(response),
+            status_code=response.status_code,
+            background=BackgroundTask(response.aclose)
+        ), _filter_headers(response.headers))
+    except BaseException:
+        await response.aclose()
+        raise
+
+
+async def cached_proxy_request(request: Request, upstreams, route: Route, response_cache):
+    """Serve a GET from the response cache, answering If-None-Match with 304 when the ETag still matches"""
+    # Credentialed requests may get per-user responses, so they always go upstream
+    if "authorization" in request.headers or "cookie" in request.headers:
+        return await proxy_request(request, upstreams, route.service, route.upstream_path, route.hedge)
+
+    async def fetch():
+        response = await send_upstream(request, upstreams, route.service, route.upstream_path,
+                                       stream=False, drop_headers=CONDITIONAL_HEADERS, hedge=route.hedge)
+        return response.status_code, _filter_headers(response.headers), response.content
+
+    key = (request.url.path, request.url.query)
+    entry, result = await response_cache.get_or_fetch(key, route.path, route.cache_ttl, fetch)
+    headers = entry.headers + [("etag", entry.etag), ("x-cache", "MISS" if result == "miss" else "HIT")]
+
+    if entry.status_code == 200 and etag_matches(request.headers.get("if-none-match"), entry.etag):
+        RESPONSE_CACHE_REQUESTS.labels(route.path, "not_modified").inc()
+        headers = [(name, value) for name, value in headers if name.lower() != "content-type"]
+        return _with_headers(Response(status_code=304), headers)
+    return _with_headers(Response(content=entry.body, status_code=entry.status_code), headers)
+
+
+def register_routes(app: FastAPI, routes: list, upstreams, response_cache=None):
+    """Add one streaming proxy endpoint per route table entry; GET routes with a cache_ttl go through the cache"""
+    for route in routes:
+        def make_endpoint(route: Route):
+            if route.method == "GET" and route.cache_ttl > 0 and response_cache is not None:
+                async def endpoint(request: Request):
+                    return await cached_proxy_request(request, upstreams, route, response_cache)
+                return endpoint
+
+            async def endpoint(request: Request):
+                response = await proxy_request(request, upstreams, route.service, route.upstream_path, route.hedge)
+                if response_cache is not None and route.method not in BODYLESS_METHODS and response.status_code < 400:
+                    # A write to /api/<collection>/... makes cached reads of that collection stale
+                    response_cache.invalidate_prefix("/".join(request.url.path.split("/")[:3]))
+                return response
+            return endpoint
+
+        if route.service not in upstreams.configs:
+            raise ValueError(f"Route {route.method} {route.path} targets unknown service '{route.service}'")
+        app.add_api_route(
+            route.path,
+            make_endpoint(route),
+            methods=[route.method],
+            summary=f"Proxy to {route.service}{route.upstream_path}"
+        )
@@ -0,0 +1,197 @@
+from collections import OrderedDict
+from typing import NamedTuple
+import asyncio
+import os
+import time
+import structlog
+
+from metrics import RATE_LIMITED, RATE_LIMIT_TRACKED_KEYS
+
+logger = structlog.get_logger()
+
+
+class RateLimit(NamedTuple):
+    per_minute: float
+    burst: int
+
+
+DEFAULT_RATE_LIMIT = RateLimit(float(os.getenv("RATE_LIMIT", "100")), int(os.getenv("RATE_LIMIT_BURST", "100")))
+
+# Longest matching prefix wins; anything unmatched gets DEFAULT_RATE_LIMIT.
+# Every route keeps the default unless RATE_LIMITS opts a prefix into its own
+# limit, e.g. RATE_LIMITS="/api/transcribe=30:10,/api/code=30:10"
+ROUTE_RATE_LIMITS = {}
+
+# Never throttled, so probes and scrapes keep working under load
+EXEMPT_PATHS = {"/health", "/metrics"}
+
+
+def parse_rate_limits(spec: str) -> dict:
+    """Parse RATE_LIMITS env syntax: "/api/transcribe=30:10,/api/documents=300" (per minute[:burst])"""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        prefix, value = entry.split("=", 1)
+        per_minute, _, burst = value.partition(":")
+        limits[prefix.strip()] = RateLimit(float(per_minute), int(burst or per_minute))
+    return limits
+
+
+if os.getenv("RATE_LIMITS"):
+    ROUTE_RATE_LIMITS.update(parse_rate_limits(os.getenv("RATE_LIMITS")))
+
+
+def limit_for_path(path: str) -> tuple:
+    """Return (bucket name, limit) for a request path"""
+    best = None
+    for prefix in ROUTE_RATE_LIMITS:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    if best is None:
+        return "default", DEFAULT_RATE_LIMIT
+    return best, ROUTE_RATE_LIMITS[best]
+
+
+class LocalBackend:
+    """In-process token buckets; constant work per request and bounded key count.
+
+    Buckets live in an OrderedDict kept in last-use order, so the janitor only
+    walks the idle head of the dict and the oldest key is evicted first when
+    ``max_keys`` is reached.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        """Consume one token; return 0 if allowed, else seconds until a token is available"""
+        now = self.clock()
+        rate = limit.per_minute / 60.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            bucket = [float(limit.burst), now]
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(limit.burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+    async def evict_idle(self, idle_seconds: float) -> int:
+        cutoff = self.clock() - idle_seconds
+        evicted = 0
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[1] > cutoff:
+                break
+            self._buckets.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Atomic token bucket: KEYS[1] bucket hash; ARGV rate per second, burst, now, ttl
+REDIS_TOKEN_BUCKET = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by all gateway replicas; Redis key TTLs do the janitor's job"""
+
+    def __init__(self, url: str, idle_seconds: float):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(REDIS_TOKEN_BUCKET)
+        self.idle_seconds = int(idle_seconds)
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        wait = await self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[limit.per_minute / 60.0, limit.burst, time.time(), self.idle_seconds]
+        )
+        return float(wait)
+
+    async def evict_idle(self, idle_seconds: float) -> int:
+        return 0
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def __len__(self):
+        return 0
+
+
+class RateLimiter:
+    """Per-client, per-route token bucket limiter with a background janitor"""
+
+    def __init__(self, backend=None, idle_seconds: float = None, janitor_interval: float = None):
+        self.idle_seconds = idle_seconds or float(os.getenv("RATE_LIMIT_IDLE_SECONDS", "300"))
+        self.janitor_interval = janitor_interval or float(os.getenv("RATE_LIMIT_JANITOR_INTERVAL", "60"))
+        self.backend = backend if backend is not None else LocalBackend(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+        self._janitor = None
+
+    @classmethod
+    def from_env(cls):
+        limiter = cls()
+        if os.getenv("RATE_LIMIT_REDIS_URL"):
+            limiter.backend = RedisBackend(os.getenv("RATE_LIMIT_REDIS_URL"), limiter.idle_seconds)
+        return limiter
+
+    async def check(self, client_id: str, path: str) -> float:
+        """Return 0 if the request may proceed, else the Retry-After in seconds"""
+        if path in EXEMPT_PATHS:
+            return 0.0
+        bucket_name, limit = limit_for_path(path)
+        try:
+            wait = await self.backend.take(f"{client_id}:{bucket_name}", limit)
+        except Exception as e:
+            # A broken shared backend should not take the gateway down with it
+            logger.error("❌ Rate limit backend failed, allowing request", error=str(e))
+            return 0.0
+        if wait > 0:
+            RATE_LIMITED.labels(bucket_name).inc()
+        return wait
+
+    async def _run_janitor(self):
+        while True:
+            await asyncio.sleep(self.janitor_interval)
+            evicted = await self.backend.evict_idle(self.idle_seconds)
+            RATE_LIMIT_TRACKED_KEYS.set(len(self.backend))
+            if evicted:
+                logger.info("🧹 Evicted idle rate limit buckets", evicted=evicted, remaining=len(self.backend))
+
+    def start(self):
+        self._janitor = asyncio.create_task(self._run_janitor())
+
+    async def close(self):
+        if self._janitor:
+            self._janitor.cancel()
+            try:
+                await self._janitor
+            except asyncio.CancelledError:
+                pass
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from typing import NamedTuple
+import asyncio
+import hashlib
+import os
+import time
+import structlog
+
+from metrics import RESPONSE_CACHE_REQUESTS, RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_EVICTIONS
+
+logger = structlog.get_logger()
+
+# Headers recomputed when a cached body is served
+DROPPED_HEADERS = {"content-length", "content-encoding", "etag", "date"}
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: list
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def is_cacheable(status_code: int, headers: list) -> bool:
+    cache_control = ",".join(value for name, value in headers if name.lower() == "cache-control").lower()
+    return status_code == 200 and "no-store" not in cache_control and "private" not in cache_control
+
+
+class ResponseCache:
+    """Bounded LRU cache of upstream GET responses with request coalescing.
+
+    Concurrent misses for the same key share one upstream call. Entries are
+    dropped when their TTL passes, when the cache exceeds ``max_entries`` or
+    ``max_bytes`` (least recently used first), or when a write goes through
+    the same resource collection. A fetch that was already in flight when
+    its collection was invalidated is handed to its waiters but not stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, max_entry_bytes: int = 1024 * 1024,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        # Invalidation counter, and the value it had at the latest invalidation of each prefix
+        self._generation = 0
+        self._invalidated = {}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def _store(self, key, entry: CachedResponse):
+        self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            RESPONSE_CACHE_EVICTIONS.inc()
+        RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._remove(key)
+            RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def get_or_fetch(self, key, route_name: str, ttl: float, fetch) -> tuple:
+        """Return (CachedResponse, result) where result is hit, miss or coalesced.
+
+        ``fetch`` is an async callable returning (status_code, header pairs, body).
+        Uncacheable responses are still shared with coalesced waiters but not stored.
+        """
+        while True:
+            entry = self._lookup(key)
+            if entry is not None:
+                RESPONSE_CACHE_REQUESTS.labels(route_name, "hit").inc()
+                return entry, "hit"
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                entry = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The leading request's client went away; retry unless we were cancelled ourselves
+                if pending.cancelled():
+                    continue
+                raise
+            RESPONSE_CACHE_REQUESTS.labels(route_name, "coalesced").inc()
+            return entry, "coalesced"
+
+        RESPONSE_CACHE_REQUESTS.labels(route_name, "miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        started = self._generation
+        try:
+            status_code, headers, body = await fetch()
+            headers = [(name, value) for name, value in headers if name.lower() not in DROPPED_HEADERS]
+            entry = CachedResponse(status_code, headers, body, compute_etag(body), self.clock() + ttl)
+            if (is_cacheable(status_code, headers) and len(body) <= self.max_entry_bytes
+                    and not self._invalidated_since(key, started)):
+                self._store(key, entry)
+            future.set_result(entry)
+            return entry, "miss"
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody waited on is not reported as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _invalidated_since(self, key, generation: int) -> bool:
+        return any(key[0].startswith(prefix) for prefix, invalidated in self._invalidated.items()
+                   if invalidated > generation)
+
+    def invalidate_prefix(self, path_prefix: str):
+        # Prefixes are resource collections, so this dict stays as small as the route table
+        self._generation += 1
+        self._invalidated[path_prefix] = self._generation
+        stale = [key for key in self._entries if key[0].startswith(path_prefix)]
+        for key in stale:
+            self._remove(key)
+        if stale:
+            RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+            logger.info("🧹 Invalidated cached responses", prefix=path_prefix, entries=len(stale))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "inflight": len(self._inflight)}
+
+
+def create_response_cache() -> ResponseCache:
+    return ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        max_entry_bytes=int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+    )
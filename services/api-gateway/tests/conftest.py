@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules import each other flat (``from metrics import ...``), as they do when the service runs,
+# so run each service's tests on their own: python -m pytest services/api-gateway/tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,108 @@
+import pytest
+
+from circuit_breaker import BreakerConfig, CircuitBreaker, CircuitOpen, CLOSED, HALF_OPEN, OPEN
+
+
+def make_breaker(clock, **overrides) -> CircuitBreaker:
+    config = dict(failure_rate=0.5, slow_call_seconds=1.0, slow_call_rate=0.8, window=10,
+                  min_calls=4, open_seconds=30.0, half_open_probes=2)
+    config.update(overrides)
+    return CircuitBreaker("test", BreakerConfig(**config), clock=clock)
+
+
+def call(breaker: CircuitBreaker, failed: bool = False, elapsed: float = 0.01):
+    breaker.before_call()
+    breaker.record(failed, elapsed)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.config.min_calls):
+        call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        call(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_failure_rate(clock):
+    breaker = make_breaker(clock)
+    call(breaker)
+    call(breaker)
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+    call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_opens_at_slow_call_rate(clock):
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        call(breaker, elapsed=2.0)
+    assert breaker.state == OPEN
+
+
+def test_window_forgets_old_outcomes(clock):
+    breaker = make_breaker(clock, window=4, min_calls=4)
+    call(breaker, failed=True)
+    for _ in range(6):
+        call(breaker)
+    call(breaker, failed=True)
+    assert breaker.snapshot()["failure_rate"] == 0.25
+    assert breaker.state == CLOSED
+
+
+def test_open_rejects_until_open_seconds_pass(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 10
+    with pytest.raises(CircuitOpen) as rejected:
+        breaker.before_call()
+    assert rejected.value.retry_after == pytest.approx(20.0)
+
+    clock.now += 20
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_limits_probes_and_closes_after_successes(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record(False, 0.01)
+    assert breaker.state == HALF_OPEN
+    breaker.record(False, 0.01)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 0
+
+
+def test_failed_or_slow_probe_reopens(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+    call(breaker, failed=True)
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+
+    clock.now += 30
+    call(breaker, elapsed=5.0)
+    assert breaker.state == OPEN
+
+
+def test_abandoned_probe_frees_its_slot(clock):
+    breaker = make_breaker(clock, half_open_probes=1)
+    trip(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.abandon()
+    breaker.before_call()
+    breaker.record(False, 0.01)
+    assert breaker.state == CLOSED
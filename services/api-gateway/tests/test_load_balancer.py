@@ -0,0 +1,104 @@
+from circuit_breaker import OutlierDetector
+from load_balancer import EndpointSet
+
+URLS = ["http://10.0.0.1:8001", "http://10.0.0.2:8001", "http://10.0.0.3:8001"]
+
+
+def never_ejected(label: str) -> bool:
+    return False
+
+
+def make_set(policy: str = "p2c", in_flight=(0, 0, 0)) -> EndpointSet:
+    endpoints = EndpointSet("test", URLS[0], static_urls=URLS, policy=policy)
+    for endpoint, count in zip(endpoints.endpoints, in_flight):
+        endpoint.in_flight = count
+    return endpoints
+
+
+def test_p2c_never_picks_the_busiest_endpoint():
+    endpoints = make_set(in_flight=(0, 1, 5))
+    picked = {endpoints.pick(never_ejected).label for _ in range(200)}
+    assert URLS[2] not in picked
+    assert URLS[0] in picked
+
+
+def test_p2c_between_two_takes_fewer_in_flight():
+    endpoints = make_set(in_flight=(3, 1, 0))
+    busy = endpoints.endpoints[2]
+    for _ in range(50):
+        assert endpoints.pick(never_ejected, exclude=busy).label == URLS[1]
+
+
+def test_least_requests_scans_every_endpoint():
+    endpoints = make_set(policy="least_requests", in_flight=(2, 0, 1))
+    for _ in range(50):
+        assert endpoints.pick(never_ejected).label == URLS[1]
+
+
+def test_pick_skips_ejected_endpoints():
+    endpoints = make_set(in_flight=(5, 5, 0))
+    for _ in range(50):
+        assert endpoints.pick(lambda label: label == URLS[2]).label != URLS[2]
+
+
+def test_pick_falls_back_when_everything_is_ejected():
+    endpoints = make_set()
+    assert endpoints.pick(lambda label: True).label in URLS
+
+
+def test_ejects_after_consecutive_failures(clock):
+    detector = OutlierDetector("test", consecutive_failures=3, clock=clock)
+    for url in URLS:
+        detector.record(url, False, 0.1)
+    detector.record(URLS[0], True, 0.1)
+    detector.record(URLS[0], True, 0.1)
+    detector.record(URLS[0], False, 0.1)
+    detector.record(URLS[0], True, 0.1)
+    detector.record(URLS[0], True, 0.1)
+    assert not detector.is_ejected(URLS[0])
+    detector.record(URLS[0], True, 0.1)
+    assert detector.is_ejected(URLS[0])
+
+
+def test_ejects_slow_endpoint_against_peer_median(clock):
+    detector = OutlierDetector("test", latency_factor=3.0, ewma_alpha=1.0, clock=clock)
+    detector.record(URLS[0], False, 0.1)
+    detector.record(URLS[1], False, 0.1)
+    detector.record(URLS[2], False, 0.25)
+    assert not detector.is_ejected(URLS[2])
+    detector.record(URLS[2], False, 0.5)
+    assert detector.is_ejected(URLS[2])
+
+
+def test_max_ejection_percent_keeps_endpoints_in_rotation(clock):
+    detector = OutlierDetector("test", consecutive_failures=1, max_ejection_percent=50.0, clock=clock)
+    for url in URLS:
+        detector.record(url, False, 0.1)
+    for url in URLS:
+        detector.record(url, True, 0.1)
+    assert [detector.is_ejected(url) for url in URLS] == [True, False, False]
+
+
+def test_single_endpoint_is_never_ejected(clock):
+    detector = OutlierDetector("test", consecutive_failures=1, clock=clock)
+    detector.record(URLS[0], True, 0.1)
+    assert not detector.is_ejected(URLS[0])
+
+
+def test_ejection_expires_and_grows_with_each_ejection(clock):
+    detector = OutlierDetector("test", consecutive_failures=1, base_ejection_seconds=30.0, clock=clock)
+    detector.record(URLS[1], False, 0.1)
+    detector.record(URLS[2], False, 0.1)
+
+    detector.record(URLS[0], True, 0.1)
+    clock.now += 29
+    assert detector.is_ejected(URLS[0])
+    clock.now += 1
+    assert not detector.is_ejected(URLS[0])
+
+    detector.record(URLS[0], True, 0.1)
+    clock.now += 59
+    assert detector.is_ejected(URLS[0])
+    clock.now += 1
+    assert not detector.is_ejected(URLS[0])
+    assert detector.snapshot()[URLS[0]]["ejections"] == 2
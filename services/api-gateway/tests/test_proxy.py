@@ -0,0 +1,63 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import httpx
+import pytest
+
+from proxy import Route, register_routes
+from response_cache import ResponseCache
+from upstream import UpstreamClients
+
+COOKIES = [("set-cookie", "session=1; Path=/"), ("set-cookie", "theme=dark; Path=/")]
+
+
+def make_gateway(handler) -> TestClient:
+    upstreams = UpstreamClients({"docs": "http://docs:8006"})
+    upstreams._clients["docs"] = httpx.AsyncClient(base_url="http://docs:8006", transport=httpx.MockTransport(handler))
+    app = FastAPI()
+    app.state.upstreams = upstreams
+    register_routes(app, [
+        Route("GET", "/api/documents/{id}", "docs", "/documents/{id}"),
+        Route("GET", "/api/documents", "docs", "/documents", cache_ttl=60)
+    ], upstreams, ResponseCache())
+    return TestClient(app)
+
+
+def test_repeated_headers_are_forwarded_both_ways():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get_list("x-tag"))
+        # An explicit stream, since a response built from bytes is already read and cannot be relayed raw
+        return httpx.Response(200, headers=COOKIES, stream=httpx.ByteStream(b"{}"))
+
+    gateway = make_gateway(handler)
+    response = gateway.get("/api/documents/1", headers=[("x-tag", "a"), ("x-tag", "b")])
+    assert response.headers.get_list("set-cookie") == [value for _, value in COOKIES]
+    assert seen == [["a", "b"]]
+
+
+def test_cached_responses_keep_repeated_headers():
+    gateway = make_gateway(lambda request: httpx.Response(
+        200, headers=[("vary", "accept"), ("vary", "accept-language")], content=b"[]"))
+    first = gateway.get("/api/documents")
+    second = gateway.get("/api/documents")
+    assert second.headers["x-cache"] == "HIT"
+    for response in (first, second):
+        assert response.headers.get_list("vary") == ["accept", "accept-language"]
+
+
+class BrokenBody(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b"partial"
+        raise httpx.ReadError("upstream went away")
+
+
+@pytest.mark.parametrize("stream", [httpx.ByteStream(b"{}"), BrokenBody()])
+def test_streamed_responses_release_the_endpoint(stream):
+    gateway = make_gateway(lambda request: httpx.Response(200, stream=stream))
+    upstreams = gateway.app.state.upstreams
+    try:
+        gateway.get("/api/documents/1")
+    except httpx.ReadError:
+        pass
+    assert [endpoint.in_flight for endpoint in upstreams.endpoints["docs"].endpoints] == [0]
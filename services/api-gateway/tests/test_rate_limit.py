@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import LocalBackend, RateLimit, RateLimiter, limit_for_path, parse_rate_limits
+
+LIMIT = RateLimit(per_minute=60, burst=3)
+
+
+def take(backend: LocalBackend, key: str = "client:default", limit: RateLimit = LIMIT) -> float:
+    return asyncio.run(backend.take(key, limit))
+
+
+def test_burst_then_retry_after(clock):
+    backend = LocalBackend(clock=clock)
+    assert [take(backend) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert take(backend) == pytest.approx(1.0)
+
+
+def test_tokens_refill_at_the_per_minute_rate(clock):
+    backend = LocalBackend(clock=clock)
+    for _ in range(3):
+        take(backend)
+    clock.now += 0.5
+    assert take(backend) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert take(backend) == 0.0
+
+
+def test_refill_is_capped_at_burst(clock):
+    backend = LocalBackend(clock=clock)
+    take(backend)
+    clock.now += 3600
+    waits = [take(backend) for _ in range(4)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] > 0
+
+
+def test_max_keys_evicts_least_recently_used(clock):
+    backend = LocalBackend(max_keys=2, clock=clock)
+    take(backend, "a")
+    take(backend, "b")
+    take(backend, "a")
+    take(backend, "c")
+    assert list(backend._buckets) == ["a", "c"]
+
+
+def test_evict_idle_only_walks_the_idle_head(clock):
+    backend = LocalBackend(clock=clock)
+    take(backend, "old")
+    clock.now += 200
+    take(backend, "recent")
+    clock.now += 150
+    assert asyncio.run(backend.evict_idle(300)) == 1
+    assert list(backend._buckets) == ["recent"]
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("/api/transcribe=30:10, /api/documents=300") == {
+        "/api/transcribe": RateLimit(30.0, 10),
+        "/api/documents": RateLimit(300.0, 300)
+    }
+
+
+def test_longest_prefix_wins_and_default_covers_the_rest(monkeypatch):
+    monkeypatch.setattr(rate_limit, "ROUTE_RATE_LIMITS", parse_rate_limits("/api=100:100,/api/code=30:10"))
+    assert limit_for_path("/api/code/generate") == ("/api/code", RateLimit(30.0, 10))
+    assert limit_for_path("/api/transcribe") == ("/api", RateLimit(100.0, 100))
+    assert limit_for_path("/other") == ("default", rate_limit.DEFAULT_RATE_LIMIT)
+
+
+def test_exempt_paths_skip_the_backend(monkeypatch):
+    monkeypatch.setattr(rate_limit, "ROUTE_RATE_LIMITS", {})
+
+    class RecordingBackend:
+        def __init__(self):
+            self.keys = []
+
+        async def take(self, key, limit):
+            self.keys.append(key)
+            return 5.0
+
+    limiter = RateLimiter(backend=RecordingBackend())
+    assert asyncio.run(limiter.check("client", "/health")) == 0.0
+    assert asyncio.run(limiter.check("client", "/api/code")) == 5.0
+    assert limiter.backend.keys == ["client:default"]
+
+
+def test_broken_backend_allows_requests():
+    class BrokenBackend:
+        async def take(self, key, limit):
+            raise ConnectionError("redis down")
+
+    limiter = RateLimiter(backend=BrokenBackend())
+    assert asyncio.run(limiter.check("client", "/api/code")) == 0.0
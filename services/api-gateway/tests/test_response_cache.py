@@ -0,0 +1,124 @@
+import asyncio
+
+from response_cache import ResponseCache, compute_etag, etag_matches, is_cacheable
+
+KEY = ("/api/documents/1", "")
+
+
+def fetcher(body: bytes = b"doc", status_code: int = 200, headers: list = None):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return status_code, list(headers or [("content-type", "application/json")]), body
+
+    return fetch, calls
+
+
+def get(cache: ResponseCache, fetch, key=KEY, ttl: float = 60) -> tuple:
+    return asyncio.run(cache.get_or_fetch(key, "/api/documents/{id}", ttl, fetch))
+
+
+def test_etag_matching_is_weak_and_accepts_lists():
+    etag = compute_etag(b"doc")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_only_shareable_200s_are_cacheable():
+    assert is_cacheable(200, [])
+    assert not is_cacheable(404, [])
+    assert not is_cacheable(200, [("Cache-Control", "private, max-age=60")])
+    assert not is_cacheable(200, [("cache-control", "max-age=60"), ("cache-control", "no-store")])
+
+
+def test_hit_until_ttl_passes(clock):
+    cache = ResponseCache(clock=clock)
+    fetch, calls = fetcher()
+    entry, result = get(cache, fetch)
+    assert result == "miss"
+    assert entry.etag == compute_etag(b"doc")
+    clock.now += 59
+    assert get(cache, fetch)[1] == "hit"
+    clock.now += 1
+    assert get(cache, fetch)[1] == "miss"
+    assert len(calls) == 2
+
+
+def test_cached_headers_drop_what_is_recomputed(clock):
+    cache = ResponseCache(clock=clock)
+    fetch, _ = fetcher(headers=[("content-type", "text/plain"), ("content-length", "3"), ("etag", '"upstream"'),
+                                ("vary", "accept"), ("vary", "accept-encoding")])
+    entry, _ = get(cache, fetch)
+    assert entry.headers == [("content-type", "text/plain"), ("vary", "accept"), ("vary", "accept-encoding")]
+
+
+def test_concurrent_misses_share_one_fetch(clock):
+    cache = ResponseCache(clock=clock)
+    fetch, calls = fetcher()
+
+    async def scenario():
+        return await asyncio.gather(*[cache.get_or_fetch(KEY, "route", 60, fetch) for _ in range(5)])
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(result for _, result in results) == ["coalesced"] * 4 + ["miss"]
+    assert cache.stats()["inflight"] == 0
+
+
+def test_uncacheable_responses_are_not_stored(clock):
+    cache = ResponseCache(max_entry_bytes=4, clock=clock)
+    get(cache, fetcher(status_code=404)[0])
+    get(cache, fetcher(body=b"too large")[0])
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_bounds_entries_and_bytes(clock):
+    cache = ResponseCache(max_entries=2, max_bytes=10, clock=clock)
+    fetch, _ = fetcher(body=b"four")
+    for path in ("/a", "/b", "/c"):
+        get(cache, fetch, key=(path, ""))
+    assert cache.stats() == {"entries": 2, "bytes": 8, "inflight": 0}
+    get(cache, fetcher(body=b"sixsix")[0], key=("/d", ""))
+    assert cache.stats()["bytes"] <= 10
+    assert get(cache, fetch, key=("/d", ""))[1] == "hit"
+
+
+def test_invalidation_drops_entries_under_the_prefix(clock):
+    cache = ResponseCache(clock=clock)
+    fetch, _ = fetcher()
+    get(cache, fetch)
+    get(cache, fetch, key=("/api/weather", ""))
+    cache.invalidate_prefix("/api/documents")
+    assert get(cache, fetch)[1] == "miss"
+    assert get(cache, fetch, key=("/api/weather", ""))[1] == "hit"
+
+
+def test_fetch_in_flight_during_invalidation_is_not_stored(clock):
+    cache = ResponseCache(clock=clock)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_fetch():
+            await release.wait()
+            return 200, [], b"stale"
+
+        leader = asyncio.create_task(cache.get_or_fetch(KEY, "route", 60, slow_fetch))
+        await asyncio.sleep(0)
+        cache.invalidate_prefix("/api/documents")
+        release.set()
+        entry, result = await leader
+        assert (entry.body, result) == (b"stale", "miss")
+
+        fetch, _ = fetcher(body=b"fresh")
+        entry, result = await cache.get_or_fetch(KEY, "route", 60, fetch)
+        assert (entry.body, result) == (b"fresh", "miss")
+        # Fetches that start after the invalidation are cached as usual
+        assert (await cache.get_or_fetch(KEY, "route", 60, fetch))[1] == "hit"
+
+    asyncio.run(scenario())
@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import pytest
+
+import upstream
+from upstream import UpstreamClients, is_failure
+
+REPLICAS = "http://10.0.0.1:8001,http://10.0.0.2:8001"
+
+
+def make_clients(monkeypatch, handler, endpoints: str = "") -> UpstreamClients:
+    monkeypatch.setenv("UPSTREAM_SPEECH_ENDPOINTS", endpoints)
+    clients = UpstreamClients({"speech": "http://speech:8001"})
+    clients._clients["speech"] = httpx.AsyncClient(base_url="http://speech:8001",
+                                                   transport=httpx.MockTransport(handler))
+    return clients
+
+
+def send(clients: UpstreamClients, hedge: bool = False) -> httpx.Response:
+    async def call():
+        request = clients.client("speech").build_request("GET", "/health")
+        return await clients.send("speech", request, hedge=hedge)
+    return asyncio.run(call())
+
+
+def test_only_unplanned_5xx_is_a_failure():
+    assert is_failure(httpx.Response(500))
+    assert is_failure(httpx.Response(503))
+    assert not is_failure(httpx.Response(503, headers={"Retry-After": "2"}))
+    assert not is_failure(httpx.Response(429, headers={"Retry-After": "2"}))
+    assert not is_failure(httpx.Response(404))
+
+
+def test_load_shedding_does_not_trip_the_breaker(monkeypatch):
+    clients = make_clients(monkeypatch, lambda request: httpx.Response(503, headers={"Retry-After": "1"}))
+    breaker = clients.breakers["speech"]
+    for _ in range(breaker.config.window):
+        assert send(clients).status_code == 503
+    assert breaker.snapshot()["failure_rate"] == 0.0
+    assert breaker.state == "closed"
+
+
+def test_server_errors_trip_the_breaker(monkeypatch):
+    clients = make_clients(monkeypatch, lambda request: httpx.Response(500))
+    breaker = clients.breakers["speech"]
+    for _ in range(breaker.config.min_calls):
+        send(clients)
+    assert breaker.state == "open"
+
+
+def test_hedged_call_is_recorded_once(monkeypatch):
+    hosts = []
+
+    async def handler(request):
+        hosts.append(request.url.host)
+        # The first replica is slow, so the hedge to the second one wins
+        if request.url.host == "10.0.0.1":
+            await asyncio.sleep(0.2)
+        return httpx.Response(200)
+
+    monkeypatch.setattr(upstream, "HEDGE_MIN_SAMPLES", 1)
+    clients = make_clients(monkeypatch, handler, endpoints=REPLICAS)
+    clients.latencies["speech"].record(0.01)
+    clients.endpoints["speech"].endpoints[1].in_flight = 1
+    breaker = clients.breakers["speech"]
+
+    assert send(clients, hedge=True).status_code == 200
+    assert hosts == ["10.0.0.1", "10.0.0.2"]
+    assert breaker.snapshot()["window_calls"] == 1
+    assert [endpoint.in_flight for endpoint in clients.endpoints["speech"].endpoints] == [0, 1]
+
+
+def test_streamed_endpoint_is_released_when_setup_fails(monkeypatch):
+    closed = []
+
+    class Body(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"{}"
+
+        async def aclose(self):
+            closed.append(1)
+
+    clients = make_clients(monkeypatch, lambda request: httpx.Response(200, stream=Body()), endpoints=REPLICAS)
+
+    def broken_record(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(clients.outliers["speech"], "record", broken_record)
+
+    async def call():
+        request = clients.client("speech").build_request("GET", "/health")
+        return await clients.send("speech", request, stream=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(call())
+    assert [endpoint.in_flight for endpoint in clients.endpoints["speech"].endpoints] == [0, 0]
+    assert closed == [1]
@@ -0,0 +1,317 @@
+from typing import NamedTuple
+import asyncio
+import os
+import time
+import httpx
+import structlog
+
+from circuit_breaker import BreakerConfig, CircuitBreaker, OutlierDetector, CLOSED
+from load_balancer import EndpointSet, LatencyTracker, TrackedStream
+from metrics import UPSTREAM_REQUESTS, UPSTREAM_LATENCY, UPSTREAM_CONNECTIONS_OPENED
+from metrics import HEDGES_SENT, HEDGE_WINS, HEDGE_WASTED_SECONDS
+
+logger = structlog.get_logger()
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class UpstreamConfig(NamedTuple):
+    name: str
+    base_url: str
+    connect_timeout: float
+    read_timeout: float
+    max_connections: int
+    max_keepalive: int
+    keepalive_expiry: float
+    http2: bool
+    endpoints: tuple
+    dns_name: str
+    lb_policy: str
+
+
+DNS_REFRESH_SECONDS = float(os.getenv("UPSTREAM_DNS_REFRESH_SECONDS", "30"))
+
+# Hedging: only idempotent methods, and only once enough latencies are known to estimate the p95
+HEDGEABLE_METHODS = {"GET", "HEAD"}
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_MS", "10")) / 1000.0
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+
+# Read timeouts sized for the slowest normal call each service makes
+DEFAULT_READ_TIMEOUTS = {
+    "speech": 60.0,
+    "code": 120.0,
+    "code-review": 120.0,
+    "live-ai-coding": 120.0,
+}
+
+
+def _env(name: str, setting: str, default: str) -> str:
+    """Per-service override, e.g. UPSTREAM_SPEECH_READ_TIMEOUT, falling back to UPSTREAM_READ_TIMEOUT"""
+    service_key = f"UPSTREAM_{name.upper().replace('-', '_')}_{setting}"
+    return os.getenv(service_key, os.getenv(f"UPSTREAM_{setting}", default))
+
+
+def load_config(name: str, base_url: str) -> UpstreamConfig:
+    return UpstreamConfig(
+        name=name,
+        base_url=base_url,
+        connect_timeout=float(_env(name, "CONNECT_TIMEOUT", "2.0")),
+        read_timeout=float(_env(name, "READ_TIMEOUT", str(DEFAULT_READ_TIMEOUTS.get(name, 10.0)))),
+        max_connections=int(_env(name, "MAX_CONNECTIONS", "100")),
+        max_keepalive=int(_env(name, "MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(_env(name, "KEEPALIVE_EXPIRY", "30")),
+        # Plain-http upstreams only speak HTTP/2 with prior knowledge, so this is opt-in
+        http2=_env(name, "HTTP2", "false").lower() == "true",
+        # Replicas: a static comma-separated URL list, or a DNS name (e.g. a headless Service) resolved to A records
+        endpoints=tuple(url.strip() for url in _env(name, "ENDPOINTS", "").split(",") if url.strip()),
+        dns_name=_env(name, "DNS_NAME", "") or None,
+        lb_policy=_env(name, "LB_POLICY", "p2c")
+    )
+
+
+def load_breaker_config(name: str) -> BreakerConfig:
+    read_timeout = float(_env(name, "READ_TIMEOUT", str(DEFAULT_READ_TIMEOUTS.get(name, 10.0))))
+    return BreakerConfig(
+        failure_rate=float(_env(name, "BREAKER_FAILURE_RATE", "0.5")),
+        slow_call_seconds=float(_env(name, "BREAKER_SLOW_CALL_SECONDS", str(read_timeout / 2))),
+        slow_call_rate=float(_env(name, "BREAKER_SLOW_CALL_RATE", "0.8")),
+        window=int(_env(name, "BREAKER_WINDOW", "20")),
+        min_calls=int(_env(name, "BREAKER_MIN_CALLS", "10")),
+        open_seconds=float(_env(name, "BREAKER_OPEN_SECONDS", "15")),
+        half_open_probes=int(_env(name, "BREAKER_HALF_OPEN_PROBES", "3"))
+    )
+
+
+def is_failure(response: httpx.Response) -> bool:
+    """5xx counts against an upstream, except a 503 with Retry-After, which is deliberate load shedding"""
+    if response.status_code == 503 and "retry-after" in response.headers:
+        return False
+    return response.status_code >= 500
+
+
+def create_outlier_detector(name: str) -> OutlierDetector:
+    return OutlierDetector(
+        name,
+        consecutive_failures=int(_env(name, "OUTLIER_CONSECUTIVE_FAILURES", "5")),
+        latency_factor=float(_env(name, "OUTLIER_LATENCY_FACTOR", "3")),
+        base_ejection_seconds=float(_env(name, "OUTLIER_EJECTION_SECONDS", "30")),
+        max_ejection_percent=float(_env(name, "OUTLIER_MAX_EJECTION_PERCENT", "50"))
+    )
+
+
+class UpstreamClients:
+    """One long-lived, keep-alive httpx client per upstream service.
+
+    Clients are created in the app lifespan and shared by every request, so
+    proxied calls reuse pooled connections instead of paying a TCP handshake
+    each time.
+    """
+
+    def __init__(self, services: dict):
+        self.configs = {name: load_config(name, url) for name, url in services.items()}
+        self.breakers = {name: CircuitBreaker(name, load_breaker_config(name)) for name in services}
+        self.outliers = {name: create_outlier_detector(name) for name in services}
+        self.endpoints = {
+            name: EndpointSet(name, config.base_url, list(config.endpoints), config.dns_name, config.lb_policy)
+            for name, config in self.configs.items()
+        }
+        self.latencies = {name: LatencyTracker(HEDGE_PERCENTILE) for name in services}
+        self._clients = {}
+        self._resolver = None
+
+    async def start(self):
+        for name, config in self.configs.items():
+            http2 = config.http2 and HTTP2_AVAILABLE
+            if config.http2 and not HTTP2_AVAILABLE:
+                logger.warning("⚠️ HTTP/2 requested but h2 is not installed, using HTTP/1.1", service=name)
+            self._clients[name] = httpx.AsyncClient(
+                base_url=config.base_url,
+                timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive,
+                    keepalive_expiry=config.keepalive_expiry
+                ),
+                http2=http2,
+                event_hooks=self._event_hooks(name)
+            )
+        await asyncio.gather(*(endpoint_set.resolve() for endpoint_set in self.endpoints.values()))
+        if any(config.dns_name for config in self.configs.values()):
+            self._resolver = asyncio.create_task(self._refresh_endpoints())
+        logger.info("✅ Upstream clients ready", services=list(self._clients))
+
+    async def _refresh_endpoints(self):
+        while True:
+            await asyncio.sleep(DNS_REFRESH_SECONDS)
+            await asyncio.gather(*(endpoint_set.resolve() for endpoint_set in self.endpoints.values()))
+
+    async def close(self):
+        if self._resolver:
+            self._resolver.cancel()
+            try:
+                await self._resolver
+            except asyncio.CancelledError:
+                pass
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        logger.info("🛑 Upstream clients closed")
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        return self._clients[name]
+
+    async def _attempt(self, service: str, request: httpx.Request, endpoint, stream: bool) -> httpx.Response:
+        """One call to one replica, feeding the outlier detector and latency tracker"""
+        outliers = self.outliers[service]
+        self.endpoints[service].route(request, endpoint)
+        endpoint.acquire()
+        start_time = time.perf_counter()
+        try:
+            response = await self._clients[service].send(request, stream=stream)
+        except httpx.HTTPError:
+            endpoint.release()
+            outliers.record(endpoint.label, True, time.perf_counter() - start_time)
+            raise
+        except BaseException:
+            endpoint.release()
+            raise
+
+        tracked = False
+        try:
+            elapsed = time.perf_counter() - start_time
+            outliers.record(endpoint.label, is_failure(response), elapsed)
+            if response.status_code < 500:
+                self.latencies[service].record(elapsed)
+            if stream:
+                # Streamed bodies keep the endpoint busy until the proxy closes the response
+                response.stream = TrackedStream(response.stream, endpoint.release)
+                tracked = True
+        except BaseException:
+            await response.aclose()
+            raise
+        finally:
+            if not tracked:
+                endpoint.release()
+        return response
+
+    async def send(self, service: str, request: httpx.Request, stream: bool = False,
+                   hedge: bool = False) -> httpx.Response:
+        """Send to one replica through the service's circuit breaker.
+
+        The replica is picked by the load balancer from those not ejected by
+        outlier detection. 5xx responses other than load-shedding 503s and
+        transport errors count as failures; raises CircuitOpen without
+        touching the network while the breaker is open. With ``hedge``,
+        idempotent requests still waiting after the service's recent p95
+        latency are also sent to a second replica and the first good answer
+        wins. The breaker records one outcome per call, however many attempts
+        it took.
+        """
+        breaker = self.breakers[service]
+        breaker.before_call()
+        endpoint_set = self.endpoints[service]
+        endpoint = endpoint_set.pick(self.outliers[service].is_ejected)
+
+        latencies = self.latencies[service]
+        start_time = time.perf_counter()
+        try:
+            if (hedge and request.method in HEDGEABLE_METHODS and breaker.state == CLOSED
+                    and len(endpoint_set.endpoints) > 1 and len(latencies) >= HEDGE_MIN_SAMPLES):
+                delay = max(HEDGE_MIN_DELAY_SECONDS, latencies.value)
+                response = await self._send_hedged(service, request, endpoint, stream, delay)
+            else:
+                response = await self._attempt(service, request, endpoint, stream)
+        except httpx.HTTPError:
+            breaker.record(True, time.perf_counter() - start_time)
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        breaker.record(is_failure(response), time.perf_counter() - start_time)
+        return response
+
+    async def _send_hedged(self, service: str, request: httpx.Request, endpoint, stream: bool,
+                           delay: float) -> httpx.Response:
+        started = {}
+
+        def launch(attempt_request, attempt_endpoint, name):
+            task = asyncio.create_task(self._attempt(service, attempt_request, attempt_endpoint, stream))
+            started[task] = (name, time.perf_counter())
+            return task
+
+        primary = launch(request, endpoint, "primary")
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                second = self.endpoints[service].pick(self.outliers[service].is_ejected, exclude=endpoint)
+                hedge_request = httpx.Request(request.method, request.url, headers=request.headers,
+                                              extensions=dict(request.extensions))
+                pending.add(launch(hedge_request, second, "hedge"))
+                HEDGES_SENT.labels(service).inc()
+
+            completed = list(done)
+            while True:
+                for task in completed:
+                    if task.exception() is None and task.result().status_code < 500:
+                        if len(started) > 1:
+                            HEDGE_WINS.labels(service, started[task][0]).inc()
+                        await self._discard_losers(service, started, pending, winner=task)
+                        return task.result()
+                if not pending:
+                    break
+                completed, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            # Neither attempt succeeded: surface the primary's outcome
+            await self._discard_losers(service, started, pending, winner=primary)
+            return primary.result()
+        except BaseException:
+            await self._discard_losers(service, started, pending, winner=None)
+            raise
+
+    async def _discard_losers(self, service: str, started: dict, pending: set, winner):
+        """Cancel attempts still in flight and close responses nobody will read"""
+        now = time.perf_counter()
+        for task in pending:
+            task.cancel()
+            HEDGE_WASTED_SECONDS.labels(service).inc(now - started[task][1])
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in started:
+            if task is winner or task in pending or task.cancelled() or task.exception() is not None:
+                continue
+            await task.result().aclose()
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "circuit": self.breakers[name].snapshot(),
+                "lb_policy": self.endpoints[name].policy,
+                "in_flight": {endpoint.label: endpoint.in_flight for endpoint in self.endpoints[name].endpoints},
+                "endpoints": self.outliers[name].snapshot()
+            }
+            for name in self.configs
+        }
+
+    def _event_hooks(self, service: str) -> dict:
+        """Hooks that time each call and count new connections via httpcore's trace extension"""
+
+        async def trace(event_name: str, info: dict):
+            if event_name == "connection.connect_tcp.complete":
+                UPSTREAM_CONNECTIONS_OPENED.labels(service).inc()
+
+        async def on_request(request: httpx.Request):
+            request.extensions["trace"] = trace
+            request.extensions["gateway_start"] = time.perf_counter()
+
+        async def on_response(response: httpx.Response):
+            request = response.request
+            UPSTREAM_LATENCY.labels(service).observe(time.perf_counter() - request.extensions["gateway_start"])
+            UPSTREAM_REQUESTS.labels(service, request.method, str(response.status_code)).inc()
+
+        return {"request": [on_request], "response": [on_response]}
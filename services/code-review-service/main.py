@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
-from openai import OpenAI
+from openai import OpenAI, APITimeoutError
 import json
 
+from common.instrumentation import instrument
+
 app = FastAPI()
 
 app.add_middleware(
@@ -15,6 +17,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument(app, "code-review-service")
+
 class CodeReviewRequest(BaseModel):
     code: str
     language: str = "python"
@@ -26,12 +30,26 @@ class CodeReviewResponse(BaseModel):
     suggestions: list
     issues: list
 
+def request_timeout(http_request: Request):
+    """Seconds left in the budget the gateway propagates in X-Request-Timeout-Ms, if any"""
+    value = http_request.headers.get("x-request-timeout-ms")
+    try:
+        return max(0.0, float(value) / 1000.0) if value else None
+    except ValueError:
+        return None
+
+def deadline_options(timeout) -> dict:
+    if timeout is not None and timeout <= 0:
+        raise HTTPException(status_code=504, detail="Deadline passed before review started")
+    return {"timeout": timeout} if timeout is not None else {}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "code-review-service"}
 
 @app.post("/review")
-async def review_code(request: CodeReviewRequest):
+async def review_code(request: CodeReviewRequest, http_request: Request):
+    timeout = request_timeout(http_request)
     try:
         client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         
@@ -105,7 +123,8 @@ Focus on {request.review_type} review. Be thorough but constructive. Highlight b
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.3
+            temperature=0.3,
+            **deadline_options(timeout)
         )
         
         # Parse the response
@@ -137,13 +156,18 @@ Focus on {request.review_type} review. Be thorough but constructive. Highlight b
         
         return review_data
         
+    except APITimeoutError:
+        raise HTTPException(status_code=504, detail="Code review deadline exceeded")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in code review: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Code review failed: {str(e)}")
 
 @app.post("/quick-review")
-async def quick_review(request: CodeReviewRequest):
+async def quick_review(request: CodeReviewRequest, http_request: Request):
     """Quick review for simple feedback"""
+    timeout = request_timeout(http_request)
     try:
         client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         
@@ -172,7 +196,8 @@ Respond in JSON format:
         response = client.chat.completions.create(
             model="gpt-4",
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
+            temperature=0.3,
+            **deadline_options(timeout)
         )
         
         review_text = response.choices[0].message.content
@@ -190,6 +215,10 @@ Respond in JSON format:
                 "summary": "Quick review completed"
             }
             
+    except APITimeoutError:
+        raise HTTPException(status_code=504, detail="Quick review deadline exceeded")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Quick review failed: {str(e)}")
 
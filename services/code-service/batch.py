@@ -0,0 +1,94 @@
+from contextlib import aclosing
+import asyncio
+import os
+import time
+import structlog
+
+from concurrency import generation_limiter
+from deadline import DeadlineExceeded, remaining
+from metrics import CODE_BATCH_DEDUPLICATED
+
+logger = structlog.get_logger()
+
+# Items of one batch generating at once; every item also needs a worker-wide generation slot
+BATCH_MAX_CONCURRENCY = int(os.getenv("CODE_BATCH_MAX_CONCURRENCY", "4"))
+# Budget per item, counted from when the item is dispatched and capped by the request deadline
+BATCH_ITEM_TIMEOUT = float(os.getenv("CODE_BATCH_ITEM_TIMEOUT", "60"))
+
+
+def batch_key(request) -> tuple:
+    """Requests with the same key produce the same code, so a batch generates them once"""
+    return (" ".join(request.prompt.split()), request.language, request.style)
+
+
+async def _generate_item(code_generator, request, timeout: float) -> str:
+    cached, _ = await code_generator.cached_code(request.prompt, request.language, request.style)
+    if cached is not None:
+        return cached.code
+    async with generation_limiter.slot():
+        return await code_generator.agenerate_code(request.prompt, request.language, timeout=timeout, style=request.style)
+
+
+async def generate_batch(code_requests: list, code_generator, deadline=None):
+    """Yield one result per request as each finishes, running up to BATCH_MAX_CONCURRENCY at a time.
+
+    Duplicates are generated once and reported with ``duplicate_of`` pointing
+    at the first request with the same prompt. Closing the generator cancels
+    whatever is still running.
+    """
+    groups = {}
+    for index, request in enumerate(code_requests):
+        groups.setdefault(batch_key(request), []).append(index)
+    if len(groups) < len(code_requests):
+        CODE_BATCH_DEDUPLICATED.inc(len(code_requests) - len(groups))
+
+    semaphore = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+
+    async def run(indices: list):
+        request = code_requests[indices[0]]
+        code, error = "", None
+        async with semaphore:
+            item_start = time.perf_counter()
+            timeout = BATCH_ITEM_TIMEOUT if deadline is None else min(BATCH_ITEM_TIMEOUT, remaining(deadline))
+            try:
+                # wait_for also bounds the wait for a generation slot, not just the OpenAI call
+                code = await asyncio.wait_for(_generate_item(code_generator, request, timeout), timeout)
+            except (asyncio.TimeoutError, DeadlineExceeded):
+                error = "Code generation deadline exceeded"
+            except Exception as e:
+                error = str(e)
+            duration = time.perf_counter() - item_start
+
+        if error is not None:
+            logger.error(f"❌ Error generating code {indices[0]}", error=error)
+        return indices, code, error, duration
+
+    tasks = [asyncio.ensure_future(run(indices)) for indices in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indices, code, error, duration = await next_done
+            for index in indices:
+                request = code_requests[index]
+                result = {
+                    "index": index,
+                    "code": code,
+                    "success": error is None and not code.startswith("# Error generating"),
+                    "language": request.language,
+                    "prompt": request.prompt,
+                    "duration": duration
+                }
+                if error is not None:
+                    result["error"] = error
+                if index != indices[0]:
+                    result["duplicate_of"] = indices[0]
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def collect_batch(code_requests: list, code_generator, deadline=None) -> list:
+    """Run ``generate_batch`` to completion and return the results in request order"""
+    async with aclosing(generate_batch(code_requests, code_generator, deadline)) as results:
+        collected = [result async for result in results]
+    return sorted(collected, key=lambda result: result["index"])
@@ -0,0 +1,239 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import hashlib
+import json
+import os
+import re
+import time
+import structlog
+
+from metrics import CODE_CACHE_REQUESTS, CODE_CACHE_SAVED_SECONDS, CODE_CACHE_SAVED_TOKENS
+from metrics import CODE_CACHE_ENTRIES, CODE_CACHE_EVICTIONS, CODE_CACHE_SIMILARITY
+
+logger = structlog.get_logger()
+
+# Framing words that do not change what code is asked for
+STOPWORDS = frozenset("""
+a an the to that which this in of for with and or by from on as is are be it its
+please can could would will you me i my we our some hey okay ok just also
+write create make generate implement build give show need want code snippet each every
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9_]+|[+\-*/%<>=!&|^~]+")
+_SUFFIXES = ("ing", "ed", "es", "s", "e")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt; trailing punctuation from dictation is dropped"""
+    return " ".join(prompt.casefold().split()).rstrip(" .?!")
+
+
+def _stem(word: str) -> str:
+    # Crude suffix stripping, applied twice so "strings", "string" and "stringing" meet
+    for _ in range(2):
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not (suffix == "s" and word.endswith("ss")):
+                word = word[:-len(suffix)]
+                break
+    return word
+
+
+def prompt_sketch(prompt: str, language: str) -> frozenset:
+    """Word unigrams and bigrams of a prompt's content words; the bigrams keep word order significant"""
+    words = [_stem(word) for word in _TOKEN.findall(normalize_prompt(prompt))
+             if word not in STOPWORDS and word != language]
+    return frozenset(words + [f"{first} {second}" for first, second in zip(words, words[1:])])
+
+
+def similarity(first: frozenset, second: frozenset) -> float:
+    """Jaccard similarity of two sketches"""
+    if not first or not second:
+        return 0.0
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+class CachedCode(NamedTuple):
+    code: str
+    generation_seconds: float
+    tokens: int
+    expires_at: float
+    partition: tuple
+    sketch: frozenset
+
+
+class RedisTier:
+    """Exact-match entries shared by every worker and kept across restarts"""
+
+    def __init__(self, url: str, ttl: float, timeout: float):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.ttl = int(ttl)
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = await self._redis.get(f"codecache:{key}")
+        return json.loads(value) if value else None
+
+    async def set(self, key: str, record: dict):
+        await self._redis.set(f"codecache:{key}", json.dumps(record), ex=self.ttl)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class CodeCache:
+    """Two-level cache of generated code.
+
+    The exact level matches the normalized prompt with the same language,
+    style and model. The similarity level compares word n-gram sketches
+    against entries of the same language, style and model, and answers when
+    the best Jaccard similarity reaches ``similarity_threshold``. Both levels
+    share one LRU store bounded by ``max_entries`` with a TTL per entry. An
+    optional persistent tier backs the exact level.
+    """
+
+    def __init__(self, ttl: float = 86400, max_entries: int = 2048, similarity_threshold: float = 0.8,
+                 persistent=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.max_entries = max(1, max_entries)
+        self.similarity_threshold = similarity_threshold
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        # Keys per (language, style, model), so similarity lookups only scan comparable entries
+        self._partitions = {}
+
+    @staticmethod
+    def key(prompt: str, language: str, style: str, model: str) -> str:
+        material = "\x1f".join((model, language, style, normalize_prompt(prompt)))
+        return hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            partition = self._partitions[entry.partition]
+            del partition[key]
+            if not partition:
+                del self._partitions[entry.partition]
+
+    def _store(self, key: str, entry: CachedCode):
+        self._remove(key)
+        self._entries[key] = entry
+        self._partitions.setdefault(entry.partition, {})[key] = entry.sketch
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            CODE_CACHE_EVICTIONS.inc()
+        CODE_CACHE_ENTRIES.set(len(self._entries))
+
+    def _lookup(self, key: str) -> Optional[CachedCode]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._remove(key)
+            CODE_CACHE_ENTRIES.set(len(self._entries))
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _lookup_similar(self, partition: tuple, sketch: frozenset) -> Optional[CachedCode]:
+        if self.similarity_threshold > 1 or not sketch:
+            return None
+        now = self.clock()
+        best_key, best_score, expired = None, 0.0, []
+        for key, candidate in self._partitions.get(partition, {}).items():
+            # An expired entry must not shadow a live one that scores lower
+            if self._entries[key].expires_at <= now:
+                expired.append(key)
+                continue
+            score = similarity(sketch, candidate)
+            if score > best_score:
+                best_key, best_score = key, score
+        if expired:
+            for key in expired:
+                self._remove(key)
+            CODE_CACHE_ENTRIES.set(len(self._entries))
+        if best_key is None:
+            return None
+        CODE_CACHE_SIMILARITY.observe(best_score)
+        return self._lookup(best_key) if best_score >= self.similarity_threshold else None
+
+    async def _lookup_persistent(self, key: str, partition: tuple, sketch: frozenset) -> Optional[CachedCode]:
+        if self.persistent is None:
+            return None
+        try:
+            record = await self.persistent.get(key)
+        except Exception as e:
+            # A broken persistent tier only costs hits
+            logger.error("❌ Code cache persistent tier failed", error=str(e))
+            return None
+        if record is None:
+            return None
+        entry = CachedCode(record["code"], record["generation_seconds"], record["tokens"],
+                           self.clock() + self.ttl, partition, sketch)
+        self._store(key, entry)
+        return entry
+
+    async def get(self, prompt: str, language: str, style: str, model: str) -> tuple:
+        """Return (CachedCode, level) where level is exact, similar or persistent, or (None, "miss")"""
+        key = self.key(prompt, language, style, model)
+        partition = (language, style, model)
+        sketch = prompt_sketch(prompt, language)
+
+        # An exact answer from the shared tier beats a merely similar local one
+        level, entry = "exact", self._lookup(key)
+        if entry is None:
+            level, entry = "persistent", await self._lookup_persistent(key, partition, sketch)
+        if entry is None:
+            level, entry = "similar", self._lookup_similar(partition, sketch)
+        if entry is None:
+            CODE_CACHE_REQUESTS.labels("miss").inc()
+            return None, "miss"
+
+        CODE_CACHE_REQUESTS.labels(level).inc()
+        CODE_CACHE_SAVED_SECONDS.labels(level).inc(entry.generation_seconds)
+        CODE_CACHE_SAVED_TOKENS.labels(level).inc(entry.tokens)
+        return entry, level
+
+    async def put(self, prompt: str, language: str, style: str, model: str, code: str,
+                  generation_seconds: float, tokens: int):
+        """Remember a successful generation with what it cost, so hits can report what they saved"""
+        key = self.key(prompt, language, style, model)
+        entry = CachedCode(code, generation_seconds, tokens, self.clock() + self.ttl,
+                           (language, style, model), prompt_sketch(prompt, language))
+        self._store(key, entry)
+        if self.persistent is not None:
+            try:
+                await self.persistent.set(key, {"code": code, "generation_seconds": generation_seconds, "tokens": tokens})
+            except Exception as e:
+                logger.error("❌ Code cache persistent tier failed", error=str(e))
+
+    async def close(self):
+        if self.persistent is not None:
+            await self.persistent.close()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "similarity_threshold": self.similarity_threshold,
+            "persistent": self.persistent is not None
+        }
+
+
+def create_code_cache() -> Optional[CodeCache]:
+    if os.getenv("CODE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    persistent = None
+    if os.getenv("CODE_CACHE_REDIS_URL"):
+        persistent = RedisTier(
+            os.getenv("CODE_CACHE_REDIS_URL"),
+            ttl=float(os.getenv("CODE_CACHE_REDIS_TTL_SECONDS", str(7 * 86400))),
+            timeout=float(os.getenv("CODE_CACHE_REDIS_TIMEOUT", "0.25"))
+        )
+    return CodeCache(
+        ttl=float(os.getenv("CODE_CACHE_TTL_SECONDS", "86400")),
+        max_entries=int(os.getenv("CODE_CACHE_MAX_ENTRIES", "2048")),
+        # Above 1 turns the similarity level off
+        similarity_threshold=float(os.getenv("CODE_CACHE_SIMILARITY_THRESHOLD", "0.8")),
+        persistent=persistent
+    )
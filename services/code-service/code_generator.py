@@ -1,68 +1,273 @@
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
+from types import MappingProxyType
+from openai import APITimeoutError
+import time
 import structlog
 
-load_dotenv()
+from deadline import DeadlineExceeded
+from metrics import CODE_GENERATOR_PREP_DURATION
+from openai_client import get_async_openai_client
+from common import tracing
 
 logger = structlog.get_logger()
 
-class CodeGenerator:
+# Built once at import and shared read-only by every request
+LANGUAGE_PROMPTS = MappingProxyType({
+    "python": "You are an expert Python developer. Generate clean, efficient, and well-documented Python code. Follow PEP 8 style guidelines. Include type hints where appropriate. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "javascript": "You are an expert JavaScript developer. Generate clean, efficient, and well-documented JavaScript code. Use modern ES6+ syntax. Include JSDoc comments for functions. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "typescript": "You are an expert TypeScript developer. Generate clean, efficient, and well-documented TypeScript code. Use proper type annotations. Follow TypeScript best practices. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "java": "You are an expert Java developer. Generate clean, efficient, and well-documented Java code. Follow Java naming conventions. Include proper documentation comments. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "cpp": "You are an expert C++ developer. Generate clean, efficient, and well-documented C++ code. Use modern C++ features (C++11 and later). Include proper header guards and namespaces. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "csharp": "You are an expert C# developer. Generate clean, efficient, and well-documented C# code. Use modern C# features. Follow C# naming conventions. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "go": "You are an expert Go developer. Generate clean, efficient, and well-documented Go code. Follow Go conventions and best practices. Include proper error handling. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "rust": "You are an expert Rust developer. Generate clean, efficient, and well-documented Rust code. Use proper ownership and borrowing. Include proper error handling with Result types. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "php": "You are an expert PHP developer. Generate clean, efficient, and well-documented PHP code. Use modern PHP features (PHP 7.4+). Follow PSR standards. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "ruby": "You are an expert Ruby developer. Generate clean, efficient, and well-documented Ruby code. Follow Ruby conventions and best practices. Use idiomatic Ruby patterns. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "swift": "You are an expert Swift developer. Generate clean, efficient, and well-documented Swift code. Use modern Swift features. Follow Swift naming conventions. Respond ONLY with the code block (no explanations or markdown formatting).",
+    "kotlin": "You are an expert Kotlin developer. Generate clean, efficient, and well-documented Kotlin code. Use modern Kotlin features. Follow Kotlin conventions. Respond ONLY with the code block (no explanations or markdown formatting)."
+})
+
+DEFAULT_LANGUAGE = "python"
+OPENAI_MODEL = "gpt-4"
+
+FENCE = "```"
+
+
+def strip_fences(code: str) -> str:
+    """Drop a markdown code fence wrapped around the whole response"""
+    code = code.strip()
+    if code.startswith(FENCE) and code.endswith(FENCE):
+        code = code[code.find('\n') + 1:-3].strip()
+    return code
+
+
+class FenceStripper:
+    """Incremental ``strip_fences`` for streamed responses.
+
+    Text is released as soon as it can no longer be part of the opening fence
+    line or the closing fence; only a trailing run of whitespace and backticks
+    is held back until the next delta shows it was ordinary code.
+    """
+
     def __init__(self):
-        self.client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        if not self.client.api_key:
-            raise ValueError("Missing OpenAI API key in .env file")
-
-    def generate_code(self, prompt: str, language: str = "python") -> str:
-        try:
-            language_prompts = {
-                "python": "You are an expert Python developer. Generate clean, efficient, and well-documented Python code. Follow PEP 8 style guidelines. Include type hints where appropriate. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "javascript": "You are an expert JavaScript developer. Generate clean, efficient, and well-documented JavaScript code. Use modern ES6+ syntax. Include JSDoc comments for functions. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "typescript": "You are an expert TypeScript developer. Generate clean, efficient, and well-documented TypeScript code. Use proper type annotations. Follow TypeScript best practices. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "java": "You are an expert Java developer. Generate clean, efficient, and well-documented Java code. Follow Java naming conventions. Include proper documentation comments. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "cpp": "You are an expert C++ developer. Generate clean, efficient, and well-documented C++ code. Use modern C++ features (C++11 and later). Include proper header guards and namespaces. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "csharp": "You are an expert C# developer. Generate clean, efficient, and well-documented C# code. Use modern C# features. Follow C# naming conventions. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "go": "You are an expert Go developer. Generate clean, efficient, and well-documented Go code. Follow Go conventions and best practices. Include proper error handling. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "rust": "You are an expert Rust developer. Generate clean, efficient, and well-documented Rust code. Use proper ownership and borrowing. Include proper error handling with Result types. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "php": "You are an expert PHP developer. Generate clean, efficient, and well-documented PHP code. Use modern PHP features (PHP 7.4+). Follow PSR standards. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "ruby": "You are an expert Ruby developer. Generate clean, efficient, and well-documented Ruby code. Follow Ruby conventions and best practices. Use idiomatic Ruby patterns. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "swift": "You are an expert Swift developer. Generate clean, efficient, and well-documented Swift code. Use modern Swift features. Follow Swift naming conventions. Respond ONLY with the code block (no explanations or markdown formatting).",
-                "kotlin": "You are an expert Kotlin developer. Generate clean, efficient, and well-documented Kotlin code. Use modern Kotlin features. Follow Kotlin conventions. Respond ONLY with the code block (no explanations or markdown formatting)."
-            }
-            
-            system_prompt = language_prompts.get(language, language_prompts["python"])
-            
-            enhanced_prompt = f"Generate {language} code for: {prompt}"
-            
-            logger.info("Generating code", language=language, prompt_length=len(prompt))
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {"role": "user", "content": enhanced_prompt}
-                ],
-                temperature=0.3
-            )
-            
-            code = self._clean_response(response.choices[0].message.content)
-            
-            logger.info("Code generation successful", 
-                       language=language, 
-                       code_length=len(code),
-                       tokens_used=response.usage.total_tokens if response.usage else 0)
-            
+        self._head = ""
+        self._tail = ""
+        self._in_body = False
+        self._fenced = False
+        self._emitted = False
+
+    def feed(self, text: str) -> str:
+        if not self._in_body:
+            self._head += text
+            head = self._head.lstrip()
+            if head.startswith(FENCE):
+                newline = head.find("\n")
+                if newline < 0:
+                    return ""
+                self._fenced = True
+                text = head[newline + 1:]
+            elif not head or FENCE.startswith(head):
+                return ""
+            else:
+                text = head
+            self._in_body = True
+            self._head = ""
+
+        if not self._emitted:
+            # Like strip(), drop whitespace between the fence line and the code
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._emitted = True
+
+        text = self._tail + text
+        end = len(text)
+        while end and (text[end - 1].isspace() or text[end - 1] == "`"):
+            end -= 1
+        self._tail = text[end:]
+        return text[:end]
+
+    def finish(self) -> str:
+        """Release whatever is still held back once the stream has ended"""
+        if not self._in_body:
+            return strip_fences(self._head)
+        tail = self._tail.rstrip()
+        if self._fenced and tail.endswith(FENCE):
+            tail = tail[:-len(FENCE)].rstrip()
+        self._tail = ""
+        return tail
+
+
+class CodeGenerator:
+    """Wrapper around the shared async OpenAI client; one instance serves the whole process.
+
+    With a ``cache`` (see code_cache.py), the async paths remember what
+    they generate; callers check ``cached_code`` first, before taking a
+    generation slot, so repeated and near-identical prompts skip OpenAI.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    @property
+    def async_client(self):
+        return get_async_openai_client()
+
+    def _client_for(self, timeout: float):
+        # The SDK retries timed-out calls, which would run a deadline several times over
+        client = self.async_client
+        return client if timeout is None else client.with_options(max_retries=0)
+
+    async def agenerate_code(self, prompt: str, language: str = "python", timeout: float = None, style: str = "clean") -> str:
+        """Generate code for a prompt; the OpenAI round trip is awaited, so the event loop keeps serving other requests.
+
+        With a ``timeout`` the call is abandoned and DeadlineExceeded raised
+        when it runs out. Cancelling the awaiting task aborts the in-flight
+        HTTP request.
+        """
+        prep_start = time.perf_counter()
+        with tracing.span("code.generate", language=language, prompt_length=len(prompt)) as generate_span:
+            client = self._client_for(timeout)
+            options = self._request_options(prompt, language, timeout, prep_start)
+            try:
+                with tracing.span("openai.chat.completions", kind="client", model=OPENAI_MODEL) as openai_span:
+                    response = await client.chat.completions.create(**options)
+                code = self._finish(response, language, openai_span)
+            except APITimeoutError as e:
+                return self._timed_out(language, timeout, e)
+            except Exception as e:
+                return self._failed(language, e, generate_span)
+
+            await self._cache_store(prompt, language, style, code, prep_start,
+                                    response.usage.total_tokens if response.usage else 0)
             return code
-            
-        except Exception as e:
-            logger.error("Code generation failed", error=str(e), language=language)
-            return f"""# Error generating {language} code:
-# {str(e)}
+
+    async def astream_code(self, prompt: str, language: str = "python", timeout: float = None, style: str = "clean"):
+        """Yield ``{"delta": text}`` as tokens arrive, then one ``{"usage": {...}}``.
+
+        ``timeout`` bounds the whole stream, not just each read. Iterate under
+        ``contextlib.aclosing`` so an abandoned stream closes its OpenAI request.
+        """
+        prep_start = time.perf_counter()
+        with tracing.span("code.generate.stream", language=language, prompt_length=len(prompt)) as generate_span:
+            client = self._client_for(timeout)
+            options = self._request_options(prompt, language, timeout, prep_start)
+            options["stream"] = True
+            options["stream_options"] = {"include_usage": True}
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            stripper = FenceStripper()
+            usage, chunks = None, 0
+            code = []
+
+            try:
+                with tracing.span("openai.chat.completions", kind="client", model=OPENAI_MODEL, stream=True):
+                    stream = await client.chat.completions.create(**options)
+                try:
+                    async for chunk in stream:
+                        if deadline is not None and time.monotonic() >= deadline:
+                            logger.warning("Code generation deadline exceeded mid-stream", language=language, timeout=timeout)
+                            raise DeadlineExceeded("Deadline passed while streaming code")
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if not chunk.choices or not chunk.choices[0].delta.content:
+                            continue
+                        chunks += 1
+                        text = stripper.feed(chunk.choices[0].delta.content)
+                        if text:
+                            code.append(text)
+                            yield {"delta": text}
+                finally:
+                    await stream.close()
+            except APITimeoutError as e:
+                if timeout is None:
+                    raise
+                logger.warning("Code generation deadline exceeded", language=language, timeout=timeout)
+                raise DeadlineExceeded(str(e)) from e
+
+            text = stripper.finish()
+            if text:
+                code.append(text)
+                yield {"delta": text}
+
+            if usage is not None:
+                stats = {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens
+                }
+            else:
+                # Servers that ignore stream_options send no usage; one content chunk is about one token
+                stats = {"completion_tokens": chunks, "estimated": True}
+            for name, value in stats.items():
+                generate_span.set_attribute(name, value)
+            logger.info("Code streaming successful", language=language, **stats)
+            await self._cache_store(prompt, language, style, "".join(code), prep_start,
+                                    stats.get("total_tokens", stats["completion_tokens"]))
+            yield {"usage": stats}
+
+    async def cached_code(self, prompt: str, language: str = "python", style: str = "clean") -> tuple:
+        """Return (CachedCode, level), or (None, "miss") when nothing matches or there is no cache"""
+        if self.cache is None:
+            return None, "miss"
+        with tracing.span("code.cache.lookup", language=language) as cache_span:
+            cached, level = await self.cache.get(prompt, language, style, OPENAI_MODEL)
+            cache_span.set_attribute("level", level)
+        if cached is not None:
+            logger.info("Code cache hit", language=language, level=level, saved_tokens=cached.tokens)
+        return cached, level
+
+    async def _cache_store(self, prompt: str, language: str, style: str, code: str, start: float, tokens: int):
+        if self.cache is not None and code:
+            await self.cache.put(prompt, language, style, OPENAI_MODEL, code, time.perf_counter() - start, tokens)
+
+    def _request_options(self, prompt: str, language: str, timeout: float, prep_start: float) -> dict:
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceeded("Deadline passed before code generation started")
+
+        system_prompt = LANGUAGE_PROMPTS.get(language, LANGUAGE_PROMPTS[DEFAULT_LANGUAGE])
+        enhanced_prompt = f"Generate {language} code for: {prompt}"
+
+        logger.info("Generating code", language=language, prompt_length=len(prompt))
+
+        options = {
+            "model": OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": enhanced_prompt}
+            ],
+            "temperature": 0.3
+        }
+        if timeout is not None:
+            options["timeout"] = timeout
+        CODE_GENERATOR_PREP_DURATION.observe(time.perf_counter() - prep_start)
+        return options
+
+    def _finish(self, response, language: str, openai_span) -> str:
+        if response.usage:
+            openai_span.set_attribute("prompt_tokens", response.usage.prompt_tokens)
+            openai_span.set_attribute("completion_tokens", response.usage.completion_tokens)
+
+        code = self._clean_response(response.choices[0].message.content)
+
+        logger.info("Code generation successful", 
+                   language=language, 
+                   code_length=len(code),
+                   tokens_used=response.usage.total_tokens if response.usage else 0)
+        return code
+
+    def _timed_out(self, language: str, timeout: float, error: APITimeoutError) -> str:
+        if timeout is None:
+            return self._error_code(language, error)
+        logger.warning("Code generation deadline exceeded", language=language, timeout=timeout)
+        raise DeadlineExceeded(str(error)) from error
+
+    def _failed(self, language: str, error: Exception, generate_span) -> str:
+        generate_span.record_exception(error)
+        logger.error("Code generation failed", error=str(error), language=language)
+        return self._error_code(language, error)
+
+    def _error_code(self, language: str, error: Exception) -> str:
+        return f"""# Error generating {language} code:
+# {str(error)}
 # Possible fixes:
 # 1. Check OPENAI_API_KEY in .env
 # 2. Verify internet connection
@@ -70,7 +275,4 @@ class CodeGenerator:
 # 4. Try a different programming language"""
 
     def _clean_response(self, code: str) -> str:
-        code = code.strip()
-        if code.startswith("```") and code.endswith("```"):
-            code = code[code.find('\n') + 1:-3].strip()
-        return code 
\ No newline at end of file
+        return strip_fences(code) 
\ No newline at end of file
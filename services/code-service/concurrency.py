@@ -0,0 +1,124 @@
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
+import structlog
+
+from metrics import GENERATION_IN_FLIGHT, GENERATION_QUEUE_DEPTH, GENERATION_QUEUE_WAIT, GENERATION_REJECTED
+from metrics import CODE_GENERATION_CANCELLED
+from deadline import DeadlineExceeded
+
+logger = structlog.get_logger()
+
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+
+class GenerationQueueFull(Exception):
+    """Raised when the worker cannot admit more generations"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Code generation queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """Raised when the caller went away before its generation finished"""
+
+
+class GenerationLimiter:
+    """Caps concurrent LLM calls per worker.
+
+    At most ``max_concurrency`` generations run at once and at most
+    ``max_queue`` wait for a slot; anything beyond that is rejected
+    immediately so callers can answer 503 instead of queueing unbounded
+    latency.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int = 5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._semaphore = None
+        self._queued = 0
+        self._running = 0
+
+    def _update_gauges(self):
+        GENERATION_IN_FLIGHT.set(self._running)
+        GENERATION_QUEUE_DEPTH.set(self._queued)
+
+    async def acquire(self, timeout: float = None):
+        """Wait for a generation slot, or raise GenerationQueueFull; pair with release().
+
+        With a ``timeout`` the wait is abandoned with DeadlineExceeded once it runs out.
+        """
+        if self._queued + self._running >= self.max_concurrency + self.max_queue:
+            GENERATION_REJECTED.inc()
+            logger.warning("🚫 Code generation queue full", running=self._running, queued=self._queued)
+            raise GenerationQueueFull(self.retry_after)
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self._queued += 1
+        self._update_gauges()
+        wait_start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline passed while waiting for a generation slot")
+        finally:
+            self._queued -= 1
+            self._update_gauges()
+        GENERATION_QUEUE_WAIT.observe(time.perf_counter() - wait_start)
+
+        self._running += 1
+        self._update_gauges()
+
+    def release(self):
+        self._running -= 1
+        self._update_gauges()
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, timeout: float = None):
+        """Hold one generation slot, or raise GenerationQueueFull or DeadlineExceeded as ``acquire`` does"""
+        await self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": self._queued
+        }
+
+
+async def cancel_on_disconnect(request, coro):
+    """Await ``coro``, cancelling it and raising ClientDisconnected if the HTTP client goes away first"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                CODE_GENERATION_CANCELLED.inc()
+                logger.info("🔌 Client disconnected, cancelled code generation")
+                raise ClientDisconnected()
+    finally:
+        # Covers cancellation of the handler itself, e.g. on server shutdown
+        if not task.done():
+            task.cancel()
+
+
+generation_limiter = GenerationLimiter(
+    # Matches the OpenAI connection pool; more would only queue inside httpx
+    max_concurrency=int(os.getenv("CODE_GENERATION_MAX_CONCURRENCY", os.getenv("OPENAI_MAX_CONNECTIONS", "20"))),
+    max_queue=int(os.getenv("CODE_GENERATION_MAX_QUEUE", "64")),
+    retry_after=int(os.getenv("CODE_GENERATION_RETRY_AFTER", "5"))
+)
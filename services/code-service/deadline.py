@@ -0,0 +1,26 @@
+from typing import Optional
+import time
+
+# Remaining time budget in milliseconds, set by the gateway from the client timeout
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before its work is done"""
+
+
+def deadline_from_headers(headers) -> Optional[float]:
+    """Convert the propagated time budget into an absolute time.monotonic() deadline"""
+    value = headers.get(DEADLINE_HEADER)
+    if not value:
+        return None
+    try:
+        return time.monotonic() + max(0.0, float(value)) / 1000.0
+    except ValueError:
+        return None
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load test for POST /generate.
+
+For each concurrency level, that many clients send requests back to back
+and the script reports throughput and latency percentiles. With a
+non-blocking generation path, throughput should grow with concurrency (up to
+CODE_GENERATION_MAX_CONCURRENCY) while latency stays near the LLM latency.
+A path that blocks the event loop stays flat at about 1 / LLM latency.
+
+With --stream, clients call POST /generate/stream instead and the script
+also reports time to first token (TTFT), the latency users actually see.
+
+Without --url, the script starts the code service in-process against a fake
+OpenAI endpoint with a fixed response latency, so it needs no API key. When
+streaming, the fake spreads that latency over its tokens.
+
+Usage:
+    python load_test.py
+    python load_test.py --stream --concurrency 1 8
+    python load_test.py --concurrency 1 4 16 --llm-latency 1.0
+    python load_test.py --url http://localhost:8002 --concurrency 1 8
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import httpx
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+FAKE_TOKENS = ["```python\n", "def", " noop", "():", "\n", "    pass", "\n```"]
+
+
+def start_local_service(llm_latency: float) -> str:
+    """Run a fake OpenAI API and the code service on local ports; returns the service URL"""
+    import json
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    fake_openai = FastAPI()
+
+    async def stream_tokens():
+        base = {"id": "load-test", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4"}
+        for token in FAKE_TOKENS:
+            await asyncio.sleep(llm_latency / len(FAKE_TOKENS))
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            yield f"data: {json.dumps(chunk)}\n\n"
+        usage = {"prompt_tokens": 50, "completion_tokens": len(FAKE_TOKENS), "total_tokens": 50 + len(FAKE_TOKENS)}
+        yield f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @fake_openai.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        if (await request.json()).get("stream"):
+            return StreamingResponse(stream_tokens(), media_type="text/event-stream")
+        await asyncio.sleep(llm_latency)
+        return {
+            "id": "load-test", "object": "chat.completion", "created": 0, "model": "gpt-4",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "def noop():\n    pass"}}],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 10, "total_tokens": 60}
+        }
+
+    openai_port = _free_port()
+    _serve(fake_openai, openai_port)
+
+    os.environ["OPENAI_API_KEY"] = "load-test"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_port}/v1"
+    service_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [service_dir, os.path.dirname(service_dir)]
+    from main import app
+
+    service_port = _free_port()
+    _serve(app, service_port)
+    return f"http://127.0.0.1:{service_port}"
+
+
+async def run_level(url: str, concurrency: int, total: int, stream: bool = False) -> dict:
+    latencies, ttfts, statuses = [], [], {}
+    remaining = total
+    body = {"prompt": "reverse a string", "language": "python"}
+
+    async def client(http: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start_time = time.perf_counter()
+            if stream:
+                async with http.stream("POST", "/generate/stream", json=body) as response:
+                    first_token = None
+                    async for line in response.aiter_lines():
+                        # The first data line is the first code chunk; the ": generating" comment does not count
+                        if first_token is None and line.startswith("data:"):
+                            first_token = time.perf_counter() - start_time
+                    if first_token is not None:
+                        ttfts.append(first_token)
+            else:
+                response = await http.post("/generate", json=body)
+            latencies.append(time.perf_counter() - start_time)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as http:
+        start_time = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start_time
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+        "statuses": statuses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the code generation endpoint")
+    parser.add_argument("--url", help="Code service base URL; omit to run against a local fake LLM")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default 4x concurrency, min 8)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM latency in seconds")
+    parser.add_argument("--stream", action="store_true", help="Use /generate/stream and report time to first token")
+    args = parser.parse_args()
+
+    url = args.url or start_local_service(args.llm_latency)
+
+    ttft_header = f" {'ttft50':>7} {'ttft95':>7}" if args.stream else ""
+    print(f"{'conc':>5} {'reqs':>5} {'req/s':>8}{ttft_header} {'p50 s':>7} {'p95 s':>7}  statuses")
+    for concurrency in args.concurrency:
+        total = args.requests or max(8, 4 * concurrency)
+        result = asyncio.run(run_level(url, concurrency, total, args.stream))
+        ttft = f" {result['ttft_p50']:>7.3f} {result['ttft_p95']:>7.3f}" if args.stream else ""
+        print(f"{result['concurrency']:>5} {result['requests']:>5} {result['throughput']:>8.2f}{ttft} "
+              f"{result['p50']:>7.3f} {result['p95']:>7.3f}  {result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from contextlib import aclosing
+import asyncio
+import json
 import structlog
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import JSONResponse
 import time
 import os
 from code_generator import CodeGenerator
+from code_cache import create_code_cache
+from openai_client import close_openai_clients
+from concurrency import generation_limiter, cancel_on_disconnect, GenerationQueueFull, ClientDisconnected
+from batch import generate_batch, collect_batch
+from metrics import CODE_GENERATION_REQUESTS, CODE_GENERATION_DURATION, CODE_GENERATION_ERRORS
+from metrics import CODE_GENERATION_DEADLINE_EXCEEDED, CODE_GENERATION_WASTED_SECONDS, CODE_GENERATION_CANCELLED
+from metrics import CODE_GENERATION_TTFT, CODE_GENERATION_STREAM_DURATION, CODE_BATCH_SIZE, CODE_BATCH_DURATION
+from deadline import DeadlineExceeded, deadline_from_headers, remaining
+from common.instrumentation import instrument
 
 # Configure structured logging
 structlog.configure(
@@ -29,11 +40,6 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Prometheus metrics
-CODE_GENERATION_REQUESTS = Counter('code_generation_requests_total', 'Total code generation requests')
-CODE_GENERATION_DURATION = Histogram('code_generation_duration_seconds', 'Code generation processing time')
-CODE_GENERATION_ERRORS = Counter('code_generation_errors_total', 'Total code generation errors')
-
 app = FastAPI(
     title="CodeVoice Code Generation Service",
     description="Microservice for AI-powered code generation",
@@ -49,6 +55,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument(app, "code-service")
+
+# Shares one pooled OpenAI client and one code cache across every request
+code_generator = CodeGenerator(cache=create_code_cache())
+
+@app.on_event("shutdown")
+async def shutdown_openai_clients():
+    await close_openai_clients()
+    if code_generator.cache is not None:
+        await code_generator.cache.close()
+
 class CodeRequest(BaseModel):
     prompt: str
     language: str = "python"
@@ -64,17 +81,18 @@ class CodeResponse(BaseModel):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "code-service"}
-
-@app.get("/metrics")
-async def metrics():
-    """Prometheus metrics endpoint"""
-    return JSONResponse(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return {
+        "status": "healthy",
+        "service": "code-service",
+        "generation": generation_limiter.stats(),
+        "cache": code_generator.cache.stats() if code_generator.cache is not None else None
+    }
 
 @app.post("/generate", response_model=CodeResponse)
-async def generate_code(request: CodeRequest):
+async def generate_code(request: CodeRequest, http_request: Request):
     """Generate code based on natural language prompt"""
     start_time = time.time()
+    deadline = deadline_from_headers(http_request.headers)
     CODE_GENERATION_REQUESTS.inc()
     
     try:
@@ -82,11 +100,17 @@ async def generate_code(request: CodeRequest):
                    language=request.language,
                    prompt_length=len(request.prompt))
         
-        # Initialize code generator
-        code_gen = CodeGenerator()
-        
-        # Generate code
-        code = code_gen.generate_code(request.prompt, request.language)
+        # Cache hits skip the generation queue entirely
+        cached, _ = await code_generator.cached_code(request.prompt, request.language, request.style)
+        if cached is not None:
+            code = cached.code
+        else:
+            # Generate code without blocking the event loop; the slot caps concurrent LLM calls per worker
+            async with generation_limiter.slot(timeout=remaining(deadline)):
+                code = await cancel_on_disconnect(
+                    http_request,
+                    code_generator.agenerate_code(request.prompt, request.language, timeout=remaining(deadline), style=request.style)
+                )
         
         if code.startswith("# Error generating"):
             CODE_GENERATION_ERRORS.inc()
@@ -109,62 +133,180 @@ async def generate_code(request: CodeRequest):
             tokens_used=len(code.split())  # Rough estimate
         )
         
+    except DeadlineExceeded as e:
+        CODE_GENERATION_DEADLINE_EXCEEDED.inc()
+        CODE_GENERATION_WASTED_SECONDS.inc(time.time() - start_time)
+        logger.warning("⏱️ Code generation deadline exceeded", error=str(e))
+        raise HTTPException(status_code=504, detail="Code generation deadline exceeded")
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ClientDisconnected:
+        # Nobody is listening; 499 (client closed request) only shows up in metrics and logs
+        return Response(status_code=499)
+    except HTTPException:
+        raise
     except Exception as e:
         CODE_GENERATION_ERRORS.inc()
         logger.error("❌ Error generating code", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate/batch")
-async def generate_code_batch(code_requests: list[CodeRequest]):
-    """Generate multiple code snippets in batch"""
-    start_time = time.time()
-    
+# Keeps proxies (nginx honours X-Accel-Buffering) from holding events back
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def code_stream_events(request: CodeRequest, deadline, start_time: float):
+    """Server-Sent Events for one streamed generation; nothing is produced until a generation slot is held or the cache answered"""
+    cached, level = await code_generator.cached_code(request.prompt, request.language, request.style)
+    if cached is None:
+        await generation_limiter.acquire(timeout=remaining(deadline))
     try:
-        logger.info("🤖 Received batch code generation request", 
-                   batch_size=len(code_requests))
-        
-        code_gen = CodeGenerator()
-        results = []
-        
-        for i, request in enumerate(code_requests):
-            try:
-                code = code_gen.generate_code(request.prompt, request.language)
-                
-                results.append({
-                    "index": i,
-                    "code": code,
-                    "success": not code.startswith("# Error generating"),
-                    "language": request.language,
-                    "prompt": request.prompt
-                })
-                
-            except Exception as e:
-                logger.error(f"❌ Error generating code {i}", error=str(e))
-                results.append({
-                    "index": i,
-                    "code": "",
-                    "success": False,
-                    "error": str(e),
-                    "language": request.language,
-                    "prompt": request.prompt
-                })
-        
+        # An SSE comment, so the client gets headers while the LLM works on the first token
+        yield ": generating\n\n"
+
+        ttft = None
+        usage = {}
+        try:
+            if cached is not None:
+                chunks = cached_chunks(cached, level)
+            else:
+                chunks = code_generator.astream_code(request.prompt, request.language, timeout=remaining(deadline), style=request.style)
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    if "usage" in chunk:
+                        usage = chunk["usage"]
+                        continue
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                        CODE_GENERATION_TTFT.observe(ttft)
+                    yield sse_event(chunk)
+        except DeadlineExceeded as e:
+            CODE_GENERATION_DEADLINE_EXCEEDED.inc()
+            CODE_GENERATION_WASTED_SECONDS.inc(time.time() - start_time)
+            logger.warning("⏱️ Code streaming deadline exceeded", error=str(e))
+            yield sse_event({"detail": "Code generation deadline exceeded"}, event="error")
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            CODE_GENERATION_CANCELLED.inc()
+            logger.info("🔌 Client disconnected, cancelled code streaming")
+            raise
+        except Exception as e:
+            CODE_GENERATION_ERRORS.inc()
+            logger.error("❌ Error streaming code", error=str(e))
+            yield sse_event({"detail": f"Code generation failed: {e}"}, event="error")
+            return
+
         duration = time.time() - start_time
-        
-        logger.info("✅ Batch code generation completed", 
-                   batch_size=len(code_requests),
+        CODE_GENERATION_DURATION.observe(duration)
+        CODE_GENERATION_STREAM_DURATION.observe(duration)
+
+        logger.info("✅ Code streaming completed",
+                   language=request.language,
+                   ttft_seconds=ttft,
                    duration_seconds=duration)
-        
-        return {
-            "results": results,
-            "total_duration": duration,
-            "successful_generations": sum(1 for r in results if r["success"])
-        }
-        
+
+        yield sse_event({"language": request.language, "usage": usage, "ttft": ttft, "duration": duration}, event="done")
+    finally:
+        if cached is None:
+            generation_limiter.release()
+
+async def cached_chunks(cached, level: str):
+    """A cache hit in the shape of ``astream_code`` output: the whole code as one delta"""
+    yield {"delta": cached.code}
+    yield {"usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                     "cached": level, "saved_tokens": cached.tokens}}
+
+async def prepend_event(first: str, events):
+    async with aclosing(events):
+        yield first
+        async for event in events:
+            yield event
+
+@app.post("/generate/stream")
+async def generate_code_stream(request: CodeRequest, http_request: Request):
+    """Stream generated code as Server-Sent Events.
+
+    Each default event carries ``{"delta": "..."}`` with the next piece of code,
+    markdown fences already stripped. The stream ends with a ``done`` event
+    holding token usage, time to first token and duration, or an ``error`` event.
+    """
+    start_time = time.time()
+    deadline = deadline_from_headers(http_request.headers)
+    CODE_GENERATION_REQUESTS.inc()
+
+    logger.info("🤖 Received code streaming request",
+               language=request.language,
+               prompt_length=len(request.prompt))
+
+    events = code_stream_events(request, deadline, start_time)
+    try:
+        # Run up to slot admission here, so a full queue is still a plain 503 instead of a broken stream
+        first = await events.__anext__()
+    except GenerationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        CODE_GENERATION_DEADLINE_EXCEEDED.inc()
+        CODE_GENERATION_WASTED_SECONDS.inc(time.time() - start_time)
+        logger.warning("⏱️ Code streaming deadline exceeded", error=str(e))
+        raise HTTPException(status_code=504, detail="Code generation deadline exceeded")
+
+    return StreamingResponse(prepend_event(first, events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/generate/batch")
+async def generate_code_batch(code_requests: list[CodeRequest], http_request: Request, stream: bool = False):
+    """Generate multiple code snippets concurrently.
+
+    Results come back in request order, or with ``?stream=true`` as
+    Server-Sent Events in completion order followed by a ``done`` summary.
+    """
+    start_time = time.time()
+    deadline = deadline_from_headers(http_request.headers)
+    CODE_BATCH_SIZE.observe(len(code_requests))
+
+    logger.info("🤖 Received batch code generation request", 
+               batch_size=len(code_requests),
+               stream=stream)
+
+    if stream:
+        return StreamingResponse(batch_stream_events(code_requests, deadline, start_time),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+
+    try:
+        results = await cancel_on_disconnect(http_request, collect_batch(code_requests, code_generator, deadline))
+    except ClientDisconnected:
+        return Response(status_code=499)
     except Exception as e:
         logger.error("❌ Error processing batch", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {"results": results, **batch_summary(results, start_time)}
+
+async def batch_stream_events(code_requests: list, deadline, start_time: float):
+    results = []
+    async with aclosing(generate_batch(code_requests, code_generator, deadline)) as batch:
+        async for result in batch:
+            results.append(result)
+            yield sse_event(result)
+    yield sse_event(batch_summary(results, start_time), event="done")
+
+def batch_summary(results: list, start_time: float) -> dict:
+    # Items run concurrently, so the wall-clock duration is what the caller waited
+    duration = time.time() - start_time
+    CODE_BATCH_DURATION.observe(duration)
+
+    logger.info("✅ Batch code generation completed", 
+               batch_size=len(results),
+               duration_seconds=duration)
+
+    return {
+        "total_duration": duration,
+        "item_duration_sum": sum(r["duration"] for r in results if "duplicate_of" not in r),
+        "successful_generations": sum(1 for r in results if r["success"]),
+        "deduplicated": sum(1 for r in results if "duplicate_of" in r)
+    }
+
 @app.get("/languages")
 async def get_supported_languages():
     """Get list of supported programming languages"""
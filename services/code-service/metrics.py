@@ -0,0 +1,82 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request-level metrics
+CODE_GENERATION_REQUESTS = Counter('code_generation_requests_total', 'Total code generation requests')
+CODE_GENERATION_DURATION = Histogram('code_generation_duration_seconds', 'Code generation processing time')
+CODE_GENERATION_ERRORS = Counter('code_generation_errors_total', 'Total code generation errors')
+CODE_GENERATION_DEADLINE_EXCEEDED = Counter('code_generation_deadline_exceeded_total', 'Code generations abandoned at their propagated deadline')
+CODE_GENERATION_WASTED_SECONDS = Counter('code_generation_deadline_wasted_seconds_total', 'LLM time spent on generations abandoned at their deadline')
+
+# Streaming metrics; time to first token is what a user waiting on /generate/stream feels
+CODE_GENERATION_TTFT = Histogram(
+    'code_generation_time_to_first_token_seconds',
+    'Time from receiving a streamed generation request to sending its first code chunk',
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30)
+)
+CODE_GENERATION_STREAM_DURATION = Histogram(
+    'code_generation_stream_duration_seconds',
+    'Time from receiving a streamed generation request to sending its final event',
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+
+# OpenAI client metrics
+OPENAI_REQUESTS = Counter(
+    'openai_requests_total',
+    'HTTP requests sent to the OpenAI API, including SDK retries',
+    ['endpoint', 'status']
+)
+OPENAI_LATENCY = Histogram(
+    'openai_request_latency_seconds',
+    'Time from sending an OpenAI request to receiving its response headers',
+    ['endpoint'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+OPENAI_CONNECTIONS_OPENED = Counter(
+    'openai_connections_opened_total',
+    'New TCP connections opened to the OpenAI API; compare with requests for the reuse ratio'
+)
+CODE_GENERATOR_PREP_DURATION = Histogram(
+    'code_generator_prep_seconds',
+    'Local time spent preparing a generation before the OpenAI request is sent',
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
+
+# Per-worker concurrency metrics
+GENERATION_IN_FLIGHT = Gauge('code_generation_in_flight', 'Code generations currently waiting on the LLM')
+GENERATION_QUEUE_DEPTH = Gauge('code_generation_queue_depth', 'Code generations waiting for a concurrency slot')
+GENERATION_QUEUE_WAIT = Histogram(
+    'code_generation_queue_wait_seconds',
+    'Time spent waiting for a code generation concurrency slot',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30)
+)
+GENERATION_REJECTED = Counter('code_generation_rejected_total', 'Code generations rejected because the queue was full')
+CODE_GENERATION_CANCELLED = Counter('code_generation_cancelled_total', 'Code generations cancelled because the client disconnected')
+
+# Batch metrics
+CODE_BATCH_SIZE = Histogram(
+    'code_batch_size',
+    'Requests per /generate/batch call',
+    buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+CODE_BATCH_DURATION = Histogram(
+    'code_batch_duration_seconds',
+    'Wall-clock time to finish a whole /generate/batch call',
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+CODE_BATCH_DEDUPLICATED = Counter('code_batch_deduplicated_total', 'Batch items answered from an identical prompt in the same batch')
+
+# Generated code cache; hit rate is non-miss results over all lookups
+CODE_CACHE_REQUESTS = Counter('code_cache_requests_total', 'Code cache lookups by the level that answered, or miss', ['result'])
+CODE_CACHE_SAVED_SECONDS = Counter(
+    'code_cache_saved_seconds_total',
+    'Generation time avoided by cache hits, taken from the original generation',
+    ['level']
+)
+CODE_CACHE_SAVED_TOKENS = Counter('code_cache_saved_tokens_total', 'OpenAI tokens avoided by cache hits', ['level'])
+CODE_CACHE_ENTRIES = Gauge('code_cache_entries', 'Generated code entries held in this worker')
+CODE_CACHE_EVICTIONS = Counter('code_cache_evictions_total', 'Code cache entries evicted to stay within CODE_CACHE_MAX_ENTRIES')
+CODE_CACHE_SIMILARITY = Histogram(
+    'code_cache_best_similarity',
+    'Best sketch similarity found by similarity lookups; use it to tune CODE_CACHE_SIMILARITY_THRESHOLD',
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+)
@@ -0,0 +1,93 @@
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+import os
+import threading
+import time
+import httpx
+import structlog
+
+from metrics import OPENAI_REQUESTS, OPENAI_LATENCY, OPENAI_CONNECTIONS_OPENED
+
+logger = structlog.get_logger()
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _event_hooks() -> dict:
+    """Hooks that time each call and count new connections via httpcore's trace extension"""
+
+    async def trace(event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            OPENAI_CONNECTIONS_OPENED.inc()
+
+    async def on_request(request: httpx.Request):
+        request.extensions["trace"] = trace
+        request.extensions["openai_start"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response):
+        request = response.request
+        endpoint = request.url.path
+        OPENAI_LATENCY.labels(endpoint).observe(time.perf_counter() - request.extensions["openai_start"])
+        OPENAI_REQUESTS.labels(endpoint, str(response.status_code)).inc()
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def _load_api_key() -> str:
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("Missing OpenAI API key in .env file")
+    return api_key
+
+
+def _pool_options() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+    }
+
+
+def _create_async_client() -> AsyncOpenAI:
+    api_key = _load_api_key()
+    http_client = httpx.AsyncClient(event_hooks=_event_hooks(), **_pool_options())
+    logger.info("✅ Async OpenAI client ready",
+               max_connections=OPENAI_MAX_CONNECTIONS,
+               max_keepalive=OPENAI_MAX_KEEPALIVE,
+               keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY)
+    return AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=OPENAI_MAX_RETRIES)
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Return the process-wide async OpenAI client, creating it on first use.
+
+    Every generation shares one keep-alive connection pool, so only the first
+    calls pay for TCP and TLS handshakes. The pool belongs to the event loop
+    that first uses it.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = _create_async_client()
+    return _async_client
+
+
+async def close_openai_clients():
+    global _async_client
+    with _client_lock:
+        async_client, _async_client = _async_client, None
+    if async_client is not None:
+        await async_client.close()
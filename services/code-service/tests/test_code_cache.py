@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from code_cache import CodeCache, normalize_prompt, prompt_sketch, similarity
+
+MODEL = "gpt-4"
+
+
+def put(cache: CodeCache, prompt: str, code: str, language: str = "python", style: str = "clean"):
+    asyncio.run(cache.put(prompt, language, style, MODEL, code, 1.5, 100))
+
+
+def get(cache: CodeCache, prompt: str, language: str = "python", style: str = "clean") -> tuple:
+    entry, level = asyncio.run(cache.get(prompt, language, style, MODEL))
+    return (entry.code if entry else None), level
+
+
+def test_normalize_ignores_case_whitespace_and_trailing_punctuation():
+    assert normalize_prompt("  Sort a   LIST of numbers?! ") == "sort a list of numbers"
+
+
+def test_sketch_drops_stopwords_and_stems():
+    assert prompt_sketch("Please write a function reversing strings", "python") == \
+        prompt_sketch("function reverse string", "python")
+
+
+def test_jaccard_similarity():
+    first = frozenset({"a", "b", "c"})
+    assert similarity(first, first) == 1.0
+    assert similarity(first, frozenset({"b", "c", "d"})) == pytest.approx(0.5)
+    assert similarity(first, frozenset()) == 0.0
+
+
+def test_bigrams_keep_word_order_significant():
+    forward = prompt_sketch("convert celsius to fahrenheit", "python")
+    backward = prompt_sketch("convert fahrenheit to celsius", "python")
+    assert similarity(forward, backward) < 0.8
+
+
+def test_exact_hit_after_normalization(clock):
+    cache = CodeCache(clock=clock)
+    put(cache, "Sort a list of numbers", "sorted(xs)")
+    assert get(cache, "sort a   list of numbers.") == ("sorted(xs)", "exact")
+
+
+def test_similar_hit_above_threshold(clock):
+    cache = CodeCache(similarity_threshold=0.8, clock=clock)
+    put(cache, "function that reverses a string", "s[::-1]")
+    assert get(cache, "write a function that reverses strings please") == ("s[::-1]", "similar")
+    assert get(cache, "function that reverses a linked list") == (None, "miss")
+
+
+def test_threshold_above_one_disables_similarity(clock):
+    cache = CodeCache(similarity_threshold=1.1, clock=clock)
+    put(cache, "function that reverses a string", "s[::-1]")
+    assert get(cache, "write a function that reverses strings please") == (None, "miss")
+
+
+def test_language_and_style_are_separate_partitions(clock):
+    cache = CodeCache(clock=clock)
+    put(cache, "reverse a string", "s[::-1]")
+    assert get(cache, "reverse a string", language="go") == (None, "miss")
+    assert get(cache, "reverse a string", style="enterprise") == (None, "miss")
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = CodeCache(max_entries=2, similarity_threshold=1.1, clock=clock)
+    put(cache, "first prompt", "1")
+    put(cache, "second prompt", "2")
+    assert get(cache, "first prompt") == ("1", "exact")
+    put(cache, "third prompt", "3")
+    assert get(cache, "second prompt") == (None, "miss")
+    assert get(cache, "first prompt") == ("1", "exact")
+    assert get(cache, "third prompt") == ("3", "exact")
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = CodeCache(ttl=60, clock=clock)
+    put(cache, "reverse a string", "s[::-1]")
+    clock.now += 59
+    assert get(cache, "reverse a string") == ("s[::-1]", "exact")
+    clock.now += 1
+    assert get(cache, "reverse a string") == (None, "miss")
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entry_does_not_shadow_live_similar_one(clock):
+    cache = CodeCache(ttl=60, similarity_threshold=0.5, clock=clock)
+    put(cache, "sort a list of integers quickly", "stale")
+    clock.now += 30
+    put(cache, "sort a list of integers", "live")
+    clock.now += 30
+    assert get(cache, "please sort a list of integers quickly now") == ("live", "similar")
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,44 @@
+from openai import AsyncOpenAI
+import pytest
+
+import code_generator
+from code_generator import CodeGenerator, FenceStripper, strip_fences
+
+
+def test_deadline_bound_calls_are_not_retried(monkeypatch):
+    client = AsyncOpenAI(api_key="test", max_retries=2)
+    monkeypatch.setattr(code_generator, "get_async_openai_client", lambda: client)
+    generator = CodeGenerator()
+    assert generator._client_for(None) is client
+    bounded = generator._client_for(5.0)
+    assert bounded.max_retries == 0
+    # Same connection pool, only the retry policy differs
+    assert bounded._client is client._client
+
+
+def stream_through(deltas: list) -> str:
+    stripper = FenceStripper()
+    return "".join(stripper.feed(delta) for delta in deltas) + stripper.finish()
+
+
+@pytest.mark.parametrize("response", [
+    "```python\nprint('hi')\n```",
+    "```\nx = 1\ny = `2`\n```\n",
+    "  plain code, no fence  ",
+    "print('``')",
+    "",
+])
+def test_fence_stripper_matches_strip_fences_at_any_split(response):
+    expected = strip_fences(response)
+    for size in range(1, len(response) + 1):
+        deltas = [response[i:i + size] for i in range(0, len(response), size)]
+        assert stream_through(deltas) == expected
+
+
+def test_fence_stripper_releases_code_before_the_stream_ends():
+    stripper = FenceStripper()
+    assert stripper.feed("```py") == ""
+    assert stripper.feed("thon\ndef f():\n") == "def f():"
+    assert stripper.feed("    return 1\n``") == "\n    return 1"
+    assert stripper.feed("`\n") == ""
+    assert stripper.finish() == ""
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from concurrency import GenerationLimiter, GenerationQueueFull
+from deadline import DeadlineExceeded
+
+
+def test_slot_wait_is_bounded_by_the_deadline():
+    async def scenario():
+        limiter = GenerationLimiter(max_concurrency=1, max_queue=4)
+        async with limiter.slot():
+            with pytest.raises(DeadlineExceeded):
+                async with limiter.slot(timeout=0.05):
+                    pass
+            assert limiter.stats()["queued"] == 0
+        # The abandoned wait must not have taken the slot with it
+        async with limiter.slot(timeout=0.05):
+            assert limiter.stats()["running"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected_without_waiting():
+    async def scenario():
+        limiter = GenerationLimiter(max_concurrency=1, max_queue=0)
+        async with limiter.slot():
+            with pytest.raises(GenerationQueueFull):
+                await limiter.acquire()
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+import pytest
+
+import openai_client
+from metrics import OPENAI_REQUESTS
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setattr(openai_client, "load_dotenv", lambda: None)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    yield
+    asyncio.run(openai_client.close_openai_clients())
+
+
+def test_client_is_shared_until_closed():
+    client = openai_client.get_async_openai_client()
+    assert openai_client.get_async_openai_client() is client
+    assert client.max_retries == openai_client.OPENAI_MAX_RETRIES
+
+    asyncio.run(openai_client.close_openai_clients())
+    assert client._client.is_closed
+    assert openai_client.get_async_openai_client() is not client
+
+
+def test_missing_key_is_reported(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY")
+    with pytest.raises(ValueError, match="Missing OpenAI API key"):
+        openai_client.get_async_openai_client()
+
+
+def test_hooks_count_requests_per_endpoint():
+    labels = OPENAI_REQUESTS.labels("/v1/models", "200")
+    before = labels._value.get()
+
+    async def call():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200))
+        async with httpx.AsyncClient(transport=transport, event_hooks=openai_client._event_hooks()) as client:
+            await client.get("https://api.openai.com/v1/models")
+
+    asyncio.run(call())
+    assert labels._value.get() == before + 1
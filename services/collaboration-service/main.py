@@ -7,6 +7,8 @@ from typing import Dict, List, Optional
 import asyncio
 from datetime import datetime
 
+from common.instrumentation import instrument
+
 app = FastAPI()
 
 app.add_middleware(
@@ -17,6 +19,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument(app, "collaboration-service")
+
 # Store active connections and sessions
 class ConnectionManager:
     def __init__(self):
@@ -8,6 +8,8 @@ from datetime import datetime
 import uuid
 import difflib
 
+from common.instrumentation import instrument
+
 app = FastAPI(title="Collaborative Documents Service", version="1.0.0")
 
 # CORS middleware
@@ -19,6 +21,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument(app, "collaborative-docs-service")
+
 # Data models
 class Document(BaseModel):
     id: str
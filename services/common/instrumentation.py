@@ -0,0 +1,238 @@
+"""
+Shared Prometheus instrumentation for the CodeVoice FastAPI services.
+
+Usage:
+    from common.instrumentation import instrument
+    instrument(app, "speech-service")
+
+This mounts a pure ASGI middleware recording per-route latency, in-flight
+requests and request/response sizes, samples event-loop lag in the
+background while the app is running, and serves ``/metrics`` in the
+Prometheus text format. With ``TRACING_ENABLED=true`` it also mounts the
+tracing middleware from ``common.tracing``, and with ``PROFILING_TOKEN`` set
+the ``/admin/profile`` endpoint from ``common.profiling``.
+"""
+
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+from prometheus_client import Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from starlette.routing import Match
+
+from common import tracing
+from common.profiling import register_profiling
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+# Requests that did not match any route share one label to keep cardinality bounded
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time from receiving a request to sending the last byte of its response',
+    ['service', 'method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being handled',
+    ['service']
+)
+REQUEST_SIZE = Histogram(
+    'http_request_size_bytes',
+    'Request body size',
+    ['service', 'route'],
+    buckets=SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Response body size',
+    ['service', 'route'],
+    buckets=SIZE_BUCKETS
+)
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'How late the event loop woke a sleeping sampler task',
+    ['service'],
+    buckets=LAG_BUCKETS
+)
+EVENT_LOOP_LAG_MAX = Gauge(
+    'event_loop_lag_max_seconds',
+    'Worst event-loop lag seen since the previous scrape',
+    ['service']
+)
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware recording latency, in-flight requests and body sizes per route template.
+
+    Label children are resolved once per (method, route, status) and cached, so
+    the per-request cost is a few dict lookups and histogram observations.
+    """
+
+    def __init__(self, app, service: str, router=None):
+        self.app = app
+        self.service = service
+        self.router = router
+        self.in_flight = REQUESTS_IN_FLIGHT.labels(service)
+        self._route_names = {}
+        self._duration = {}
+        self._sizes = {}
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+
+        # Older Starlette only leaves the endpoint in the scope; map it back to its path once
+        endpoint = scope.get("endpoint")
+        if endpoint is None or self.router is None:
+            return UNMATCHED_ROUTE
+        key = (id(endpoint), scope["method"])
+        name = self._route_names.get(key)
+        if name is None:
+            name = UNMATCHED_ROUTE
+            for candidate in self.router.routes:
+                if getattr(candidate, "endpoint", None) is endpoint and candidate.matches(scope)[0] == Match.FULL:
+                    name = candidate.path
+                    break
+            self._route_names[key] = name
+        return name
+
+    def _observe(self, method: str, route: str, status: int, elapsed: float, request_bytes: int, response_bytes: int):
+        duration = self._duration.get((method, route, status))
+        if duration is None:
+            duration = self._duration[(method, route, status)] = REQUEST_DURATION.labels(
+                self.service, method, route, str(status))
+        duration.observe(elapsed)
+
+        sizes = self._sizes.get(route)
+        if sizes is None:
+            sizes = self._sizes[route] = (REQUEST_SIZE.labels(self.service, route),
+                                          RESPONSE_SIZE.labels(self.service, route))
+        sizes[0].observe(request_bytes)
+        sizes[1].observe(response_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        state = {"status": 500, "request_bytes": 0, "response_bytes": 0}
+
+        content_length = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                content_length = value
+                break
+
+        if content_length is not None and content_length.isdigit():
+            state["request_bytes"] = int(content_length)
+            wrapped_receive = receive
+        else:
+            # Chunked uploads have no length header, so count the body as it is read
+            async def wrapped_receive():
+                message = await receive()
+                if message["type"] == "http.request":
+                    state["request_bytes"] += len(message.get("body", b""))
+                return message
+
+        async def wrapped_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, wrapped_receive, wrapped_send)
+        finally:
+            self.in_flight.dec()
+            self._observe(scope["method"], self._route_template(scope), state["status"],
+                          time.perf_counter() - start_time, state["request_bytes"], state["response_bytes"])
+
+
+class EventLoopLagMonitor:
+    """Background task that sleeps for a fixed interval and records how late it wakes up"""
+
+    def __init__(self, service: str, interval: float = EVENT_LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.lag = EVENT_LOOP_LAG.labels(service)
+        self.lag_max = EVENT_LOOP_LAG_MAX.labels(service)
+        self._worst = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag.observe(lag)
+            if lag > self._worst:
+                self._worst = lag
+                self.lag_max.set(lag)
+
+    def reset_max(self):
+        """Start a new max window; called on every scrape"""
+        self._worst = 0.0
+        self.lag_max.set(0.0)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def instrument(app: FastAPI, service: str) -> EventLoopLagMonitor:
+    """Mount request metrics, tracing, event-loop lag sampling and ``/metrics`` on a FastAPI app"""
+    monitor = EventLoopLagMonitor(service)
+
+    tracing.configure(service)
+    if tracing.TRACING_ENABLED:
+        app.add_middleware(tracing.TracingMiddleware)
+
+    # Added last so it wraps CORS and every other middleware the app registered
+    app.add_middleware(InstrumentationMiddleware, service=service, router=app.router)
+
+    # Wrap whatever lifespan the app already has, so startup hooks and lifespan apps both work
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_instance):
+        monitor.start()
+        try:
+            async with app_lifespan(app_instance) as state:
+                yield state
+        finally:
+            await monitor.close()
+
+    app.router.lifespan_context = lifespan
+
+    async def metrics():
+        """Prometheus metrics endpoint"""
+        content = generate_latest()
+        monitor.reset_max()
+        return Response(content=content, media_type=CONTENT_TYPE_LATEST)
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    register_profiling(app)
+    return monitor
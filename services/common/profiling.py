@@ -0,0 +1,205 @@
+"""
+On-demand profiling for the CodeVoice services.
+
+``GET /admin/profile`` is mounted by ``instrument()`` only when
+``PROFILING_TOKEN`` is set, and every call must send it in ``X-Admin-Token``.
+Nothing runs between captures, so leaving it enabled costs nothing while idle.
+
+Modes:
+    cpu     samples Python threads that used CPU since the previous sample,
+            weighted by microseconds of thread CPU time (native work such as
+            ffmpeg or CTranslate2 shows up under the Python frame that called it)
+    wall    samples every thread plus every pending asyncio task, so time spent
+            awaiting I/O or locks is visible too; weights are sample counts
+    memory  tracemalloc snapshot diff over the capture window
+
+cpu and wall return collapsed stacks (``frame;frame;frame weight``), which
+flamegraph.pl, speedscope and inferno read directly. memory returns the top
+allocation growth as text, or collapsed stacks with ``output=collapsed``.
+
+Usage:
+    curl -H "X-Admin-Token: $PROFILING_TOKEN" "http://localhost:8001/admin/profile?mode=cpu&seconds=30" > cpu.folded
+    flamegraph.pl cpu.folded > cpu.svg
+"""
+
+from collections import Counter
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from prometheus_client import Counter as MetricCounter
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_MAX_HZ = 1000
+
+PROFILES_CAPTURED = MetricCounter(
+    'profiles_captured_total',
+    'On-demand profiles captured through /admin/profile',
+    ['mode']
+)
+
+# One capture at a time per process; concurrent samplers would skew each other
+_capture_lock = threading.Lock()
+
+
+def _frame_name(code) -> str:
+    path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> list:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _task_stack(task) -> list:
+    """Follow a task's chain of awaited coroutines from the outermost one down"""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_name(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+def _thread_cpu_clock(ident: int):
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def sample_stacks(mode: str, seconds: float, hz: int, loop=None) -> tuple:
+    """Sample stacks for ``seconds`` on the calling thread; returns (collapsed stack counts, samples taken)"""
+    interval = 1.0 / hz
+    me = threading.get_ident()
+    stacks = Counter()
+    cpu_clocks, last_cpu = {}, {}
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            weight = 1
+            if mode == "cpu":
+                if ident not in cpu_clocks:
+                    cpu_clocks[ident] = _thread_cpu_clock(ident)
+                clock = cpu_clocks[ident]
+                if clock is None:
+                    continue
+                try:
+                    now = time.clock_gettime(clock)
+                except OSError:
+                    continue
+                previous = last_cpu.get(ident)
+                last_cpu[ident] = now
+                # Idle threads have not burned CPU since the last sample and are skipped
+                weight = int((now - previous) * 1_000_000) if previous is not None else 0
+                if weight <= 0:
+                    continue
+            stack = [f"thread:{names.get(ident, ident)}"] + _thread_stack(frame)
+            stacks[";".join(stack)] += weight
+
+        if mode == "wall" and loop is not None:
+            try:
+                tasks = asyncio.all_tasks(loop)
+            except RuntimeError:
+                tasks = ()
+            for task in tasks:
+                if not task.done():
+                    stack = _task_stack(task)
+                    if stack:
+                        stacks[";".join(["asyncio-tasks"] + stack)] += 1
+
+        samples += 1
+        time.sleep(interval)
+
+    return stacks, samples
+
+
+def memory_diff(seconds: float, output: str, limit: int, depth: int) -> str:
+    """Diff two tracemalloc snapshots taken ``seconds`` apart"""
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(depth)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+
+    if output == "collapsed":
+        lines = []
+        for stat in after.compare_to(before, "traceback"):
+            if stat.size_diff > 0:
+                stack = ";".join(f"{frame.filename.rsplit('/', 1)[-1]}:{frame.lineno}" for frame in stat.traceback)
+                lines.append(f"{stack} {stat.size_diff}")
+        return "\n".join(lines) + "\n"
+
+    stats = after.compare_to(before, "lineno")
+    growth = sum(stat.size_diff for stat in stats)
+    lines = [f"# traced now {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB, "
+             f"net change {growth / 1e6:+.2f} MB over {seconds:g}s"]
+    lines.extend(str(stat) for stat in stats[:limit])
+    return "\n".join(lines) + "\n"
+
+
+async def profile(request: Request, mode: str = "cpu", seconds: float = 10.0, hz: int = 100,
+                  output: str = "", limit: int = 50, depth: int = 25):
+    """Capture a CPU, wall-clock or memory profile of this process"""
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if mode not in ("cpu", "wall", "memory"):
+        raise HTTPException(status_code=400, detail="mode must be one of cpu, wall, memory")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS:.0f}]")
+    hz = max(1, min(hz, PROFILE_MAX_HZ))
+
+    if not _capture_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    try:
+        PROFILES_CAPTURED.labels(mode).inc()
+        # The capture runs on a worker thread so the event loop keeps serving (and being sampled)
+        if mode == "memory":
+            content = await asyncio.to_thread(memory_diff, seconds, output, limit, max(1, depth))
+            return PlainTextResponse(content)
+
+        stacks, samples = await asyncio.to_thread(sample_stacks, mode, seconds, hz, asyncio.get_running_loop())
+    finally:
+        _capture_lock.release()
+
+    content = "".join(f"{stack} {weight}\n" for stack, weight in stacks.most_common())
+    return PlainTextResponse(content, headers={
+        "X-Profile-Samples": str(samples),
+        "X-Profile-Weight": "cpu_microseconds" if mode == "cpu" else "samples"
+    })
+
+
+def register_profiling(app: FastAPI):
+    """Mount ``/admin/profile`` when a ``PROFILING_TOKEN`` is configured"""
+    if PROFILING_TOKEN:
+        app.add_api_route("/admin/profile", profile, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Summarize spans exported by common/tracing.py.
+
+Prints latency percentiles per service and span name, then the span tree of
+the slowest traces with each span's self time (duration minus its children),
+which is where the p99 actually goes.
+
+All services can append to the same file (or concatenate one per service).
+
+Usage:
+    python trace_report.py traces.jsonl
+    python trace_report.py traces.jsonl --slowest 5
+"""
+
+import argparse
+import json
+from collections import defaultdict
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_spans(path: str) -> list:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def print_summary(spans: list):
+    durations = defaultdict(list)
+    for span in spans:
+        durations[(span["service"], span["name"])].append(span["duration_ms"])
+
+    print(f"{'service':<22} {'span':<40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for (service, name), values in sorted(durations.items(), key=lambda item: -percentile(item[1], 99)):
+        print(f"{service:<22} {name[:40]:<40} {len(values):>6} {percentile(values, 50):>9.1f} "
+              f"{percentile(values, 95):>9.1f} {percentile(values, 99):>9.1f}")
+
+
+def print_tree(span: dict, children: dict, depth: int = 0):
+    kids = sorted(children.get(span["span_id"], []), key=lambda s: s["start_ns"])
+    self_ms = span["duration_ms"] - sum(kid["duration_ms"] for kid in kids)
+    marker = " !" if span["status"] != "ok" else ""
+    print(f"  {'  ' * depth}{span['service']}: {span['name']}  "
+          f"{span['duration_ms']:.1f} ms (self {max(0.0, self_ms):.1f} ms){marker}")
+    for kid in kids:
+        print_tree(kid, children, depth + 1)
+
+
+def print_slowest(spans: list, count: int):
+    by_id = {span["span_id"]: span for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        # Spans whose parent lives in a service that did not export are treated as roots
+        if span["parent_id"] in by_id:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+
+    slowest = sorted(roots, key=lambda s: -s["duration_ms"])[:count]
+    for root in slowest:
+        print(f"\ntrace {root['trace_id']}")
+        print_tree(root, children)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize exported trace spans")
+    parser.add_argument("path", help="JSON-lines file written by TRACE_EXPORT_PATH")
+    parser.add_argument("--slowest", type=int, default=3, help="Slowest traces to print as trees")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    print_summary(spans)
+    print_slowest(spans, args.slowest)
+
+
+if __name__ == "__main__":
+    main()
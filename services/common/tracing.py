@@ -0,0 +1,257 @@
+"""
+Lightweight distributed tracing for the CodeVoice services.
+
+Trace context travels between services in the W3C ``traceparent`` header,
+so a request entering the gateway keeps one trace ID through the speech and
+code services. Finished spans are written as JSON lines to
+``TRACE_EXPORT_PATH``; ``trace_report.py`` summarizes that file.
+
+Tracing is off unless ``TRACING_ENABLED=true``. When it is off, ``span()``
+returns a shared no-op span and no middleware is mounted.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+# Head sampling: only traces started here use this rate, downstream services follow the caller's flag
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = b"x-trace-id"
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a ``00-<trace id>-<span id>-<flags>`` header, returning None if it is malformed"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+class SpanExporter:
+    """Appends finished spans to a JSON-lines file from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.shutdown)
+
+    def export(self, record: dict):
+        self._ensure_started()
+        self._queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", buffering=1) as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                lines = [json.dumps(record)]
+                # Drain whatever else is waiting so bursts become one write
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        f.write("\n".join(lines) + "\n")
+                        return
+                    lines.append(json.dumps(record))
+                f.write("\n".join(lines) + "\n")
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class Span:
+    """A timed operation; only sampled spans are exported"""
+
+    __slots__ = ("name", "context", "parent_id", "kind", "attributes", "status", "start_ns", "_start_perf", "_token")
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str], kind: str, attributes: dict):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = "error"
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+
+    def end(self):
+        if not self.context.sampled:
+            return
+        _exporter.export({
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "service": _service_name,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": (time.perf_counter() - self._start_perf) * 1000.0,
+            "status": self.status,
+            "attributes": self.attributes
+        })
+
+
+class _NoopSpan:
+    context = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+_exporter = SpanExporter(TRACE_EXPORT_PATH)
+_service_name = "unknown"
+
+
+def configure(service: str):
+    """Set the service name stamped on every exported span"""
+    global _service_name
+    _service_name = service
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _start(name: str, parent: Optional[SpanContext], kind: str, attributes: dict) -> Span:
+    if parent is None:
+        context = SpanContext(_new_id(128), _new_id(64), random.random() < TRACE_SAMPLE_RATE)
+        return Span(name, context, None, kind, attributes)
+    return Span(name, SpanContext(parent.trace_id, _new_id(64), parent.sampled), parent.span_id, kind, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Time a block as a child of the current span, or as a new trace if there is none"""
+    if not TRACING_ENABLED:
+        yield NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    active = _start(name, parent.context if parent is not None else None, kind, attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+
+def inject(headers: dict) -> dict:
+    """Write the current span's traceparent into outgoing headers; leaves them untouched without one"""
+    active = _current_span.get()
+    if active is not None:
+        headers[TRACEPARENT_HEADER] = format_traceparent(active.context)
+    return headers
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request, continuing the caller's trace if it sent one"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        server_span = _start(f"{scope['method']} {scope['path']}", parent, "server",
+                             {"http.method": scope["method"], "http.target": scope["path"]})
+        trace_id = server_span.context.trace_id.encode()
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                server_span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    server_span.status = "error"
+                # A proxied response may already carry the upstream's copy of the header
+                headers = [(name, value) for name, value in message.get("headers", []) if name.lower() != TRACE_ID_HEADER]
+                message["headers"] = headers + [(TRACE_ID_HEADER, trace_id)]
+            await send(message)
+
+        token = _current_span.set(server_span)
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            server_span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            # Name by route template once routing has resolved it, so spans group by endpoint
+            route = scope.get("route")
+            if route is not None and hasattr(route, "path"):
+                server_span.name = f"{scope['method']} {route.path}"
+            server_span.end()
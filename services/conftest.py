@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Services import the shared ``common`` package from here, as they do inside their containers
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClock:
+    """Stand-in for ``time.monotonic`` that only moves when a test advances ``now``"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
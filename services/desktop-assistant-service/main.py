@@ -2,8 +2,12 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
+from common.instrumentation import instrument
+
 app = FastAPI(title="Desktop Assistant Service", description="Processes voice commands for desktop automation.", version="0.1.0")
 
+instrument(app, "desktop-assistant-service")
+
 class VoiceCommandRequest(BaseModel):
     command: str
     user_id: Optional[str] = None
@@ -7,6 +7,8 @@ import asyncio
 from datetime import datetime
 import uuid
 
+from common.instrumentation import instrument
+
 app = FastAPI(title="Live AI Coding Service", version="1.0.0")
 
 # CORS middleware
@@ -18,6 +20,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument(app, "live-ai-coding-service")
+
 # Data models
 class CodeGenerationRequest(BaseModel):
     voice_command: str
@@ -0,0 +1,374 @@
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import queue
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import structlog
+
+from metrics import AUDIO_DECODE_DURATION, AUDIO_DECODE_TOTAL
+from common import tracing
+
+logger = structlog.get_logger()
+
+TARGET_SAMPLE_RATE = 16000
+
+# Formats libsndfile can decode without leaving the process
+SOUNDFILE_FORMATS = {"wav", "flac", "ogg", "aiff"}
+
+# Containers that need a seekable input, so they cannot be fed through stdin
+SEEKABLE_FORMATS = {"mp4", "m4a", "mov", "3gp"}
+
+FFMPEG_PIPE_COMMAND = [
+    'ffmpeg',
+    '-hide_banner',
+    '-loglevel', 'error',
+    '-i', 'pipe:0',
+    '-vn',
+    '-f', 'f32le',
+    '-acodec', 'pcm_f32le',
+    '-ar', str(TARGET_SAMPLE_RATE),
+    '-ac', '1',
+    'pipe:1'
+]
+
+
+# Live container streams: decode as soon as packets arrive instead of probing seconds of input first
+FFMPEG_STREAM_COMMAND = [
+    'ffmpeg',
+    '-hide_banner',
+    '-loglevel', 'error',
+    '-fflags', 'nobuffer',
+    '-probesize', '32768',
+    '-analyzeduration', '0',
+    '-i', 'pipe:0',
+    '-vn',
+    '-f', 'f32le',
+    '-acodec', 'pcm_f32le',
+    '-ar', str(TARGET_SAMPLE_RATE),
+    '-ac', '1',
+    '-flush_packets', '1',
+    'pipe:1'
+]
+
+
+# MIME types browsers and clients commonly send for uploaded audio
+CONTENT_TYPE_FORMATS = {
+    "audio/webm": "webm",
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/mp4": "mp4",
+    "audio/x-m4a": "m4a",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "video/webm": "webm"
+}
+
+
+def audio_format_from_content_type(content_type: str = None, filename: str = None) -> str:
+    """Guess the container format from a Content-Type header or file name, defaulting to webm"""
+    if content_type:
+        mime = content_type.split(";", 1)[0].strip().lower()
+        if mime in CONTENT_TYPE_FORMATS:
+            return CONTENT_TYPE_FORMATS[mime]
+    if filename and "." in filename:
+        return filename.rsplit(".", 1)[1].lower()
+    return "webm"
+
+
+class AudioDecodeError(Exception):
+    """Raised when audio bytes cannot be turned into samples"""
+
+
+def parse_pcm_wav(audio_data: bytes):
+    """Return float32 mono samples for a 16 kHz PCM WAV, or None if not applicable.
+
+    Only the header is inspected; sample data is viewed in place and converted
+    with a single copy.
+    """
+    if len(audio_data) < 12 or audio_data[:4] != b'RIFF' or audio_data[8:12] != b'WAVE':
+        return None
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(audio_data):
+        chunk_id = audio_data[pos:pos + 4]
+        chunk_size = struct.unpack_from('<I', audio_data, pos + 4)[0]
+        body = pos + 8
+
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                return None
+            fmt = struct.unpack_from('<HHIIHH', audio_data, body)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            audio_format, channels, sample_rate, _, block_align, bits = fmt
+            if sample_rate != TARGET_SAMPLE_RATE or channels < 1 or block_align == 0:
+                return None
+            if audio_format == 1 and bits == 16:
+                dtype = '<i2'
+            elif audio_format == 3 and bits == 32:
+                dtype = '<f4'
+            else:
+                return None
+
+            # Streaming writers may leave the data size unset, so clamp to the buffer
+            end = min(body + chunk_size, len(audio_data))
+            frames = (end - body) // block_align
+            samples = np.frombuffer(audio_data, dtype=dtype, count=frames * channels, offset=body)
+            if channels > 1:
+                samples = samples[::channels]
+
+            if dtype == '<i2':
+                audio_array = samples.astype(np.float32)
+                np.multiply(audio_array, 1.0 / 32768.0, out=audio_array)
+                return audio_array
+            return np.ascontiguousarray(samples, dtype=np.float32)
+
+        pos = body + chunk_size + (chunk_size & 1)
+
+    return None
+
+
+class FFmpegDecoderPool:
+    """Bounded pool of ffmpeg decoders fed through stdin/stdout.
+
+    Up to ``size`` idle ffmpeg processes are spawned ahead of time and wait on
+    stdin, so the fork/exec cost is paid off the request path. A replacement
+    is spawned in the background for every warm process taken or found dead;
+    requests that find none warm spawn one inline and leave the warm set alone.
+    """
+
+    def __init__(self, size: int, timeout: float = 30.0, command: list = None):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.command = command or FFMPEG_PIPE_COMMAND
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._warm = queue.Queue(maxsize=self.size)
+        self._spawner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ffmpeg-spawner")
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    def _replenish(self):
+        if self._closed:
+            return
+        try:
+            proc = self._spawn()
+        except Exception as e:
+            logger.error("❌ Failed to pre-spawn ffmpeg decoder", error=str(e))
+            return
+        try:
+            self._warm.put_nowait(proc)
+        except queue.Full:
+            proc.kill()
+            proc.wait()
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                for _ in range(self.size):
+                    self._spawner.submit(self._replenish)
+                self._started = True
+
+    def _take_process(self) -> tuple:
+        """Return a process and how many warm processes were used up getting it"""
+        taken = 0
+        while True:
+            try:
+                proc = self._warm.get_nowait()
+            except queue.Empty:
+                return self._spawn(), taken
+            taken += 1
+            if proc.poll() is None:
+                return proc, taken
+
+    def decode(self, audio_data: bytes) -> np.ndarray:
+        """Decode arbitrary audio bytes to float32 16 kHz mono"""
+        self._ensure_started()
+        with self._slots:
+            proc, taken = self._take_process()
+            for _ in range(taken):
+                self._spawner.submit(self._replenish)
+            try:
+                stdout, stderr = proc.communicate(input=audio_data, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise AudioDecodeError(f"ffmpeg timed out after {self.timeout}s")
+
+        if proc.returncode != 0:
+            raise AudioDecodeError(stderr.decode(errors="replace").strip() or "ffmpeg failed")
+        return np.frombuffer(stdout, dtype=np.float32)
+
+    def decode_file(self, audio_data: bytes, audio_format: str) -> np.ndarray:
+        """Decode containers that need seeking by handing ffmpeg a file path"""
+        with tempfile.NamedTemporaryFile(suffix=f'.{audio_format}') as input_file:
+            input_file.write(audio_data)
+            input_file.flush()
+            cmd = list(self.command)
+            cmd[cmd.index('pipe:0')] = input_file.name
+            with self._slots:
+                try:
+                    result = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    raise AudioDecodeError(f"ffmpeg timed out after {self.timeout}s")
+
+        if result.returncode != 0:
+            raise AudioDecodeError(result.stderr.decode(errors="replace").strip() or "ffmpeg failed")
+        return np.frombuffer(result.stdout, dtype=np.float32)
+
+    def close(self):
+        self._closed = True
+        self._spawner.shutdown(wait=True)
+        while True:
+            try:
+                proc = self._warm.get_nowait()
+            except queue.Empty:
+                break
+            proc.kill()
+            proc.wait()
+
+
+class StreamDecoder:
+    """One long-lived ffmpeg process decoding a container stream incrementally.
+
+    ``feed`` queues encoded bytes for a writer thread and ``read`` returns the
+    samples decoded since the previous call, so each byte is decoded exactly
+    once however long the stream runs. Neither call blocks the event loop.
+    """
+
+    def __init__(self, command: list = None):
+        self._proc = subprocess.Popen(
+            command or FFMPEG_STREAM_COMMAND,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self._input = queue.Queue()
+        self._output = bytearray()
+        self._output_lock = threading.Lock()
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, name="ffmpeg-stream-writer", daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, name="ffmpeg-stream-reader", daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def _write_loop(self):
+        try:
+            while True:
+                chunk = self._input.get()
+                if chunk is None:
+                    break
+                self._proc.stdin.write(chunk)
+                self._proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._error = AudioDecodeError(f"ffmpeg stopped accepting audio: {e}")
+        finally:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+
+    def _read_loop(self):
+        while True:
+            data = self._proc.stdout.read1(65536)
+            if not data:
+                break
+            with self._output_lock:
+                self._output += data
+
+    def feed(self, chunk: bytes):
+        if self._error is not None:
+            raise self._error
+        self._input.put(bytes(chunk))
+
+    def read(self) -> np.ndarray:
+        """Samples decoded since the last call; a trailing partial float stays buffered"""
+        with self._output_lock:
+            usable = len(self._output) - len(self._output) % 4
+            data = bytes(self._output[:usable])
+            del self._output[:usable]
+        return np.frombuffer(data, dtype=np.float32)
+
+    def finish(self, timeout: float = 30.0) -> np.ndarray:
+        """Close the input, wait for ffmpeg to flush and return the remaining samples; blocking"""
+        self._input.put(None)
+        self._writer.join(timeout)
+        self._reader.join(timeout)
+        self.close()
+        return self.read()
+
+    def close(self):
+        self._input.put(None)
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+
+
+decoder_pool = FFmpegDecoderPool(int(os.getenv("FFMPEG_DECODER_POOL_SIZE", str(os.cpu_count() or 1))))
+
+
+def _decode_with_soundfile(audio_data: bytes):
+    with io.BytesIO(audio_data) as audio_buffer:
+        info = sf.info(audio_buffer)
+        if info.samplerate != TARGET_SAMPLE_RATE:
+            return None
+        audio_buffer.seek(0)
+        audio_array, _ = sf.read(audio_buffer, dtype=np.float32, always_2d=False)
+    if audio_array.ndim > 1:
+        audio_array = np.ascontiguousarray(audio_array[:, 0])
+    return audio_array
+
+
+def decode_audio(audio_data: bytes, audio_format: str = "webm") -> np.ndarray:
+    """Decode audio bytes into a float32 16 kHz mono NumPy array"""
+    audio_format = audio_format.lower().lstrip('.')
+    start_time = time.perf_counter()
+    path = "wav_fast"
+
+    with tracing.span("audio.decode", audio_format=audio_format, input_bytes=len(audio_data)) as decode_span:
+        audio_array = parse_pcm_wav(audio_data)
+
+        if audio_array is None and audio_format in SOUNDFILE_FORMATS:
+            path = "soundfile"
+            try:
+                audio_array = _decode_with_soundfile(audio_data)
+            except Exception as e:
+                logger.info("soundfile could not decode audio, falling back to ffmpeg", error=str(e))
+
+        if audio_array is None:
+            if audio_format in SEEKABLE_FORMATS:
+                path = "ffmpeg_file"
+                audio_array = decoder_pool.decode_file(audio_data, audio_format)
+            else:
+                path = "ffmpeg_pipe"
+                audio_array = decoder_pool.decode(audio_data)
+        decode_span.set_attribute("decode_path", path)
+        decode_span.set_attribute("samples", len(audio_array))
+
+    AUDIO_DECODE_TOTAL.labels(path).inc()
+    AUDIO_DECODE_DURATION.labels(path).observe(time.perf_counter() - start_time)
+    logger.info("✅ Audio decoded", path=path, samples=len(audio_array))
+    return audio_array
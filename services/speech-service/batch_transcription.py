@@ -0,0 +1,222 @@
+from typing import NamedTuple, Any
+import numpy as np
+import asyncio
+import base64
+import time
+import os
+import structlog
+
+from audio_decoder import TARGET_SAMPLE_RATE
+from inference_executor import inference_executor, InferenceQueueFull
+from deadline import check_deadline
+
+logger = structlog.get_logger()
+
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", str(inference_executor.max_concurrency)))
+
+# Clips shorter than this are candidates for packing into a shared model pass
+PACK_MAX_CLIP_SECONDS = float(os.getenv("BATCH_PACK_MAX_CLIP_SECONDS", "5"))
+# Keep packs inside a single 30 s Whisper window
+PACK_MAX_SECONDS = float(os.getenv("BATCH_PACK_MAX_SECONDS", "28"))
+PACK_GAP_SECONDS = 1.0
+
+
+def owning_clip(spans: list, piece) -> int:
+    """Index of the packed clip a segment or word belongs to, by its midpoint; gaps split down the middle"""
+    midpoint = (piece.start + piece.end) / 2
+    owner = spans[0][0]
+    for index, clip_start, _ in spans:
+        if midpoint >= clip_start - PACK_GAP_SECONDS / 2:
+            owner = index
+    return owner
+
+
+class BatchItem(NamedTuple):
+    audio_data: Any
+    audio_format: str
+    language: str
+    processor: Any
+
+
+class BatchTranscriber:
+    """Fans a batch of clips out over the inference executor.
+
+    Every item is decoded and transcribed as its own executor job, with at
+    most ``parallelism`` jobs of this batch in flight. With packing enabled,
+    short clips are decoded first and then concatenated (separated by silence)
+    so one model pass covers several of them; only clips sharing a decoding
+    profile and language are packed together.
+    """
+
+    def __init__(self, parallelism: int = BATCH_MAX_PARALLELISM):
+        # Never fan out wider than the executor runs, so a batch cannot fill its own wait queue
+        self.parallelism = max(1, min(parallelism, inference_executor.max_concurrency))
+
+    async def transcribe(self, items: list, pack_short_clips: bool = False, deadline: float = None) -> dict:
+        """Transcribe ``BatchItem``s, preserving input order.
+
+        ``audio_data`` may be raw bytes or a base64 string; base64 is decoded
+        on the executor rather than the event loop. Jobs already running on the
+        executor stop between segments once ``deadline`` passes, so an
+        abandoned batch does not keep holding model slots.
+        """
+        semaphore = asyncio.Semaphore(self.parallelism)
+        results = [self._empty_result(i) for i in range(len(items))]
+        # Time spent inside decode/inference jobs, i.e. the sequential cost of the batch
+        stats = {"busy_seconds": 0.0}
+
+        async def submit(fn, *args):
+            async with semaphore:
+                return await inference_executor.run(fn, *args)
+
+        start_time = time.perf_counter()
+        if pack_short_clips:
+            await self._transcribe_packed(items, results, submit, stats, deadline)
+        else:
+            await asyncio.gather(*[
+                self._transcribe_single(i, item, results, submit, stats, deadline)
+                for i, item in enumerate(items)
+            ])
+        wall_seconds = time.perf_counter() - start_time
+
+        return {
+            "results": results,
+            "wall_seconds": wall_seconds,
+            "busy_seconds": stats["busy_seconds"],
+            "speedup": stats["busy_seconds"] / wall_seconds if wall_seconds > 0 else 1.0,
+            "parallelism": self.parallelism
+        }
+
+    def _empty_result(self, index: int) -> dict:
+        return {
+            "index": index,
+            "transcript": "",
+            "success": False,
+            "packed": False,
+            "timings": {"decode_seconds": 0.0, "inference_seconds": 0.0}
+        }
+
+    def _decode_job(self, item: BatchItem, deadline: float = None):
+        check_deadline(deadline, "queued")
+        start_time = time.perf_counter()
+        audio_data = item.audio_data
+        if isinstance(audio_data, str):
+            audio_data = base64.b64decode(audio_data)
+        audio_array = item.processor._decode_audio(audio_data, item.audio_format)
+        if audio_array is not None:
+            audio_array = item.processor.prepare_audio(audio_array)
+        return audio_array, time.perf_counter() - start_time
+
+    def _inference_job(self, processor, audio_array: np.ndarray, language: str, deadline: float = None,
+                       word_timestamps: bool = False):
+        start_time = time.perf_counter()
+        segments = processor.transcribe_array(audio_array, language, deadline, word_timestamps)
+        return segments, time.perf_counter() - start_time
+
+    def _full_job(self, item: BatchItem, deadline: float = None):
+        audio_array, decode_seconds = self._decode_job(item, deadline)
+        if audio_array is None:
+            return None, decode_seconds, 0.0
+        segments, inference_seconds = self._inference_job(item.processor, audio_array, item.language, deadline)
+        return segments, decode_seconds, inference_seconds
+
+    async def _transcribe_single(self, index, item, results, submit, stats, deadline):
+        result = results[index]
+        try:
+            segments, decode_seconds, inference_seconds = await submit(self._full_job, item, deadline)
+            result["timings"] = {"decode_seconds": decode_seconds, "inference_seconds": inference_seconds}
+            stats["busy_seconds"] += decode_seconds + inference_seconds
+            if segments is None:
+                result["error"] = "Audio conversion error"
+                return
+            result["transcript"] = " ".join(segment.text for segment in segments)
+            result["success"] = True
+        except InferenceQueueFull as e:
+            result["error"] = str(e)
+        except Exception as e:
+            logger.error(f"❌ Error processing audio {index}", error=str(e))
+            result["error"] = str(e)
+
+    async def _transcribe_packed(self, items, results, submit, stats, deadline):
+        decoded = await asyncio.gather(
+            *[submit(self._decode_job, item, deadline) for item in items],
+            return_exceptions=True
+        )
+
+        short_clips = {}
+        jobs = []
+        for index, outcome in enumerate(decoded):
+            result = results[index]
+            if isinstance(outcome, Exception):
+                result["error"] = str(outcome)
+                continue
+            audio_array, decode_seconds = outcome
+            result["timings"]["decode_seconds"] = decode_seconds
+            stats["busy_seconds"] += decode_seconds
+            if audio_array is None:
+                result["error"] = "Audio conversion error"
+            elif len(audio_array) <= PACK_MAX_CLIP_SECONDS * TARGET_SAMPLE_RATE:
+                group = (items[index].processor.profile.name, items[index].language)
+                short_clips.setdefault(group, []).append((index, audio_array))
+            else:
+                jobs.append(self._run_pack(items[index], [(index, audio_array)], results, submit, stats, deadline))
+
+        for clips in short_clips.values():
+            for pack in self._build_packs(clips):
+                jobs.append(self._run_pack(items[pack[0][0]], pack, results, submit, stats, deadline))
+
+        await asyncio.gather(*jobs)
+
+    def _build_packs(self, clips: list) -> list:
+        max_samples = int(PACK_MAX_SECONDS * TARGET_SAMPLE_RATE)
+        gap_samples = int(PACK_GAP_SECONDS * TARGET_SAMPLE_RATE)
+        packs, current, current_samples = [], [], 0
+        for index, audio_array in clips:
+            needed = len(audio_array) + (gap_samples if current else 0)
+            if current and current_samples + needed > max_samples:
+                packs.append(current)
+                current, current_samples = [], 0
+                needed = len(audio_array)
+            current.append((index, audio_array))
+            current_samples += needed
+        if current:
+            packs.append(current)
+        return packs
+
+    async def _run_pack(self, item: BatchItem, pack: list, results: list, submit, stats, deadline):
+        """Transcribe one pack; ``item`` supplies the processor and language shared by the pack"""
+        gap = np.zeros(int(PACK_GAP_SECONDS * TARGET_SAMPLE_RATE), dtype=np.float32)
+        pieces, spans, offset = [], [], 0
+        for index, audio_array in pack:
+            if pieces:
+                pieces.append(gap)
+                offset += len(gap)
+            pieces.append(audio_array)
+            spans.append((index, offset / TARGET_SAMPLE_RATE, (offset + len(audio_array)) / TARGET_SAMPLE_RATE))
+            offset += len(audio_array)
+        packed_audio = pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+        try:
+            # Word timestamps let a segment that runs across the gap be split between its clips
+            segments, inference_seconds = await submit(self._inference_job, item.processor, packed_audio,
+                                                       item.language, deadline, len(spans) > 1)
+        except Exception as e:
+            for index, _, _ in spans:
+                results[index]["error"] = str(e)
+            return
+        stats["busy_seconds"] += inference_seconds
+
+        texts = {index: [] for index, _, _ in spans}
+        for segment in segments:
+            parts = {}
+            for piece in segment.words or (segment,):
+                parts.setdefault(owning_clip(spans, piece), []).append(piece.text)
+            for owner, pieces in parts.items():
+                texts[owner].append("".join(pieces).strip())
+
+        for index, _, _ in spans:
+            result = results[index]
+            result["transcript"] = " ".join(texts[index])
+            result["success"] = True
+            result["packed"] = len(spans) > 1
+            result["timings"]["inference_seconds"] = inference_seconds
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compare peak Python memory needed to turn an upload into audio bytes
+for the base64 JSON transport versus the raw body transport.
+
+Usage: python bench_upload_memory.py [audio_seconds ...]
+"""
+
+import base64
+import json
+import os
+import sys
+import tracemalloc
+
+from pydantic import BaseModel
+
+
+class AudioRequest(BaseModel):
+    audio_data: str
+    audio_format: str = "webm"
+    language: str = "en"
+
+
+CHUNK_SIZE = 64 * 1024
+# Roughly what a 48 kHz Opus MediaRecorder stream produces per second
+BYTES_PER_SECOND = 16 * 1024
+
+
+def json_transport(body: bytes) -> int:
+    """Gateway parse + re-serialize, then speech service parse + base64 decode"""
+    gateway_body = json.loads(body)
+    forwarded = json.dumps(gateway_body).encode()
+    request = AudioRequest.model_validate_json(forwarded)
+    return len(base64.b64decode(request.audio_data))
+
+
+def raw_transport(chunks: list) -> int:
+    """Body streamed through the gateway and accumulated once by the speech service"""
+    audio = bytearray()
+    for chunk in chunks:
+        audio += chunk
+    return len(audio)
+
+
+def measure(fn, payload) -> int:
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    durations = [float(arg) for arg in sys.argv[1:]] or [5, 30, 120]
+    print(f"{'audio':>8} {'size':>10} {'json wire':>10} {'json peak':>10} {'raw peak':>10} {'ratio':>6}")
+    for seconds in durations:
+        audio = os.urandom(int(seconds * BYTES_PER_SECOND))
+        json_body = json.dumps({"audio_data": base64.b64encode(audio).decode(), "audio_format": "webm"}).encode()
+        chunks = [audio[i:i + CHUNK_SIZE] for i in range(0, len(audio), CHUNK_SIZE)]
+
+        json_peak = measure(json_transport, json_body)
+        raw_peak = measure(raw_transport, chunks)
+        print(f"{seconds:>7.0f}s {len(audio) / 1e6:>9.2f}M {len(json_body) / 1e6:>9.2f}M "
+              f"{json_peak / 1e6:>9.2f}M {raw_peak / 1e6:>9.2f}M {json_peak / raw_peak:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
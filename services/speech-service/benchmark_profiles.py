@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Offline latency/accuracy benchmark for the Whisper decoding profiles.
+
+Runs every WAV file in a local corpus through each profile and reports
+real-time factor, p50/p95 latency, peak RSS and word error rate.
+
+Corpus layout: a directory of ``name.wav`` files, each optionally paired with
+a ``name.txt`` reference transcript (WER is only computed for files that
+have one).
+
+Usage:
+    python benchmark_profiles.py --corpus ./corpus
+    python benchmark_profiles.py --corpus ./corpus --profiles realtime balanced --repeat 3 --json results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+
+
+def normalize_words(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Levenshtein distance over words, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_corpus(corpus_dir: str) -> list:
+    corpus = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.lower().endswith(".wav"):
+            continue
+        path = os.path.join(corpus_dir, name)
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path) as f:
+                reference = f.read().strip()
+        with open(path, "rb") as f:
+            corpus.append({"name": name, "audio": f.read(), "reference": reference})
+    return corpus
+
+
+def run_profile(profile_name: str, corpus_dir: str, repeat: int, language: str) -> dict:
+    """Benchmark one profile; runs in a fresh process so peak RSS is per profile"""
+    import logging
+    import structlog
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    from audio_decoder import decode_audio, TARGET_SAMPLE_RATE
+    from decoding_profiles import get_profile
+    from speech_processor import SpeechProcessor
+
+    processor = SpeechProcessor(get_profile(profile_name))
+    corpus = load_corpus(corpus_dir)
+
+    load_start = time.perf_counter()
+    processor.model_pool.get_model()
+    load_seconds = time.perf_counter() - load_start
+
+    latencies, rtfs, wers = [], [], []
+    audio_seconds = 0.0
+    for item in corpus:
+        audio_array = processor.normalize_audio(decode_audio(item["audio"], "wav"))
+        duration = len(audio_array) / TARGET_SAMPLE_RATE
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            segments = processor.transcribe_array(audio_array, language)
+            latency = time.perf_counter() - start_time
+            latencies.append(latency)
+            rtfs.append(latency / duration if duration else 0.0)
+            audio_seconds += duration
+        if item["reference"] is not None:
+            hypothesis = " ".join(segment.text for segment in segments)
+            wers.append(word_error_rate(item["reference"], hypothesis))
+
+    # ru_maxrss is reported in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "profile": profile_name,
+        "files": len(corpus),
+        "runs": len(latencies),
+        "audio_seconds": audio_seconds,
+        "model_load_seconds": load_seconds,
+        "rtf_mean": sum(rtfs) / len(rtfs) if rtfs else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "peak_rss_mb": peak_rss_mb,
+        "wer": sum(wers) / len(wers) if wers else None
+    }
+
+
+def main():
+    service_dir = os.path.dirname(os.path.abspath(__file__))
+    # The service modules import the shared services/common package
+    sys.path[:0] = [service_dir, os.path.dirname(service_dir)]
+    from decoding_profiles import PROFILES
+
+    parser = argparse.ArgumentParser(description="Benchmark Whisper decoding profiles")
+    parser.add_argument("--corpus", required=True, help="Directory of .wav files with optional .txt references")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), help="Profiles to run")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per file")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--json", help="Write raw results to this file")
+    args = parser.parse_args()
+
+    # Each profile gets its own process so model memory does not leak into the next one's RSS
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for profile_name in args.profiles:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_profile, (profile_name, args.corpus, args.repeat, args.language)))
+
+    print(f"{'profile':<10} {'runs':>5} {'load s':>7} {'RTF':>6} {'p50 s':>7} {'p95 s':>7} {'RSS MB':>8} {'WER':>6}")
+    for r in results:
+        wer = f"{r['wer']:.3f}" if r["wer"] is not None else "-"
+        print(f"{r['profile']:<10} {r['runs']:>5} {r['model_load_seconds']:>7.2f} {r['rtf_mean']:>6.3f} "
+              f"{r['latency_p50']:>7.3f} {r['latency_p95']:>7.3f} {r['peak_rss_mb']:>8.0f} {wer:>6}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
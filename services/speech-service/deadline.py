@@ -0,0 +1,38 @@
+from typing import Optional
+import time
+
+from metrics import DEADLINE_EXCEEDED
+
+# Remaining time budget in milliseconds, set by the gateway from the client timeout
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before its work is done"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def deadline_from_headers(headers) -> Optional[float]:
+    """Convert the propagated time budget into an absolute time.monotonic() deadline"""
+    value = headers.get(DEADLINE_HEADER)
+    if not value:
+        return None
+    try:
+        return time.monotonic() + max(0.0, float(value)) / 1000.0
+    except ValueError:
+        return None
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def check_deadline(deadline: Optional[float], stage: str):
+    if deadline is not None and time.monotonic() >= deadline:
+        DEADLINE_EXCEEDED.labels(stage).inc()
+        raise DeadlineExceeded(stage)
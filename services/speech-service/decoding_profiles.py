@@ -0,0 +1,47 @@
+from typing import NamedTuple, Optional
+import json
+import os
+
+
+class DecodingProfile(NamedTuple):
+    name: str
+    model_size: str
+    compute_type: str
+    cpu_threads: int
+    num_workers: Optional[int]
+    beam_size: int
+    best_of: int
+
+
+# Defaults; run benchmark_profiles.py against a local corpus before changing them
+PROFILES = {
+    "realtime": DecodingProfile("realtime", "tiny", "int8", 2, None, 1, 1),
+    "balanced": DecodingProfile("balanced", "base", "int8", 0, None, 1, 1),
+    "accurate": DecodingProfile("accurate", "small", "int8", 0, None, 5, 5),
+}
+
+DEFAULT_PROFILE = os.getenv("DEFAULT_DECODING_PROFILE", "balanced")
+
+
+class UnknownProfileError(ValueError):
+    """Raised when a request names a profile that is not configured"""
+
+
+def _load_overrides(path: str):
+    """Merge profile fields from a JSON file of the form {"name": {"beam_size": 2, ...}}"""
+    with open(path) as f:
+        overrides = json.load(f)
+    for name, fields in overrides.items():
+        base = PROFILES.get(name, PROFILES["balanced"])
+        PROFILES[name] = base._replace(name=name, **fields)
+
+
+if os.getenv("DECODING_PROFILES_FILE"):
+    _load_overrides(os.getenv("DECODING_PROFILES_FILE"))
+
+
+def get_profile(name: str = None) -> DecodingProfile:
+    profile = PROFILES.get(name or DEFAULT_PROFILE)
+    if profile is None:
+        raise UnknownProfileError(f"Unknown decoding profile '{name}', expected one of {sorted(PROFILES)}")
+    return profile
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import threading
+import time
+import os
+import structlog
+
+from model_pool import DEFAULT_POOL_SIZE
+from metrics import INFERENCE_IN_FLIGHT, INFERENCE_QUEUE_DEPTH, INFERENCE_QUEUE_WAIT, INFERENCE_REJECTED
+from common import tracing
+
+logger = structlog.get_logger()
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the executor cannot admit more work"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """Runs blocking decode/inference work off the event loop.
+
+    At most ``max_concurrency`` jobs run at once and at most ``max_queue``
+    wait behind them; anything beyond that is rejected immediately so callers
+    can answer 503 instead of queueing unbounded latency.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int = 5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="inference")
+        self._queued = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def _update_gauges(self):
+        INFERENCE_IN_FLIGHT.set(self._running)
+        INFERENCE_QUEUE_DEPTH.set(self._queued)
+
+    def _wrap(self, fn, submitted_at: float):
+        def job(*args, **kwargs):
+            queue_wait = time.perf_counter() - submitted_at
+            INFERENCE_QUEUE_WAIT.observe(queue_wait)
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._update_gauges()
+            try:
+                with tracing.span("inference.job", queue_wait_ms=queue_wait * 1000.0):
+                    return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._update_gauges()
+        return job
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn`` on the executor, or raise InferenceQueueFull"""
+        with self._lock:
+            if self._queued + self._running >= self.max_concurrency + self.max_queue:
+                INFERENCE_REJECTED.inc()
+                logger.warning("🚫 Inference queue full",
+                               running=self._running,
+                               queued=self._queued)
+                raise InferenceQueueFull(self.retry_after)
+            self._queued += 1
+            self._update_gauges()
+
+        # Run in a copy of the caller's context so trace spans on the worker thread keep their parent
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._wrap(fn, time.perf_counter()), *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Work that has not started yet is dropped; running work finishes in its thread
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+                    self._update_gauges()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": self._queued
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+inference_executor = InferenceExecutor(
+    max_concurrency=int(os.getenv("INFERENCE_MAX_CONCURRENCY", str(DEFAULT_POOL_SIZE))),
+    max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", str(2 * DEFAULT_POOL_SIZE))),
+    retry_after=int(os.getenv("INFERENCE_RETRY_AFTER", "5"))
+)
@@ -1,14 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import asyncio
 import base64
 import io
 import structlog
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import JSONResponse
 import time
 import os
-from speech_processor import SpeechProcessor
+from speech_processor import SpeechProcessor, TranscriptionError
+from model_pool import model_registry
+from audio_decoder import decoder_pool
+from inference_executor import inference_executor, InferenceQueueFull
+from batch_transcription import BatchTranscriber, BatchItem
+from decoding_profiles import PROFILES, get_profile, UnknownProfileError
+from streaming import StreamingSession
+from transcription_cache import transcription_cache, new_audio_digest, finish_cache_key
+from audio_decoder import audio_format_from_content_type
+from deadline import DeadlineExceeded, deadline_from_headers, remaining
+from metrics import TRANSCRIPTION_REQUESTS, TRANSCRIPTION_DURATION, TRANSCRIPTION_ERRORS, TRANSCRIPTION_UPLOAD_BYTES
+from metrics import DEADLINE_EXCEEDED
+from common.instrumentation import instrument
 
 # Configure structured logging
 structlog.configure(
@@ -31,11 +42,6 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Prometheus metrics
-TRANSCRIPTION_REQUESTS = Counter('transcription_requests_total', 'Total transcription requests')
-TRANSCRIPTION_DURATION = Histogram('transcription_duration_seconds', 'Transcription processing time')
-TRANSCRIPTION_ERRORS = Counter('transcription_errors_total', 'Total transcription errors')
-
 app = FastAPI(
     title="CodeVoice Speech Service",
     description="Microservice for audio transcription and speech processing",
@@ -51,52 +57,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+instrument(app, "speech-service")
+
+# One processor per decoding profile; Whisper models are loaded lazily by the model registry
+speech_processors = {}
+batch_transcriber = BatchTranscriber()
+
+def get_processor(profile: str = None) -> SpeechProcessor:
+    """Return the shared processor for a decoding profile, raising UnknownProfileError"""
+    decoding_profile = get_profile(profile)
+    processor = speech_processors.get(decoding_profile.name)
+    if processor is None:
+        processor = speech_processors.setdefault(decoding_profile.name, SpeechProcessor(decoding_profile))
+    return processor
+
+def resolve_processor(profile: str = None) -> SpeechProcessor:
+    try:
+        return get_processor(profile)
+    except UnknownProfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Uploads are held in memory for decoding, so their size is capped as they arrive
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+def check_upload_size(size: int):
+    if size > MAX_UPLOAD_BYTES:
+        logger.warning("🚫 Audio upload too large", size_bytes=size, max_bytes=MAX_UPLOAD_BYTES)
+        raise HTTPException(status_code=413, detail=f"Audio exceeds the {MAX_UPLOAD_BYTES} byte upload limit")
+
 class AudioRequest(BaseModel):
     audio_data: str
     audio_format: str = "webm"
     language: str = "en"
+    profile: str = None
 
 class TranscriptionResponse(BaseModel):
     transcript: str
     confidence: float
     duration: float
     language: str
+    profile: str = None
+    cached: bool = False
+    cache_tier: str = None
+
+@app.on_event("shutdown")
+async def shutdown_decoders():
+    """Stop inference workers and reap pre-spawned ffmpeg decoder processes"""
+    inference_executor.shutdown()
+    decoder_pool.close()
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "speech-service"}
-
-@app.get("/metrics")
-async def metrics():
-    """Prometheus metrics endpoint"""
-    return JSONResponse(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return {"status": "healthy", "service": "speech-service", "model_pools": model_registry.stats(),
+            "inference": inference_executor.stats(), "cache": transcription_cache.stats()}
 
-@app.post("/transcribe", response_model=TranscriptionResponse)
-async def transcribe_audio(request: AudioRequest):
-    """Transcribe audio data to text"""
-    start_time = time.time()
-    TRANSCRIPTION_REQUESTS.inc()
-    
+async def _transcribe(processor: SpeechProcessor, audio_bytes, audio_format: str, language: str,
+                      start_time: float, digest=None, deadline: float = None):
+    """Cache lookup and transcription shared by every upload transport"""
     try:
-        logger.info("🎵 Received transcription request", 
-                   audio_format=request.audio_format, 
-                   language=request.language)
-        
-        # Decode base64 audio data
-        audio_bytes = base64.b64decode(request.audio_data)
-        logger.info("📦 Decoded audio", size_bytes=len(audio_bytes))
+        # Identical audio with identical decoding parameters is answered from cache
+        if digest is None:
+            digest = new_audio_digest(audio_bytes)
+        key = finish_cache_key(digest, processor.cache_params(language))
+        cached = await transcription_cache.get(key)
+        if cached is not None:
+            value, tier = cached
+            duration = time.time() - start_time
+            TRANSCRIPTION_DURATION.observe(duration)
+            logger.info("⚡ Transcription cache hit", tier=tier, duration_seconds=duration)
+            return TranscriptionResponse(
+                transcript=value["transcript"],
+                confidence=0.95,
+                duration=duration,
+                language=language,
+                profile=processor.profile.name,
+                cached=True,
+                cache_tier=tier
+            )
         
-        # Initialize speech processor
-        processor = SpeechProcessor()
-        
-        # Transcribe audio
-        transcript = await processor.transcribe_audio(audio_bytes, request.audio_format)
+        # Transcribe audio; the job itself also stops between segments once the deadline passes
+        transcript = await asyncio.wait_for(
+            processor.transcribe_audio(audio_bytes, audio_format, language, deadline),
+            timeout=remaining(deadline)
+        )
         
-        if not transcript or transcript.startswith("[ERROR"):
-            TRANSCRIPTION_ERRORS.inc()
-            logger.error("❌ Transcription failed", transcript=transcript)
-            raise HTTPException(status_code=400, detail=f"Transcription failed: {transcript}")
+        # Failures raise TranscriptionError, so anything returned (even "" for silent input) is cacheable
+        transcription_cache.put(key, {"transcript": transcript})
         
         # Calculate processing time
         duration = time.time() - start_time
@@ -110,64 +158,238 @@ async def transcribe_audio(request: AudioRequest):
             transcript=transcript,
             confidence=0.95,  # Placeholder - could be enhanced with actual confidence scores
             duration=duration,
-            language=request.language
+            language=language,
+            profile=processor.profile.name
         )
         
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Speech service is busy, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except TranscriptionError as e:
+        TRANSCRIPTION_ERRORS.inc()
+        logger.error("❌ Transcription failed", error=str(e))
+        raise HTTPException(status_code=400, detail=f"Transcription failed: {e}")
+    except (DeadlineExceeded, asyncio.TimeoutError) as e:
+        if isinstance(e, asyncio.TimeoutError):
+            DEADLINE_EXCEEDED.labels("response").inc()
+        logger.warning("⏱️ Transcription deadline exceeded", error=str(e))
+        raise HTTPException(status_code=504, detail="Transcription deadline exceeded")
+    except HTTPException:
+        raise
     except Exception as e:
         TRANSCRIPTION_ERRORS.inc()
         logger.error("❌ Error processing audio", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/transcribe", response_model=TranscriptionResponse)
+async def transcribe_audio(request: AudioRequest, http_request: Request):
+    """Transcribe base64 audio data to text"""
+    start_time = time.time()
+    TRANSCRIPTION_REQUESTS.inc()
+    processor = resolve_processor(request.profile)
+    
+    logger.info("🎵 Received transcription request", 
+               audio_format=request.audio_format, 
+               language=request.language,
+               profile=processor.profile.name)
+    
+    # Decoded size is about 3/4 of the base64 length
+    check_upload_size(len(request.audio_data) * 3 // 4)
+    
+    # Decode base64 audio data
+    try:
+        audio_bytes = base64.b64decode(request.audio_data)
+    except Exception as e:
+        TRANSCRIPTION_ERRORS.inc()
+        logger.error("❌ Invalid base64 audio data", error=str(e))
+        raise HTTPException(status_code=400, detail=f"Invalid base64 audio data: {str(e)}")
+    logger.info("📦 Decoded audio", size_bytes=len(audio_bytes))
+    TRANSCRIPTION_UPLOAD_BYTES.labels("json").observe(len(audio_bytes))
+    
+    return await _transcribe(processor, audio_bytes, request.audio_format, request.language, start_time,
+                             deadline=deadline_from_headers(http_request.headers))
+
+@app.post("/transcribe/raw", response_model=TranscriptionResponse)
+async def transcribe_raw_audio(request: Request, audio_format: str = None, language: str = "en",
+                               profile: str = None):
+    """Transcribe a raw audio request body (application/octet-stream or audio/*)"""
+    start_time = time.time()
+    TRANSCRIPTION_REQUESTS.inc()
+    processor = resolve_processor(profile)
+    audio_format = audio_format or audio_format_from_content_type(request.headers.get("content-type"))
+    
+    logger.info("🎵 Received raw transcription request", 
+               audio_format=audio_format, 
+               language=language)
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        check_upload_size(int(content_length))
+    
+    # Hash while the body streams in, so the cache key costs no extra pass
+    audio_bytes = bytearray()
+    digest = new_audio_digest()
+    async for chunk in request.stream():
+        audio_bytes += chunk
+        check_upload_size(len(audio_bytes))
+        digest.update(chunk)
+    
+    if not audio_bytes:
+        raise HTTPException(status_code=400, detail="Empty audio body")
+    logger.info("📦 Received audio", size_bytes=len(audio_bytes))
+    TRANSCRIPTION_UPLOAD_BYTES.labels("raw").observe(len(audio_bytes))
+    
+    return await _transcribe(processor, audio_bytes, audio_format, language, start_time, digest,
+                             deadline_from_headers(request.headers))
+
+@app.post("/transcribe/upload", response_model=TranscriptionResponse)
+async def transcribe_uploaded_audio(
+    request: Request,
+    file: UploadFile = File(...),
+    audio_format: str = Form(None),
+    language: str = Form("en"),
+    profile: str = Form(None)
+):
+    """Transcribe an audio file sent as multipart/form-data"""
+    start_time = time.time()
+    TRANSCRIPTION_REQUESTS.inc()
+    processor = resolve_processor(profile)
+    audio_format = audio_format or audio_format_from_content_type(file.content_type, file.filename)
+    
+    logger.info("🎵 Received multipart transcription request", 
+               audio_format=audio_format, 
+               language=language)
+    
+    audio_bytes = bytearray()
+    digest = new_audio_digest()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        audio_bytes += chunk
+        check_upload_size(len(audio_bytes))
+        digest.update(chunk)
+    
+    if not audio_bytes:
+        raise HTTPException(status_code=400, detail="Empty audio file")
+    logger.info("📦 Received audio", size_bytes=len(audio_bytes))
+    TRANSCRIPTION_UPLOAD_BYTES.labels("multipart").observe(len(audio_bytes))
+    
+    return await _transcribe(processor, audio_bytes, audio_format, language, start_time, digest,
+                             deadline_from_headers(request.headers))
+
+def _batch_cache_key(item: BatchItem) -> tuple:
+    """Decode a batch item's base64 once and key it like /transcribe; blocking"""
+    try:
+        audio_bytes = base64.b64decode(item.audio_data)
+    except Exception:
+        # Left for the batch to report as that item's error
+        return item, None
+    key = finish_cache_key(new_audio_digest(audio_bytes), item.processor.cache_params(item.language))
+    return item._replace(audio_data=audio_bytes), key
+
 @app.post("/transcribe/batch")
-async def transcribe_batch(audio_requests: list[AudioRequest]):
+async def transcribe_batch(audio_requests: list[AudioRequest], request: Request, pack_short_clips: bool = False):
     """Transcribe multiple audio files in batch"""
     start_time = time.time()
+    deadline = deadline_from_headers(request.headers)
     
     try:
         logger.info("🎵 Received batch transcription request", 
-                   batch_size=len(audio_requests))
+                   batch_size=len(audio_requests),
+                   pack_short_clips=pack_short_clips)
         
-        processor = SpeechProcessor()
-        results = []
+        # Every item gets the same upload cap as /transcribe
+        for audio_request in audio_requests:
+            check_upload_size(len(audio_request.audio_data) * 3 // 4)
         
-        for i, request in enumerate(audio_requests):
-            try:
-                audio_bytes = base64.b64decode(request.audio_data)
-                transcript = await processor.transcribe_audio(audio_bytes, request.audio_format)
-                
-                results.append({
-                    "index": i,
-                    "transcript": transcript,
-                    "success": not transcript.startswith("[ERROR"),
-                    "language": request.language
-                })
-                
-            except Exception as e:
-                logger.error(f"❌ Error processing audio {i}", error=str(e))
-                results.append({
+        items = [
+            BatchItem(request.audio_data, request.audio_format, request.language, resolve_processor(request.profile))
+            for request in audio_requests
+        ]
+        # Clips already transcribed with the same parameters are answered from cache, as on /transcribe
+        prepared = await asyncio.gather(*[asyncio.to_thread(_batch_cache_key, item) for item in items])
+        items = [item for item, _ in prepared]
+        keys = [key for _, key in prepared]
+        cached = [await transcription_cache.get(key) if key else None for key in keys]
+        misses = [i for i, entry in enumerate(cached) if entry is None]
+        
+        # Cancelling the batch at the deadline also cancels its queued jobs
+        batch = await asyncio.wait_for(
+            batch_transcriber.transcribe([items[i] for i in misses], pack_short_clips=pack_short_clips,
+                                         deadline=deadline),
+            timeout=remaining(deadline)
+        )
+        
+        results = [None] * len(items)
+        for i, result in zip(misses, batch["results"]):
+            result.update(index=i, cached=False)
+            results[i] = result
+            # Packed clips are decoded alongside their neighbours, so only stand-alone results are cached
+            if result["success"] and not result["packed"] and keys[i]:
+                transcription_cache.put(keys[i], {"transcript": result["transcript"]})
+        for i, entry in enumerate(cached):
+            if entry is not None:
+                value, tier = entry
+                results[i] = {
                     "index": i,
-                    "transcript": "",
-                    "success": False,
-                    "error": str(e),
-                    "language": request.language
-                })
+                    "transcript": value["transcript"],
+                    "success": True,
+                    "packed": False,
+                    "cached": True,
+                    "cache_tier": tier,
+                    "timings": {"decode_seconds": 0.0, "inference_seconds": 0.0}
+                }
+        
+        for result, item in zip(results, items):
+            result["language"] = item.language
+            result["profile"] = item.processor.profile.name
         
         duration = time.time() - start_time
         
         logger.info("✅ Batch transcription completed", 
                    batch_size=len(audio_requests),
-                   duration_seconds=duration)
+                   duration_seconds=duration,
+                   speedup=batch["speedup"])
         
         return {
             "results": results,
             "total_duration": duration,
-            "successful_transcriptions": sum(1 for r in results if r["success"])
+            "successful_transcriptions": sum(1 for r in results if r["success"]),
+            "busy_seconds": batch["busy_seconds"],
+            "speedup": batch["speedup"],
+            "parallelism": batch["parallelism"]
         }
         
+    except asyncio.TimeoutError:
+        DEADLINE_EXCEEDED.labels("response").inc()
+        logger.warning("⏱️ Batch transcription deadline exceeded", batch_size=len(audio_requests))
+        raise HTTPException(status_code=504, detail="Batch transcription deadline exceeded")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("❌ Error processing batch", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/ws/transcribe")
+async def websocket_transcribe(websocket: WebSocket, encoding: str = "pcm_s16le", language: str = "en",
+                               profile: str = None):
+    """Stream audio chunks in and receive partial and final transcripts back"""
+    try:
+        processor = get_processor(profile)
+    except UnknownProfileError:
+        await websocket.close(code=1008)
+        return
+    await StreamingSession(processor, encoding, language).run(websocket)
+
+@app.get("/profiles")
+async def get_decoding_profiles():
+    """List the configured decoding profiles"""
+    return {
+        "default": get_profile().name,
+        "profiles": [profile._asdict() for profile in PROFILES.values()]
+    }
+
 @app.get("/languages")
 async def get_supported_languages():
     """Get list of supported languages"""
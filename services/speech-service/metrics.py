@@ -0,0 +1,99 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request-level metrics
+TRANSCRIPTION_REQUESTS = Counter('transcription_requests_total', 'Total transcription requests')
+TRANSCRIPTION_DURATION = Histogram('transcription_duration_seconds', 'Transcription processing time')
+TRANSCRIPTION_ERRORS = Counter('transcription_errors_total', 'Total transcription errors')
+
+# Whisper model pool metrics
+MODEL_LOAD_DURATION = Histogram(
+    'whisper_model_load_seconds',
+    'Time spent loading a Whisper model into memory',
+    ['model', 'compute_type', 'cpu_threads'],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+)
+MODEL_POOL_SIZE = Gauge(
+    'whisper_model_pool_size',
+    'Number of checkout slots available for a Whisper model',
+    ['model', 'compute_type', 'cpu_threads']
+)
+MODEL_POOL_IN_USE = Gauge(
+    'whisper_model_pool_in_use',
+    'Number of Whisper model slots currently checked out',
+    ['model', 'compute_type', 'cpu_threads']
+)
+MODEL_POOL_WAIT = Histogram(
+    'whisper_model_pool_wait_seconds',
+    'Time spent waiting to check out a Whisper model slot',
+    ['model', 'compute_type', 'cpu_threads'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30)
+)
+
+# Audio decoding metrics
+AUDIO_DECODE_TOTAL = Counter(
+    'audio_decode_total',
+    'Audio decodes by decoding path',
+    ['path']
+)
+AUDIO_DECODE_DURATION = Histogram(
+    'audio_decode_duration_seconds',
+    'Time spent decoding audio to 16 kHz mono samples',
+    ['path'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+# Inference executor metrics
+INFERENCE_IN_FLIGHT = Gauge('inference_in_flight', 'Transcription jobs currently running on the inference executor')
+INFERENCE_QUEUE_DEPTH = Gauge('inference_queue_depth', 'Transcription jobs waiting for an inference worker')
+INFERENCE_QUEUE_WAIT = Histogram(
+    'inference_queue_wait_seconds',
+    'Time a transcription job waited before an inference worker picked it up',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+INFERENCE_REJECTED = Counter('inference_rejected_total', 'Transcription jobs rejected because the inference queue was full')
+
+# Streaming transcription metrics
+STREAMING_SESSIONS = Gauge('streaming_sessions_active', 'Open streaming transcription WebSocket sessions')
+STREAMING_FIRST_RESULT = Histogram(
+    'streaming_time_to_first_result_seconds',
+    'Time from the first audio chunk to the first partial or final result',
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+)
+STREAMING_STEP_DURATION = Histogram(
+    'streaming_step_duration_seconds',
+    'Time spent transcribing one sliding window of streamed audio',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+
+# Voice activity detection metrics
+VAD_TRIMMED_RATIO = Histogram(
+    'vad_trimmed_ratio',
+    'Fraction of each request\'s audio removed as silence before inference',
+    buckets=(0.0, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+VAD_TRIMMED_SECONDS = Counter('vad_trimmed_audio_seconds_total', 'Seconds of silent audio skipped before inference')
+VAD_SILENT_INPUTS = Counter('vad_silent_inputs_total', 'Inputs with no detected speech that skipped the model entirely')
+
+# Transcription cache metrics
+TRANSCRIPTION_CACHE_HITS = Counter('transcription_cache_hits_total', 'Transcription cache hits', ['tier'])
+TRANSCRIPTION_CACHE_MISSES = Counter('transcription_cache_misses_total', 'Transcription cache misses')
+TRANSCRIPTION_CACHE_ENTRIES = Gauge('transcription_cache_entries', 'Entries held in the transcription cache', ['tier'])
+
+# Upload metrics
+TRANSCRIPTION_UPLOAD_BYTES = Histogram(
+    'transcription_upload_bytes',
+    'Decoded audio size per transcription request by upload transport',
+    ['transport'],
+    buckets=(16e3, 64e3, 256e3, 512e3, 1e6, 2e6, 5e6, 10e6, 25e6)
+)
+
+# Deadline metrics
+DEADLINE_EXCEEDED = Counter(
+    'speech_deadline_exceeded_total',
+    'Requests abandoned because their propagated deadline passed',
+    ['stage']
+)
+DEADLINE_WASTED_SECONDS = Counter(
+    'speech_deadline_wasted_seconds_total',
+    'Inference time spent on requests whose deadline passed before they finished'
+)
@@ -0,0 +1,136 @@
+from faster_whisper import WhisperModel
+from contextlib import contextmanager
+import threading
+import time
+import os
+import structlog
+
+from metrics import MODEL_LOAD_DURATION, MODEL_POOL_SIZE, MODEL_POOL_IN_USE, MODEL_POOL_WAIT
+
+logger = structlog.get_logger()
+
+DEFAULT_POOL_SIZE = int(os.getenv("WHISPER_POOL_SIZE", str(os.cpu_count() or 1)))
+
+
+class ModelPoolTimeout(Exception):
+    """Raised when no model slot becomes free before the checkout timeout"""
+
+
+class ModelPool:
+    """A single Whisper model shared by a bounded number of concurrent callers.
+
+    The model is loaded on first checkout with ``num_workers`` equal to the
+    pool size, so CTranslate2 can run that many transcriptions in parallel
+    without holding several copies of the weights in memory.
+    """
+
+    def __init__(self, model_size: str, compute_type: str, cpu_threads: int, size: int):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.size = max(1, size)
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._in_use = 0
+        self._in_use_lock = threading.Lock()
+        self._labels = (model_size, compute_type, str(cpu_threads))
+
+        MODEL_POOL_SIZE.labels(*self._labels).set(self.size)
+        MODEL_POOL_IN_USE.labels(*self._labels).set(0)
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def get_model(self) -> WhisperModel:
+        """Return the underlying model, loading it on first use"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self) -> WhisperModel:
+        logger.info("📥 Loading Whisper model",
+                   model=self.model_size,
+                   compute_type=self.compute_type,
+                   cpu_threads=self.cpu_threads,
+                   num_workers=self.size)
+        start_time = time.perf_counter()
+        model = WhisperModel(
+            self.model_size,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.size
+        )
+        load_time = time.perf_counter() - start_time
+        MODEL_LOAD_DURATION.labels(*self._labels).observe(load_time)
+        logger.info("✅ Whisper model loaded",
+                   model=self.model_size,
+                   load_seconds=load_time)
+        return model
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        """Reserve a slot and yield the shared model"""
+        wait_start = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise ModelPoolTimeout(
+                f"No free slot for Whisper model '{self.model_size}' after {timeout}s"
+            )
+        MODEL_POOL_WAIT.labels(*self._labels).observe(time.perf_counter() - wait_start)
+
+        with self._in_use_lock:
+            self._in_use += 1
+            MODEL_POOL_IN_USE.labels(*self._labels).set(self._in_use)
+        try:
+            yield self.get_model()
+        finally:
+            with self._in_use_lock:
+                self._in_use -= 1
+                MODEL_POOL_IN_USE.labels(*self._labels).set(self._in_use)
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_size,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "size": self.size,
+            "in_use": self._in_use,
+            "loaded": self.loaded
+        }
+
+
+class ModelRegistry:
+    """Process-wide registry of Whisper model pools keyed by load parameters"""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        self.pool_size = pool_size
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, model_size: str = "base", compute_type: str = "int8", cpu_threads: int = 0,
+                 num_workers: int = None) -> ModelPool:
+        """Return the pool for these load parameters; ``num_workers`` only applies on creation"""
+        key = (model_size, compute_type, cpu_threads)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = ModelPool(model_size, compute_type, cpu_threads, num_workers or self.pool_size)
+                    self._pools[key] = pool
+        return pool
+
+    def stats(self) -> list:
+        return [pool.stats() for pool in list(self._pools.values())]
+
+
+model_registry = ModelRegistry()
@@ -1,157 +1,218 @@
-from faster_whisper import WhisperModel
+from typing import NamedTuple
+import time
 import numpy as np
-import soundfile as sf
-import io
-import subprocess
-import tempfile
-import os
 import structlog
 
+from model_pool import model_registry
+from decoding_profiles import DecodingProfile, get_profile
+from audio_decoder import decode_audio, TARGET_SAMPLE_RATE
+from inference_executor import inference_executor
+from vad import detect_speech, vad_params, VAD_ENABLED
+from deadline import DeadlineExceeded, check_deadline
+from metrics import VAD_TRIMMED_RATIO, VAD_TRIMMED_SECONDS, VAD_SILENT_INPUTS, DEADLINE_WASTED_SECONDS
+from common import tracing
+
 logger = structlog.get_logger()
 
+class TranscriptionError(Exception):
+    """Raised when audio cannot be decoded or the model fails on it"""
+
+class TranscribedWord(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+class TranscribedSegment(NamedTuple):
+    start: float
+    end: float
+    text: str
+    # Only filled in when word timestamps are requested
+    words: tuple = ()
+
 class SpeechProcessor:
-    def __init__(self):
-        # Use a larger model for better accuracy
-        self.model = WhisperModel("base", device="cpu", compute_type="int8")
+    def __init__(self, profile: DecodingProfile = None):
+        self.profile = profile or get_profile()
+        # Models are loaded once per process and shared through the registry
+        self.model_pool = model_registry.get_pool(
+            self.profile.model_size,
+            self.profile.compute_type,
+            self.profile.cpu_threads,
+            self.profile.num_workers
+        )
+        self.decoding_options = {
+            "task": "transcribe",
+            "beam_size": self.profile.beam_size,
+            "best_of": self.profile.best_of,
+            "temperature": 0.0,
+            "condition_on_previous_text": False,
+            "initial_prompt": None
+        }
+
+    def cache_params(self, language: str = "en") -> dict:
+        """Everything besides the audio itself that determines the transcript"""
+        return {
+            "profile": self.profile.name,
+            "language": language,
+            "model": self.model_pool.model_size,
+            "compute_type": self.model_pool.compute_type,
+            **vad_params(),
+            **self.decoding_options
+        }
 
-    async def transcribe_audio(self, audio_data: bytes, audio_format: str = "webm") -> str:
-        """Transcribe a complete audio file"""
+    async def transcribe_audio(self, audio_data: bytes, audio_format: str = "webm", language: str = "en",
+                               deadline: float = None) -> str:
+        """Transcribe a complete audio file without blocking the event loop.
+
+        Raises InferenceQueueFull when the inference executor is saturated,
+        DeadlineExceeded when ``deadline`` (a time.monotonic() value) passes and
+        TranscriptionError when the audio cannot be transcribed.
+        """
+        return await inference_executor.run(self.transcribe_sync, audio_data, audio_format, language, deadline)
+
+    def transcribe_sync(self, audio_data: bytes, audio_format: str = "webm", language: str = "en",
+                        deadline: float = None) -> str:
+        """Decode and transcribe a complete audio file on the calling thread"""
         try:
+            # Work that sat in the queue past its deadline is dropped before decoding
+            check_deadline(deadline, "queued")
+
             logger.info("=== AUDIO PROCESSING DEBUG ===",
                        input_audio_size=len(audio_data),
-                       audio_format=audio_format)
-            
-            # Convert audio to WAV format that Whisper can understand
-            wav_data = self._convert_to_wav(audio_data, audio_format)
-            
-            if wav_data is None:
-                return "[AUDIO CONVERSION ERROR]"
-            
-            # Load audio as numpy array
-            with io.BytesIO(wav_data) as audio_buffer:
-                audio_array, sample_rate = sf.read(audio_buffer, dtype=np.float32)
-                
-                # Ensure mono channel
-                if len(audio_array.shape) > 1:
-                    audio_array = audio_array[:, 0]
-                
-                logger.info("✅ Audio loaded", 
-                           samples=len(audio_array),
-                           sample_rate=sample_rate,
-                           duration_seconds=len(audio_array) / sample_rate)
-                
-                # Check for audio anomalies
-                logger.info("Audio statistics",
-                           min_val=np.min(audio_array),
-                           max_val=np.max(audio_array),
-                           mean_val=np.mean(audio_array),
-                           std_val=np.std(audio_array),
-                           non_zero_samples=np.count_nonzero(audio_array),
-                           total_samples=len(audio_array))
-                
-                # Check for silence at beginning/end
-                silence_threshold = 0.01
-                start_silence = np.count_nonzero(np.abs(audio_array[:int(sample_rate * 0.5)]) < silence_threshold)
-                end_silence = np.count_nonzero(np.abs(audio_array[-int(sample_rate * 0.5):]) < silence_threshold)
-                logger.info("Silence analysis",
-                           start_silence_samples=start_silence,
-                           end_silence_samples=end_silence)
-                
-                # Normalize audio
-                if np.max(np.abs(audio_array)) > 0:
-                    audio_array = audio_array / np.max(np.abs(audio_array))
-                
-                # Transcribe
-                logger.info("🎤 Starting transcription...")
-                segments, _ = self.model.transcribe(
-                    audio_array,
-                    language="en",
-                    task="transcribe",
-                    beam_size=1,
-                    best_of=1,
-                    temperature=0.0,
-                    condition_on_previous_text=False,
-                    initial_prompt=None
-                )
-                
-                segment_texts = []
+                       audio_format=audio_format,
+                       profile=self.profile.name)
+
+            # Decode straight to float32 16 kHz mono samples
+            audio_array = self._decode_audio(audio_data, audio_format)
+
+            if audio_array is None:
+                raise TranscriptionError("Audio conversion error")
+
+            audio_array = self.prepare_audio(audio_array)
+            segments = self.transcribe_array(audio_array, language, deadline)
+            segment_texts = [segment.text for segment in segments]
+
+            full_text = " ".join(segment_texts)
+
+            logger.info("=== TRANSCRIPTION RESULT ===",
+                       raw_transcription=full_text,
+                       number_of_segments=len(segment_texts))
+
+            return full_text
+
+        except (DeadlineExceeded, TranscriptionError):
+            raise
+        except Exception as e:
+            logger.error("❌ Transcription failed", error=str(e))
+            import traceback
+            traceback.print_exc()
+            raise TranscriptionError(str(e)) from e
+
+    def prepare_audio(self, audio_array: np.ndarray) -> np.ndarray:
+        """Log basic signal statistics and normalize decoded samples"""
+        sample_rate = TARGET_SAMPLE_RATE
+
+        logger.info("✅ Audio loaded",
+                   samples=len(audio_array),
+                   sample_rate=sample_rate,
+                   duration_seconds=len(audio_array) / sample_rate)
+
+        # Check for audio anomalies
+        logger.info("Audio statistics",
+                   min_val=np.min(audio_array),
+                   max_val=np.max(audio_array),
+                   mean_val=np.mean(audio_array),
+                   std_val=np.std(audio_array),
+                   non_zero_samples=np.count_nonzero(audio_array),
+                   total_samples=len(audio_array))
+
+        return self.normalize_audio(audio_array)
+
+    @staticmethod
+    def normalize_audio(audio_array: np.ndarray) -> np.ndarray:
+        """Peak-normalize samples to [-1, 1]"""
+        peak = np.max(np.abs(audio_array)) if len(audio_array) else 0
+        if peak > 0:
+            audio_array = audio_array / peak
+        return audio_array
+
+    def transcribe_array(self, audio_array: np.ndarray, language: str = "en", deadline: float = None,
+                         word_timestamps: bool = False) -> list:
+        """Trim silence, split at pauses and transcribe only the speech.
+
+        Segment (and word) timestamps are relative to the start of ``audio_array``.
+        """
+        if not VAD_ENABLED or len(audio_array) == 0:
+            return self.run_model(audio_array, language, deadline, word_timestamps)
+
+        with tracing.span("vad.detect_speech", samples=len(audio_array)) as vad_span:
+            chunks = detect_speech(audio_array)
+            vad_span.set_attribute("speech_chunks", len(chunks))
+        speech_samples = sum(end - start for start, end in chunks)
+        trimmed_samples = len(audio_array) - speech_samples
+        VAD_TRIMMED_RATIO.observe(trimmed_samples / len(audio_array))
+        VAD_TRIMMED_SECONDS.inc(trimmed_samples / TARGET_SAMPLE_RATE)
+
+        logger.info("Silence analysis",
+                   speech_chunks=len(chunks),
+                   speech_seconds=speech_samples / TARGET_SAMPLE_RATE,
+                   trimmed_seconds=trimmed_samples / TARGET_SAMPLE_RATE)
+
+        if not chunks:
+            VAD_SILENT_INPUTS.inc()
+            logger.info("🔇 No speech detected, skipping transcription")
+            return []
+
+        segments = []
+        for start, end in chunks:
+            offset = start / TARGET_SAMPLE_RATE
+            for segment in self.run_model(audio_array[start:end], language, deadline, word_timestamps):
+                words = tuple(TranscribedWord(word.start + offset, word.end + offset, word.text)
+                              for word in segment.words)
+                segments.append(TranscribedSegment(segment.start + offset, segment.end + offset, segment.text, words))
+        return segments
+
+    def run_model(self, audio_array: np.ndarray, language: str = "en", deadline: float = None,
+                  word_timestamps: bool = False) -> list:
+        """Run Whisper over prepared samples and return the decoded segments.
+
+        With a ``deadline``, decoding stops between segments once it has passed.
+        ``word_timestamps`` also aligns each word, at some extra cost.
+        """
+        logger.info("🎤 Starting transcription...")
+        check_deadline(deadline, "inference")
+        with self.model_pool.checkout() as model:
+            inference_start = time.perf_counter()
+            # Feature extraction and language handling happen here; the decoding itself is lazy
+            with tracing.span("whisper.transcribe", profile=self.profile.name, model=self.model_pool.model_size,
+                              audio_seconds=len(audio_array) / TARGET_SAMPLE_RATE):
+                segments, _ = model.transcribe(audio_array, language=language, word_timestamps=word_timestamps,
+                                               **self.decoding_options)
+
+            # Segments are decoded lazily, so iterate while the slot is held
+            results = []
+            with tracing.span("whisper.segments", profile=self.profile.name) as segments_span:
                 for i, segment in enumerate(segments):
+                    try:
+                        check_deadline(deadline, "inference")
+                    except DeadlineExceeded:
+                        DEADLINE_WASTED_SECONDS.inc(time.perf_counter() - inference_start)
+                        raise
                     segment_text = segment.text.strip()
-                    segment_texts.append(segment_text)
-                    logger.info(f"Segment {i+1}", 
+                    words = tuple(TranscribedWord(word.start, word.end, word.word) for word in segment.words or ())
+                    results.append(TranscribedSegment(segment.start, segment.end, segment_text, words))
+                    logger.info(f"Segment {i+1}",
                                text=segment_text,
                                start_time=segment.start,
                                end_time=segment.end)
-                
-                full_text = " ".join(segment_texts)
-                
-                logger.info("=== TRANSCRIPTION RESULT ===",
-                           raw_transcription=full_text,
-                           number_of_segments=len(segment_texts))
-                
-                return full_text
-                
-        except Exception as e:
-            logger.error("❌ Transcription failed", error=str(e))
-            import traceback
-            traceback.print_exc()
-            return "[TRANSCRIPTION ERROR]"
-    
-    def _convert_to_wav(self, audio_data: bytes, audio_format: str) -> bytes:
-        """Convert audio to WAV format using ffmpeg"""
+                segments_span.set_attribute("segments", len(results))
+
+        return results
+
+    def _decode_audio(self, audio_data: bytes, audio_format: str):
+        """Decode audio to a float32 16 kHz mono array without temp files"""
         try:
-            logger.info("🔄 Converting to WAV", audio_format=audio_format)
-            
-            with tempfile.NamedTemporaryFile(suffix=f'.{audio_format}', delete=False) as input_file:
-                input_file.write(audio_data)
-                input_path = input_file.name
-            
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as output_file:
-                output_path = output_file.name
-            
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-acodec', 'pcm_s16le',
-                '-ar', '16000',
-                '-ac', '1',
-                '-y', 
-                output_path
-            ]
-            
-            logger.info("Running ffmpeg command", command=' '.join(cmd))
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode != 0:
-                logger.error("❌ FFmpeg error", stderr=result.stderr)
-                return None
-            
-            logger.info("✅ FFmpeg conversion successful")
-            
-            with open(output_path, 'rb') as f:
-                wav_data = f.read()
-            
-            logger.info("📦 WAV file size", size_bytes=len(wav_data))
-            
-            os.unlink(input_path)
-            os.unlink(output_path)
-            
-            return wav_data
-            
+            logger.info("🔄 Decoding audio", audio_format=audio_format)
+            return decode_audio(audio_data, audio_format)
         except Exception as e:
             logger.error("❌ Audio conversion error", error=str(e))
-            # Clean up on error
-            try:
-                if 'input_path' in locals():
-                    os.unlink(input_path)
-                if 'output_path' in locals():
-                    os.unlink(output_path)
-            except:
-                pass
-            return None 
\ No newline at end of file
+            return None
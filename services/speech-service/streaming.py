@@ -0,0 +1,217 @@
+from fastapi import WebSocket, WebSocketDisconnect
+import numpy as np
+import asyncio
+import json
+import time
+import os
+import structlog
+
+from audio_decoder import StreamDecoder, AudioDecodeError, TARGET_SAMPLE_RATE
+from inference_executor import inference_executor, InferenceQueueFull
+from metrics import STREAMING_SESSIONS, STREAMING_FIRST_RESULT, STREAMING_STEP_DURATION
+
+logger = structlog.get_logger()
+
+# Raw PCM encodings that can be appended without decoding (16 kHz mono)
+PCM_DTYPES = {
+    "pcm_s16le": np.dtype('<i2'),
+    "pcm_f32le": np.dtype('<f4')
+}
+
+# Run the model whenever this much new audio has arrived
+STREAM_STEP_SECONDS = float(os.getenv("STREAM_STEP_SECONDS", "1.0"))
+# Segments ending closer than this to the live edge may still change
+STREAM_STABILITY_MARGIN_SECONDS = float(os.getenv("STREAM_STABILITY_MARGIN_SECONDS", "1.5"))
+# Force-commit text once the uncommitted window grows past this
+STREAM_MAX_WINDOW_SECONDS = float(os.getenv("STREAM_MAX_WINDOW_SECONDS", "25"))
+
+
+class StreamingSession:
+    """Incremental transcription over a rolling audio buffer.
+
+    Audio chunks are appended as they arrive. Every ``STREAM_STEP_SECONDS`` of
+    new audio the uncommitted window is transcribed; segments that end well
+    before the live edge are sent as ``final`` and dropped from the buffer,
+    the rest are sent as ``partial`` and re-transcribed on the next step.
+
+    ``pcm_s16le``/``pcm_f32le`` streams must be 16 kHz mono. Any other
+    encoding (e.g. MediaRecorder ``webm`` chunks) is piped through one ffmpeg
+    process for the whole session, and its output joins the same PCM buffer,
+    so every byte is decoded once and committed audio is trimmed either way.
+    """
+
+    def __init__(self, processor, encoding: str = "pcm_s16le", language: str = "en"):
+        self.processor = processor
+        self.language = language
+        self.encoding = encoding.lower()
+        self._pcm = np.zeros(0, dtype=np.float32)
+        self._remainder = b''
+        self._decoder = None
+        self._committed = 0
+        self._stepped_at = 0
+        self._step_task = None
+        self._first_chunk_at = None
+        self._first_result_sent = False
+        self._final_texts = []
+
+    @property
+    def committed_seconds(self) -> float:
+        return self._committed / TARGET_SAMPLE_RATE
+
+    async def append(self, chunk: bytes):
+        if self._first_chunk_at is None:
+            self._first_chunk_at = time.perf_counter()
+
+        dtype = PCM_DTYPES.get(self.encoding)
+        if dtype is None:
+            if self._decoder is None:
+                # Spawning ffmpeg forks the process, which would stall every other session on the loop
+                self._decoder = await asyncio.to_thread(StreamDecoder)
+            self._decoder.feed(chunk)
+            return
+
+        data = self._remainder + chunk
+        usable = len(data) - len(data) % dtype.itemsize
+        self._remainder = data[usable:]
+        samples = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize)
+        if dtype.kind == 'i':
+            samples = samples.astype(np.float32) / 32768.0
+        self._pcm = np.concatenate([self._pcm, samples.astype(np.float32, copy=False)])
+
+    def _drain_decoder(self, samples: np.ndarray = None):
+        """Move samples ffmpeg has decoded so far into the PCM buffer"""
+        if samples is None:
+            if self._decoder is None:
+                return
+            samples = self._decoder.read()
+        if len(samples):
+            self._pcm = np.concatenate([self._pcm, samples])
+
+    def ready(self) -> bool:
+        """True when enough new audio has arrived to run another step"""
+        self._drain_decoder()
+        return len(self._pcm) - self._stepped_at >= STREAM_STEP_SECONDS * TARGET_SAMPLE_RATE
+
+    def _infer(self, window):
+        """Normalize and transcribe one window on an executor thread"""
+        start_time = time.perf_counter()
+        if len(window) == 0:
+            return [], 0
+        segments = self.processor.run_model(self.processor.normalize_audio(window), self.language)
+        STREAMING_STEP_DURATION.observe(time.perf_counter() - start_time)
+        return segments, len(window)
+
+    async def step(self, websocket: WebSocket, final: bool = False):
+        """Transcribe the current window and push partial/final results"""
+        self._drain_decoder()
+        window = self._pcm
+        self._stepped_at = len(self._pcm)
+
+        try:
+            segments, window_samples = await inference_executor.run(self._infer, window)
+        except InferenceQueueFull as e:
+            await websocket.send_json({"type": "busy", "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            logger.warning("⚠️ Streaming step failed", error=str(e))
+            return
+
+        window_seconds = window_samples / TARGET_SAMPLE_RATE
+        if final:
+            finalized, pending = segments, []
+        else:
+            stable_until = window_seconds - STREAM_STABILITY_MARGIN_SECONDS
+            finalized = [s for s in segments if s.end <= stable_until]
+            if window_seconds > STREAM_MAX_WINDOW_SECONDS and not finalized and segments:
+                finalized = segments[:-1] or segments
+            pending = segments[len(finalized):]
+
+        offset = self.committed_seconds
+        for segment in finalized:
+            self._final_texts.append(segment.text)
+            await websocket.send_json({
+                "type": "final",
+                "text": segment.text,
+                "start": offset + segment.start,
+                "end": offset + segment.end
+            })
+        if pending:
+            await websocket.send_json({
+                "type": "partial",
+                "text": " ".join(segment.text for segment in pending),
+                "start": offset + pending[0].start,
+                "end": offset + pending[-1].end
+            })
+
+        if (finalized or pending) and not self._first_result_sent:
+            self._first_result_sent = True
+            STREAMING_FIRST_RESULT.observe(time.perf_counter() - self._first_chunk_at)
+
+        # Drop committed audio; long stretches without speech are dropped too
+        if finalized:
+            cut = min(int(finalized[-1].end * TARGET_SAMPLE_RATE), window_samples)
+        elif not segments and window_seconds > STREAM_STABILITY_MARGIN_SECONDS:
+            cut = int((window_seconds - STREAM_STABILITY_MARGIN_SECONDS) * TARGET_SAMPLE_RATE)
+        else:
+            cut = 0
+        if cut > 0:
+            self._committed += cut
+            self._pcm = self._pcm[cut:]
+            self._stepped_at = max(0, self._stepped_at - cut)
+
+    async def run(self, websocket: WebSocket):
+        """Serve one WebSocket session until the client stops or disconnects"""
+        await websocket.accept()
+        STREAMING_SESSIONS.inc()
+        logger.info("🎙️ Streaming session started", encoding=self.encoding)
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+
+                if message.get("bytes"):
+                    try:
+                        await self.append(message["bytes"])
+                    except AudioDecodeError as e:
+                        await websocket.send_json({"type": "error", "detail": str(e)})
+                        await websocket.close(code=1003)
+                        break
+                    if (self._step_task is None or self._step_task.done()) and self.ready():
+                        self._step_task = asyncio.create_task(self.step(websocket))
+                    continue
+
+                try:
+                    control = json.loads(message.get("text") or "{}")
+                except json.JSONDecodeError:
+                    await websocket.send_json({"type": "error", "detail": "Invalid control message"})
+                    continue
+
+                if control.get("type") in ("stop", "end"):
+                    if self._step_task is not None:
+                        await self._step_task
+                    if self._decoder is not None:
+                        # Let ffmpeg flush the tail of the stream before the last step
+                        self._drain_decoder(await asyncio.to_thread(self._decoder.finish))
+                    await self.step(websocket, final=True)
+                    await websocket.send_json({"type": "done", "text": " ".join(self._final_texts)})
+                    await websocket.close()
+                    break
+
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error("❌ Streaming session failed", error=str(e))
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+        finally:
+            if self._step_task is not None and not self._step_task.done():
+                self._step_task.cancel()
+            if self._decoder is not None:
+                await asyncio.to_thread(self._decoder.close)
+            STREAMING_SESSIONS.dec()
+            logger.info("🎙️ Streaming session ended",
+                       committed_seconds=self.committed_seconds,
+                       final_segments=len(self._final_texts))
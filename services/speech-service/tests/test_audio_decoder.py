@@ -0,0 +1,134 @@
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+from audio_decoder import AudioDecodeError, FFmpegDecoderPool, StreamDecoder, parse_pcm_wav
+
+# Stand-ins for ffmpeg; decode_file swaps the 'pipe:0' argument for a file path
+ECHO_COMMAND = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())", "pipe:0"]
+HANG_COMMAND = [sys.executable, "-c", "import time; time.sleep(30)", "pipe:0"]
+
+
+def make_wav(samples: np.ndarray, sample_rate: int = 16000, channels: int = 1, fmt: int = 1,
+             data_size: int = None) -> bytes:
+    data = samples.tobytes()
+    bits = samples.dtype.itemsize * 8
+    block_align = channels * samples.dtype.itemsize
+    fmt_chunk = struct.pack('<4sIHHIIHH', b'fmt ', 16, fmt, channels, sample_rate,
+                            sample_rate * block_align, block_align, bits)
+    data_header = struct.pack('<4sI', b'data', len(data) if data_size is None else data_size)
+    body = b'WAVE' + fmt_chunk + data_header + data
+    return struct.pack('<4sI', b'RIFF', len(body)) + body
+
+
+@pytest.fixture
+def pool():
+    pool = FFmpegDecoderPool(2, timeout=5.0, command=ECHO_COMMAND)
+    yield pool
+    pool.close()
+
+
+def settle(pool: FFmpegDecoderPool):
+    """Wait until every queued replenish has run"""
+    pool._spawner.submit(lambda: None).result()
+
+
+def test_parses_16_bit_pcm():
+    pcm = np.array([0, 16384, -32768, 32767], dtype='<i2')
+    audio = parse_pcm_wav(make_wav(pcm))
+    assert audio.dtype == np.float32
+    np.testing.assert_allclose(audio, [0.0, 0.5, -1.0, 32767 / 32768])
+
+
+def test_parses_float_pcm():
+    samples = np.array([0.25, -0.5, 1.0], dtype='<f4')
+    np.testing.assert_array_equal(parse_pcm_wav(make_wav(samples, fmt=3)), samples)
+
+
+def test_keeps_first_channel_of_stereo():
+    interleaved = np.array([100, -100, 200, -200], dtype='<i2')
+    audio = parse_pcm_wav(make_wav(interleaved, channels=2))
+    np.testing.assert_allclose(audio, np.array([100, 200]) / 32768)
+
+
+def test_clamps_unset_data_size_to_buffer():
+    pcm = np.array([1, 2, 3], dtype='<i2')
+    assert len(parse_pcm_wav(make_wav(pcm, data_size=0xFFFFFFFF))) == 3
+
+
+@pytest.mark.parametrize("audio_data", [
+    b"not a wav file",
+    make_wav(np.zeros(4, dtype='<i2'), sample_rate=44100),
+    make_wav(np.zeros(4, dtype='<i4')),
+])
+def test_declines_what_needs_resampling_or_ffmpeg(audio_data):
+    assert parse_pcm_wav(audio_data) is None
+
+
+def test_pool_decodes_through_a_warm_process(pool):
+    samples = np.array([0.5, -0.25], dtype=np.float32)
+    np.testing.assert_array_equal(pool.decode(samples.tobytes()), samples)
+    settle(pool)
+    assert pool._warm.qsize() == pool.size
+
+
+def test_cold_spawns_do_not_grow_the_warm_set(pool):
+    pool._ensure_started()
+    settle(pool)
+    for _ in range(6):
+        pool.decode(b"\x00" * 8)
+    settle(pool)
+    assert pool._warm.qsize() == pool.size
+
+    while not pool._warm.empty():
+        proc = pool._warm.get_nowait()
+        proc.kill()
+        proc.wait()
+    for _ in range(3):
+        pool.decode(b"\x00" * 8)
+    settle(pool)
+    assert pool._warm.qsize() == 0
+
+
+def test_dead_warm_process_is_replaced(pool):
+    pool._ensure_started()
+    settle(pool)
+    dead = pool._warm.queue[0]
+    dead.kill()
+    dead.wait()
+    pool.decode(b"\x00" * 8)
+    settle(pool)
+    assert pool._warm.qsize() == pool.size
+    assert dead not in pool._warm.queue
+
+
+def test_extra_replenish_is_discarded(pool):
+    for _ in range(pool.size + 2):
+        pool._replenish()
+    assert pool._warm.qsize() == pool.size
+
+
+@pytest.mark.parametrize("decode", [
+    lambda pool: pool.decode(b"\x00" * 8),
+    lambda pool: pool.decode_file(b"\x00" * 8, "mp4"),
+])
+def test_timeouts_raise_audio_decode_error(decode):
+    pool = FFmpegDecoderPool(1, timeout=0.2, command=HANG_COMMAND)
+    try:
+        with pytest.raises(AudioDecodeError, match="timed out"):
+            decode(pool)
+    finally:
+        pool.close()
+
+
+def test_stream_decoder_returns_each_sample_once():
+    samples = np.arange(6, dtype=np.float32)
+    decoder = StreamDecoder(command=ECHO_COMMAND)
+    decoder.feed(samples[:3].tobytes())
+    # Half a float stays buffered until the rest of it arrives
+    decoder.feed(samples[3:].tobytes()[:6])
+    decoder.feed(samples[3:].tobytes()[6:])
+    np.testing.assert_array_equal(decoder.finish(timeout=5.0), samples)
+    assert len(decoder.read()) == 0
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+from batch_transcription import BatchItem, BatchTranscriber, PACK_GAP_SECONDS
+from speech_processor import TranscribedSegment, TranscribedWord
+from audio_decoder import TARGET_SAMPLE_RATE
+
+
+def clip(seconds: float) -> np.ndarray:
+    return np.ones(int(seconds * TARGET_SAMPLE_RATE), dtype=np.float32)
+
+
+class FakeProcessor:
+    """Decodes an item's ``audio_data`` (a sample count) to ones and returns canned segments"""
+
+    profile = SimpleNamespace(name="test")
+
+    def __init__(self, segments: list):
+        self.segments = segments
+        self.calls = []
+
+    def _decode_audio(self, audio_data, audio_format):
+        return clip(audio_data)
+
+    def prepare_audio(self, audio_array):
+        return audio_array
+
+    def transcribe_array(self, audio_array, language="en", deadline=None, word_timestamps=False):
+        self.calls.append((len(audio_array) / TARGET_SAMPLE_RATE, word_timestamps))
+        return self.segments
+
+
+def transcribe_packed(processor, *seconds) -> list:
+    items = [BatchItem(s, "wav", "en", processor) for s in seconds]
+    return asyncio.run(BatchTranscriber().transcribe(items, pack_short_clips=True))["results"]
+
+
+def test_packs_stay_inside_one_window(monkeypatch):
+    monkeypatch.setattr("batch_transcription.PACK_MAX_SECONDS", 10)
+    clips = [(i, clip(4)) for i in range(4)]
+    packs = BatchTranscriber()._build_packs(clips)
+    assert [[index for index, _ in pack] for pack in packs] == [[0, 1], [2, 3]]
+
+
+def test_segment_across_the_gap_is_split_by_word():
+    # Clip 0 spans 0-2 s and clip 1 spans 3-5 s of the packed audio
+    words = (TranscribedWord(1.0, 1.4, " hello"), TranscribedWord(1.5, 1.9, " world."),
+             TranscribedWord(3.1, 3.5, " Good"), TranscribedWord(3.6, 3.9, " morning."))
+    processor = FakeProcessor([
+        TranscribedSegment(0.0, 0.9, "Well", (TranscribedWord(0.0, 0.9, " Well"),)),
+        TranscribedSegment(1.0, 3.9, "hello world. Good morning.", words)
+    ])
+    results = transcribe_packed(processor, 2, 2)
+    assert processor.calls == [(4 + PACK_GAP_SECONDS, True)]
+    assert [result["transcript"] for result in results] == ["Well hello world.", "Good morning."]
+    assert all(result["packed"] for result in results)
+
+
+def test_segments_without_words_go_by_midpoint():
+    processor = FakeProcessor([TranscribedSegment(0.2, 1.8, "first"), TranscribedSegment(2.8, 4.0, "second")])
+    results = transcribe_packed(processor, 2, 2)
+    assert [result["transcript"] for result in results] == ["first", "second"]
+
+
+def test_single_clip_skips_word_timestamps():
+    processor = FakeProcessor([TranscribedSegment(0.0, 1.0, "alone")])
+    [result] = transcribe_packed(processor, 2)
+    assert processor.calls == [(2, False)]
+    assert result["transcript"] == "alone" and not result["packed"]
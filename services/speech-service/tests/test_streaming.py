@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+import streaming
+from streaming import StreamingSession
+
+
+def test_pcm_chunks_join_the_buffer_across_odd_boundaries():
+    session = StreamingSession(processor=None, encoding="pcm_s16le")
+    data = np.array([0, 16384, -32768], dtype='<i2').tobytes()
+
+    async def feed():
+        await session.append(data[:3])
+        await session.append(data[3:])
+
+    asyncio.run(feed())
+    np.testing.assert_allclose(session._pcm, [0.0, 0.5, -1.0])
+
+
+def test_decoder_is_started_off_the_event_loop(monkeypatch):
+    threads = []
+
+    class RecordingDecoder:
+        def __init__(self):
+            threads.append(threading.current_thread())
+            self.chunks = []
+
+        def feed(self, chunk):
+            self.chunks.append(chunk)
+
+    monkeypatch.setattr(streaming, "StreamDecoder", RecordingDecoder)
+    session = StreamingSession(processor=None, encoding="webm")
+
+    async def feed():
+        await session.append(b"one")
+        await session.append(b"two")
+
+    asyncio.run(feed())
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+    assert session._decoder.chunks == [b"one", b"two"]
@@ -0,0 +1,46 @@
+import numpy as np
+
+import vad
+from vad import detect_speech, plan_chunks, vad_params
+
+RATE = 16000
+
+
+def tone(seconds: float, amplitude: float) -> np.ndarray:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def noise(seconds: float, level: float) -> np.ndarray:
+    return np.random.default_rng(0).normal(0, level, int(seconds * RATE)).astype(np.float32)
+
+
+def test_silence_has_no_speech():
+    assert detect_speech(np.zeros(RATE, dtype=np.float32)) == []
+    assert detect_speech(np.zeros(0, dtype=np.float32)) == []
+
+
+def test_noise_around_speech_is_trimmed():
+    audio = np.concatenate([noise(1, 0.02), tone(1, 0.5), noise(1, 0.02)])
+    [(start, end)] = detect_speech(audio)
+    assert RATE - 0.25 * RATE <= start <= RATE
+    assert 2 * RATE <= end <= 2 * RATE + 0.25 * RATE
+
+
+def test_quiet_speech_without_pauses_is_kept():
+    # No silent frames, so the quietest tenth is soft speech rather than a noise floor
+    audio = np.concatenate([tone(1, 0.08), tone(3, 0.5), tone(1, 0.08)])
+    assert detect_speech(audio) == [(0, len(audio))]
+
+
+def test_long_speech_is_split_into_bounded_chunks():
+    assert plan_chunks([(0, 10), (12, 20), (40, 45)], 25) == [(0, 20), (40, 45)]
+    assert plan_chunks([(0, 60)], 25) == [(0, 25), (25, 50), (50, 60)]
+
+
+def test_cache_params_follow_the_vad_settings(monkeypatch):
+    defaults = vad_params()
+    monkeypatch.setattr(vad, "VAD_ENERGY_THRESHOLD", 0.05)
+    assert vad_params() != defaults
+    monkeypatch.setattr(vad, "VAD_ENABLED", False)
+    assert vad_params() == {"vad": False}
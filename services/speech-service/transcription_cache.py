@@ -0,0 +1,159 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import threading
+import os
+import structlog
+
+from metrics import TRANSCRIPTION_CACHE_HITS, TRANSCRIPTION_CACHE_MISSES, TRANSCRIPTION_CACHE_ENTRIES
+
+logger = structlog.get_logger()
+
+
+def new_audio_digest(audio_data: bytes = b''):
+    """Start a cache-key digest; more audio can be fed in with ``update``"""
+    return hashlib.blake2b(audio_data, digest_size=32)
+
+
+def finish_cache_key(digest, params: dict) -> str:
+    """Mix everything besides the audio that affects the transcript into the key"""
+    digest = digest.copy()
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """One JSON file per entry, evicting least recently used files past ``max_bytes``"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), "r") as f:
+                value = json.load(f)
+            os.utime(self._path(key))
+            return value
+        except (OSError, ValueError):
+            with self._lock:
+                self._total_bytes -= self._index.pop(key, 0)
+            return None
+
+    def put(self, key: str, value: dict):
+        data = json.dumps(value).encode()
+        tmp_path = f"{self._path(key)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.unlink(self._path(old_key))
+                except OSError:
+                    pass
+
+    def __len__(self):
+        return len(self._index)
+
+
+class TranscriptionCache:
+    """In-process LRU of transcripts with an optional on-disk second tier.
+
+    Disk reads run on a worker thread and disk writes in the background, so a
+    slow or network disk never stalls the event loop.
+    """
+
+    def __init__(self, max_entries: int, disk_dir: str = None, disk_max_bytes: int = 0):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskCache(disk_dir, disk_max_bytes) if disk_dir else None
+        # Strong references, so pending disk writes are not garbage collected mid-flight
+        self._disk_writes = set()
+
+    async def get(self, key: str):
+        """Return ``(value, tier)`` for a hit, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        if value is not None:
+            TRANSCRIPTION_CACHE_HITS.labels("memory").inc()
+            return value, "memory"
+
+        if self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                TRANSCRIPTION_CACHE_HITS.labels("disk").inc()
+                self._put_memory(key, value)
+                return value, "disk"
+
+        TRANSCRIPTION_CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: str, value: dict):
+        """Store in memory now; the disk copy is written off the request path"""
+        self._put_memory(key, value)
+        if self.disk is not None:
+            task = asyncio.get_running_loop().create_task(self._put_disk(key, value))
+            self._disk_writes.add(task)
+            task.add_done_callback(self._disk_writes.discard)
+
+    async def _put_disk(self, key: str, value: dict):
+        try:
+            await asyncio.to_thread(self.disk.put, key, value)
+        except OSError as e:
+            logger.warning("⚠️ Failed to write transcription cache entry", error=str(e))
+        TRANSCRIPTION_CACHE_ENTRIES.labels("disk").set(len(self.disk))
+
+    def _put_memory(self, key: str, value: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            TRANSCRIPTION_CACHE_ENTRIES.labels("memory").set(len(self._entries))
+        if self.disk is not None:
+            TRANSCRIPTION_CACHE_ENTRIES.labels("disk").set(len(self.disk))
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._entries),
+            "disk_entries": len(self.disk) if self.disk is not None else None
+        }
+
+
+transcription_cache = TranscriptionCache(
+    max_entries=int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "1024")),
+    disk_dir=os.getenv("TRANSCRIPTION_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("TRANSCRIPTION_CACHE_DISK_MAX_BYTES", str(100 * 1024 * 1024)))
+)
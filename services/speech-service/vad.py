@@ -0,0 +1,110 @@
+import numpy as np
+import os
+
+from audio_decoder import TARGET_SAMPLE_RATE
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_FRAME_MS = 30
+# RMS level (relative to a peak-normalized signal) below which a frame is silence
+VAD_ENERGY_THRESHOLD = float(os.getenv("VAD_ENERGY_THRESHOLD", "0.01"))
+# Frames must also exceed this multiple of the recording's noise floor
+VAD_NOISE_MULTIPLIER = float(os.getenv("VAD_NOISE_MULTIPLIER", "3.0"))
+# The noise floor is only trusted when loud frames are this many times louder than quiet ones (20 dB),
+# and the threshold it sets stays that far below the loud frames
+VAD_MIN_SPREAD = float(os.getenv("VAD_MIN_SPREAD", "10.0"))
+# Speech is padded on both sides so word onsets and tails are not clipped
+VAD_PAD_MS = int(os.getenv("VAD_PAD_MS", "200"))
+# Pauses shorter than this are kept inside a speech region
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "500"))
+# Longer speech is split at pauses into chunks of at most this length
+VAD_MAX_CHUNK_SECONDS = float(os.getenv("VAD_MAX_CHUNK_SECONDS", "30"))
+
+
+def vad_params() -> dict:
+    """Settings that decide which audio reaches the model, for the transcription cache key"""
+    if not VAD_ENABLED:
+        return {"vad": False}
+    return {
+        "vad": True,
+        "vad_energy_threshold": VAD_ENERGY_THRESHOLD,
+        "vad_noise_multiplier": VAD_NOISE_MULTIPLIER,
+        "vad_min_spread": VAD_MIN_SPREAD,
+        "vad_pad_ms": VAD_PAD_MS,
+        "vad_min_silence_ms": VAD_MIN_SILENCE_MS,
+        "vad_max_chunk_seconds": VAD_MAX_CHUNK_SECONDS
+    }
+
+
+def frame_energy(audio_array: np.ndarray, frame_samples: int) -> np.ndarray:
+    """RMS energy per frame; a trailing partial frame is included"""
+    full_frames = len(audio_array) // frame_samples
+    frames = audio_array[:full_frames * frame_samples].reshape(full_frames, frame_samples)
+    energy = np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame_samples)
+
+    tail = audio_array[full_frames * frame_samples:]
+    if len(tail):
+        energy = np.append(energy, np.sqrt(np.dot(tail, tail) / len(tail)))
+    return energy
+
+
+def detect_speech(audio_array: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE) -> list:
+    """Return ``(start, end)`` sample ranges that contain speech.
+
+    Leading and trailing silence is dropped and ranges are split at pauses so
+    that none is longer than ``VAD_MAX_CHUNK_SECONDS``. An empty list means the
+    input is silent.
+    """
+    if len(audio_array) == 0:
+        return []
+
+    frame_samples = int(sample_rate * VAD_FRAME_MS / 1000)
+    energy = frame_energy(audio_array, frame_samples)
+
+    threshold = VAD_ENERGY_THRESHOLD
+    noise_floor, loud_level = np.percentile(energy, [10, 90])
+    # Without pauses the quietest frames are soft speech, not noise, and must not raise the threshold
+    if loud_level >= VAD_MIN_SPREAD * noise_floor:
+        threshold = max(threshold, min(VAD_NOISE_MULTIPLIER * noise_floor, loud_level / VAD_MIN_SPREAD))
+    voiced = energy > threshold
+    if not voiced.any():
+        return []
+
+    pad_frames = VAD_PAD_MS // VAD_FRAME_MS
+    if pad_frames:
+        voiced = np.convolve(voiced, np.ones(2 * pad_frames + 1), mode='same') > 0
+
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # Close pauses that are too short to split on
+    min_silence_frames = VAD_MIN_SILENCE_MS // VAD_FRAME_MS
+    keep = (starts[1:] - ends[:-1]) >= min_silence_frames
+    starts = np.concatenate((starts[:1], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+
+    regions = [
+        (int(start) * frame_samples, min(int(end) * frame_samples, len(audio_array)))
+        for start, end in zip(starts, ends)
+    ]
+    return plan_chunks(regions, int(VAD_MAX_CHUNK_SECONDS * sample_rate))
+
+
+def plan_chunks(regions: list, max_chunk_samples: int) -> list:
+    """Greedily group speech regions into chunks no longer than ``max_chunk_samples``"""
+    chunks = []
+    chunk_start = chunk_end = None
+    for start, end in regions:
+        if chunk_start is not None and end - chunk_start <= max_chunk_samples:
+            chunk_end = end
+            continue
+        if chunk_start is not None:
+            chunks.append((chunk_start, chunk_end))
+        # A single region longer than the limit is split at fixed boundaries
+        while end - start > max_chunk_samples:
+            chunks.append((start, start + max_chunk_samples))
+            start += max_chunk_samples
+        chunk_start, chunk_end = start, end
+    if chunk_start is not None:
+        chunks.append((chunk_start, chunk_end))
+    return chunks
@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 
+from common.instrumentation import instrument
+
 app = FastAPI(title="Weather Service", description="Weather information service", version="1.0.0")
 
+instrument(app, "weather-service")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "weather-service"}
@@ -59,6 +59,6 @@ Write-Host "🌐 Dashboard:" -ForegroundColor Cyan
 Write-Host "Run: minikube dashboard" -ForegroundColor White
 Write-Host ""
 Write-Host "🔗 Next steps:" -ForegroundColor Cyan
-Write-Host "1. Build Docker images: docker build -t codevoice/api-gateway ./services/api-gateway" -ForegroundColor White
+Write-Host "1. Build Docker images: docker build -t codevoice/api-gateway -f ./services/api-gateway/Dockerfile ./services" -ForegroundColor White
 Write-Host "2. Load images to Minikube: minikube image load codevoice/api-gateway" -ForegroundColor White
 Write-Host "3. Deploy to K8s: kubectl apply -f k8s/" -ForegroundColor White 
\ No newline at end of file